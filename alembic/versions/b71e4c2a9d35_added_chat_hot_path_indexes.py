@@ -0,0 +1,53 @@
+"""added chat hot-path indexes and unique field submission per form
+
+Revision ID: b71e4c2a9d35
+Revises: ccb3947e516b
+Create Date: 2026-10-18 10:12:41.530112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e4c2a9d35'
+down_revision: Union[str, Sequence[str], None] = 'ccb3947e516b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # messages: "last N messages of a conversation" in advance_chat.
+    # The composite index also serves conversation_id-only lookups.
+    op.create_index('ix_messages_conversation_id_message_num', 'messages', ['conversation_id', 'message_num'], unique=False)
+
+    # field_submissions: keep only the newest row per (form, field) before
+    # adding the unique constraint; earlier code could insert duplicates
+    # when the LLM said "create" for a field that already had a value.
+    op.execute(
+        """
+        DELETE FROM field_submissions older
+        USING field_submissions newer
+        WHERE older.form_id = newer.form_id
+          AND older.field_template_id = newer.field_template_id
+          AND older.id < newer.id
+        """
+    )
+    # Also serves form_id-only lookups (form.field_submissions)
+    op.create_unique_constraint('uq_field_submissions_form_id_field_template_id', 'field_submissions', ['form_id', 'field_template_id'])
+
+    op.create_index(op.f('ix_conversations_user_id'), 'conversations', ['user_id'], unique=False)
+    op.create_index(op.f('ix_forms_user_id'), 'forms', ['user_id'], unique=False)
+    op.create_index(op.f('ix_field_templates_form_template_id'), 'field_templates', ['form_template_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_field_templates_form_template_id'), table_name='field_templates')
+    op.drop_index(op.f('ix_forms_user_id'), table_name='forms')
+    op.drop_index(op.f('ix_conversations_user_id'), table_name='conversations')
+    op.drop_constraint('uq_field_submissions_form_id_field_template_id', 'field_submissions', type_='unique')
+    op.drop_index('ix_messages_conversation_id_message_num', table_name='messages')
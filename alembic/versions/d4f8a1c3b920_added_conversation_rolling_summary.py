@@ -0,0 +1,30 @@
+"""added conversation rolling summary
+
+Revision ID: d4f8a1c3b920
+Revises: b71e4c2a9d35
+Create Date: 2026-10-18 14:05:12.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f8a1c3b920'
+down_revision: Union[str, Sequence[str], None] = 'b71e4c2a9d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_through_message_num', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'summary_through_message_num')
+    op.drop_column('conversations', 'summary')
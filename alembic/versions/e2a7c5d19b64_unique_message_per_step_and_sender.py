@@ -0,0 +1,43 @@
+"""unique message per conversation step and sender
+
+Revision ID: e2a7c5d19b64
+Revises: d4f8a1c3b920
+Create Date: 2026-10-18 16:41:07.218305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c5d19b64'
+down_revision: Union[str, Sequence[str], None] = 'd4f8a1c3b920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Retried /advance calls could write the same step twice; keep the
+    # first copy of each message before adding the unique constraint.
+    op.execute(
+        """
+        DELETE FROM messages newer
+        USING messages older
+        WHERE newer.conversation_id = older.conversation_id
+          AND newer.message_num = older.message_num
+          AND newer.sender = older.sender
+          AND newer.id > older.id
+        """
+    )
+    op.create_unique_constraint('uq_messages_conversation_id_message_num_sender', 'messages', ['conversation_id', 'message_num', 'sender'])
+    # Superseded by the constraint's index, which has the same leading columns
+    op.drop_index('ix_messages_conversation_id_message_num', table_name='messages')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_messages_conversation_id_message_num', 'messages', ['conversation_id', 'message_num'], unique=False)
+    op.drop_constraint('uq_messages_conversation_id_message_num_sender', 'messages', type_='unique')
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 from app.core.dependencies import db_dependency, user_dependency
 from app.db.models.user import User
 from app.db.models.conversation import Conversation
 from app.db.models.form_template import FormTemplate
 from app.db.models.field_template import FieldTemplate, FieldType
 from app.db.models.form import Form
+from app.core.metrics import REGISTRY
+from app.utils.prompt_registry import prompt_registry
+from app.services.form_template_cache import form_template_cache
+from app.services.principal_cache import principal_cache
 import logging
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
@@ -16,7 +22,8 @@ async def list_users(db = db_dependency):
 	List all users
 	"""
 	logger.info("Admin requested list of all users.")
-	users = db.query(User).all()
+	result = await db.execute(select(User))
+	users = result.scalars().all()
 	return [
 		{
 			"id": user.id,
@@ -35,12 +42,15 @@ async def delete_user(
 	Delete a user given a user email
 	"""
 	logger.info(f"Admin requested deletion of user with email: {email}")
-	user = db.query(User).filter(User.email == email).first()
+	result = await db.execute(select(User).where(User.email == email))
+	user = result.scalars().first()
 	if not user:
 		logger.warning(f"User with email {email} not found for deletion.")
 		raise HTTPException(status_code=404, detail="User not found.")
-	db.delete(user)
-	db.commit()
+	user_id = user.id
+	await db.delete(user)
+	await db.commit()
+	principal_cache.invalidate(user_id)
 	logger.info(f"User with email {email} deleted.")
 	return {"detail": f"User {email} deleted."}
 
@@ -50,7 +60,8 @@ async def list_conversations(db = db_dependency):
 	List all conversations
 	"""
 	logger.info("Admin requested list of all conversations.")
-	conversations = db.query(Conversation).all()
+	result = await db.execute(select(Conversation))
+	conversations = result.scalars().all()
 	return [
 		{
 			"id": conv.id,
@@ -70,7 +81,12 @@ async def get_conversation(conversation_id: int, db = db_dependency):
 	"""
 	
 	logger.info(f"Admin requested conversation with id {conversation_id}.")
-	conv = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+	result = await db.execute(
+		select(Conversation)
+		.options(selectinload(Conversation.messages))
+		.where(Conversation.id == conversation_id)
+	)
+	conv = result.scalars().first()
 	if not conv:
 		logger.warning(f"Conversation with id {conversation_id} not found.")
 		raise HTTPException(status_code=404, detail="Conversation not found.")
@@ -96,7 +112,8 @@ async def get_conversation(conversation_id: int, db = db_dependency):
 @router.get("/form/{form_id}")
 async def get_form(form_id: int, db = db_dependency):
 	logger.info(f"Admin requested form with id {form_id}.")
-	form = db.query(Form).filter(Form.id == form_id).first()
+	result = await db.execute(select(Form).where(Form.id == form_id))
+	form = result.scalars().first()
 	if not form:
 		logger.warning(f"Form with id {form_id} not found.")
 		raise HTTPException(status_code=404, detail="Form not found.")
@@ -117,8 +134,8 @@ async def create_form_template(db = db_dependency):
 	logger.info("Admin requested creation of a new form_template.")
 	form_template = FormTemplate()
 	db.add(form_template)
-	db.commit()
-	db.refresh(form_template)
+	await db.commit()
+	await db.refresh(form_template)
 	logger.info(f"Created form_template with id {form_template.id}.")
 	return {"id": form_template.id}
 
@@ -129,7 +146,12 @@ async def get_form_template(form_template_id: int, db = db_dependency):
 	Get a form_template by ID.
 	"""
 	logger.info(f"Admin request form_template with ID {form_template_id}.")
-	form_template = db.query(FormTemplate).filter(FormTemplate.id == form_template_id).first()
+	result = await db.execute(
+		select(FormTemplate)
+		.options(selectinload(FormTemplate.field_templates))
+		.where(FormTemplate.id == form_template_id)
+	)
+	form_template = result.scalars().first()
 	if not form_template:
 		logger.warning(f"Form template with id {form_template_id} not found.")
 		raise HTTPException(status_code=404, detail="Form not found.")
@@ -162,7 +184,8 @@ async def create_field_template(
 	with a form_template (indicated by ID)
 	"""
 	logger.info(f"Admin requested creation of field_template for form_template_id {form_template_id}.")
-	form_template = db.query(FormTemplate).filter(FormTemplate.id == form_template_id).first()
+	result = await db.execute(select(FormTemplate).where(FormTemplate.id == form_template_id))
+	form_template = result.scalars().first()
 	if not form_template:
 		logger.warning(f"FormTemplate with id {form_template_id} not found.")
 		raise HTTPException(status_code=404, detail="FormTemplate not found.")
@@ -174,19 +197,62 @@ async def create_field_template(
 		form_template_id=form_template_id
 	)
 	db.add(field_template)
-	db.commit()
-	db.refresh(field_template)
+	await db.commit()
+	await db.refresh(field_template)
+	form_template_cache.invalidate(form_template_id)
 	logger.info(f"Created field_template with id {field_template.id} for form_template_id {form_template_id}.")
 	return {"id": field_template.id}
 
 @router.delete("/field_templates/{field_template_id}")
 async def delete_field_template(field_template_id: int, db = db_dependency):
 	logger.info(f"Admin requested deletion of field_template with id {field_template_id}.")
-	field_template = db.query(FieldTemplate).filter(FieldTemplate.id == field_template_id).first()
+	result = await db.execute(select(FieldTemplate).where(FieldTemplate.id == field_template_id))
+	field_template = result.scalars().first()
 	if not field_template:
 		logger.warning(f"FieldTemplate with id {field_template_id} not found.")
 		raise HTTPException(status_code=404, detail="FieldTemplate not found.")
-	db.delete(field_template)
-	db.commit()
+	form_template_id = field_template.form_template_id
+	await db.delete(field_template)
+	await db.commit()
+	if form_template_id is not None:
+		form_template_cache.invalidate(form_template_id)
 	logger.info(f"Deleted field_template with id {field_template_id}.")
-	return {"detail": "FieldTemplate deleted successfully.", "id": field_template_id}
\ No newline at end of file
+	return {"detail": "FieldTemplate deleted successfully.", "id": field_template_id}
+
+@router.get("/metrics")
+async def get_metrics():
+	"""
+	Snapshot of the in-process metrics registry (chat pipeline
+	latencies per mode, speculative reply outcomes, ...).
+	"""
+	return REGISTRY.snapshot()
+
+@router.get("/llm_pools")
+async def get_llm_pools(request: Request):
+	"""
+	Connection pool state of each LLM provider's HTTP client
+	(requests active/queued, connections opened, limits).
+	"""
+	return request.app.state.openai_client.pool_stats()
+
+
+@router.get("/prompts")
+async def list_prompts():
+	"""
+	List the prompt templates currently cached in memory.
+	"""
+	return prompt_registry.describe()
+
+@router.post("/prompts/reload")
+async def reload_prompts(
+	name: str = Query(None, description="Template to reload (e.g. update_form); all templates if omitted")
+):
+	"""
+	Re-read prompt templates from disk without restarting the server.
+	"""
+	logger.info(f"Admin requested reload of prompt template(s): {name or 'all'}.")
+	try:
+		reloaded = prompt_registry.reload(name)
+	except (KeyError, FileNotFoundError):
+		raise HTTPException(status_code=404, detail="Prompt template not found.")
+	return {"reloaded": reloaded}
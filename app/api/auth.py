@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Request
+from sqlalchemy import select
 from app.core.dependencies import db_dependency, settings_dependency
 from app.db.models.user import User
 from app.schemas import user_schemas, auth_schemas
-from app.core.security import hash_password, verify_password
+from app.core.security import password_hasher, PasswordHasherBusy
 from app.core.jwt import create_access_token
 import logging
 
@@ -11,6 +12,14 @@ logger = logging.getLogger(__name__)
 # Create router for all auth-related endpoints
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+def _hasher_busy(e: PasswordHasherBusy) -> HTTPException:
+    logger.warning(f"Password hashing saturated, rejecting request: {e}")
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-in requests, please retry shortly.",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 @router.post("/register")
 async def register_user(
     payload: user_schemas.UserCreateSchema,
@@ -24,23 +33,29 @@ async def register_user(
     1. Validate the incoming user data,
        ensuring the email is unique.
     """
-    existing = db.query(User).filter(User.email == payload.email).first()
+    result = await db.execute(select(User).where(User.email == payload.email))
+    existing = result.scalars().first()
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered.")
+    # Don't hold a connection while the password is hashed
+    await db.close()
     
     """
-    2. Create new User instance, hash the password,
-       and store in the database.
+    2. Create new User instance, hash the password (off the
+       event loop), and store in the database.
     """
+    try:
+        hashed_password = await password_hasher.hash(payload.password)
+    except PasswordHasherBusy as e:
+        raise _hasher_busy(e)
     user = User(
         email=payload.email,
-        hashed_password=hash_password(payload.password),
+        hashed_password=hashed_password,
         firstname=payload.firstname,
         lastname=payload.lastname
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
 
     return {
         "id": user.id, 
@@ -65,8 +80,18 @@ async def login_user(
 
     logger.info(f"Login attempt for email: {payload.email}")
 
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(plain_password=payload.password, hashed_password=user.hashed_password):
+    result = await db.execute(select(User).where(User.email == payload.email))
+    user = result.scalars().first()
+    # Don't hold a connection while the password is verified
+    await db.close()
+    try:
+        valid = user is not None and await password_hasher.verify(
+            plain_password=payload.password,
+            hashed_password=user.hashed_password
+        )
+    except PasswordHasherBusy as e:
+        raise _hasher_busy(e)
+    if not valid:
         logger.warning(f"Failed login attempt for email: {payload.email}")
         raise HTTPException(status_code=401, detail="Invalid email or password.")
     
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi import APIRouter, HTTPException, Request, Depends, WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
-from app.core.dependencies import settings_dependency, openai_service_dependency, db_dependency, user_dependency
-from app.db.models.field_submission import FieldSubmission
+from pydantic import ValidationError
+from app.core.dependencies import settings_dependency, openai_service_dependency, db_dependency, user_dependency, authenticate_token
 from app.db.models.form import Form
 from app.db.models.message import Message
 from app.db.models.conversation import Conversation
 from app.schemas.chat_schemas import InitiateChatResponse, AdvanceChatRequest, AdvanceChatResponse
-from app.schemas.openai_schemas import UpdateFormLLMOutput, DefaultLLMOutput
-from app.utils.langgraph_utils import read_markdown_file
+from app.services.chat_service import ChatTurn, CHAT_TURN_SECONDS
+from app.services.conversation_history_cache import conversation_history_cache
+import json
+import time
 import logging
 
 # Create router for all chat-related endpoints
@@ -42,20 +45,21 @@ Family Center for Innovation. How can I assist you today?"""
             user_id=user.id,
             form_template_id=1
         )
-        db.add(db_form)
-        db.commit()
-        db.refresh(db_form)
 
-        # Create new conv record
+        # Create new conv record. Linking through the relationship lets
+        # one flush insert both rows (form first, its id via RETURNING)
+        # in a single transaction.
         db_conv = Conversation(
             title=f"CFCI x {user.firstname} {user.lastname} Chat",
             user_id=user.id,
-            form_id=db_form.id
+            form=db_form
         )
 
         db.add(db_conv)
-        db.commit()
-        db.refresh(db_conv)
+        await db.commit()
+        # The new conversation's (empty) history is known, so its first
+        # turn doesn't need to read it
+        conversation_history_cache.put(db_conv.id, 0, 0, [])
         logger.info(f"Conversation created with ID {db_conv.id} for user {user.id}.")
     except Exception as e:
         logger.error(f"Error creating conversation for user {user.id}: {e}")
@@ -102,7 +106,8 @@ async def advance_chat(
     request: Request,
     db = db_dependency,
     user = user_dependency,
-    openai_service = openai_service_dependency
+    openai_service = openai_service_dependency,
+    settings = settings_dependency
 ):
     """
     Main endpoint used to advance an existing conversation.
@@ -119,266 +124,236 @@ async def advance_chat(
            the form but new information given), uses LLM calls to synthesize.
         c. Once form is updated, final LLM call generates the agent's next message,
            question, response, etc.
+
+    Each step is implemented on `ChatTurn` (app/services/chat_service.py).
+
+    With `CHAT_PIPELINE_MODE=speculative`, steps 4-6 run LLM call 2
+    concurrently with LLM call 1 (see `ChatTurn.run_speculative`).
+
+    Idempotent per (conversation_id, message_step_num): a retried step
+    returns the same agent message without calling the LLM again (see
+    `ChatTurn.claim` and `ChatTurn.add_user_message`).
     """
+    turn = ChatTurn(db=db, user=user, openai_service=openai_service, payload=payload)
 
     """
     1. Load conv from db, raise exception if conversation
        not found or malformed.
     """
-    conv = db.query(Conversation).get(payload.conversation_id)
-    if not conv or conv.user_id != user.id:
-        logger.error(f"Conversation ID {payload.conversation_id} not found or does not belong to user {user.id}.")
-        raise HTTPException(status_code=404, detail="Conversation not found.")
+    await turn.load_conversation()
 
-    """
-    2. Add user's latest message to the db.
-    """
+    if not await turn.claim():
+        # A retry of a step still running in this process: its
+        # original has finished, return the same agent message
+        return turn.to_response()
     try:
-        user_message = Message(
-            sender="user",
-            message_num=payload.message_step_num,
-            content=payload.user_message,
-            user_id=user.id,
-            conversation_id=conv.id
-        )
-        db.add(user_message)
-        db.commit()
-        db.refresh(user_message)
-        logger.info(f"User message added to conversation {conv.id} with message num {user_message.message_num} and system ID {user_message.id}.")
-    except Exception as e:
-        logger.error(f"Fatal error adding user message to conversation {conv.id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to add user message.")
-
+        """
+        2. Add user's latest message to the db. If this step was already
+           answered (a retried request), return the stored agent message;
+           otherwise charge the turn to the user's rate limit.
+        """
+        await turn.add_user_message()
+        if turn.replayed:
+            return turn.to_response()
+        await turn.admit()
+
+        turn_start = time.perf_counter()
+
+        """
+        3. Load the latest state of the conversation's form, then
+           load recent messages and commit, releasing the DB connection
+           for the duration of the LLM calls (steps 4-6).
+        """
+        await turn.load_form_context()
+        await turn.release_connection()
+
+        if settings.chat_pipeline_mode == "speculative":
+            """
+            4-6. Run LLM CALL 1 and a speculative LLM CALL 2 concurrently,
+                 apply the field updates, and keep or regenerate the reply.
+            """
+            output_text = await turn.run_speculative(min_confidence=settings.speculative_min_confidence)
+        else:
+            """
+            4. LLM CALL 1 - call first LLM with "update_form" prompt
+               to make any necessary updates to the form (skipped when
+               the extraction gate finds nothing form-related in the
+               message, see `ChatTurn.should_extract`).
+            5. Apply the field updates from step 4 to the form state
+               (written to the database in step 7).
+            """
+            await turn.update_form()
+
+            """
+            6. LLM CALL 2 - call second LLM with "generate_response" prompt
+               to generate the agent's next message or question in the conversation.
+            """
+            turn.rebuild_form_context()
+            output_text = await turn.generate_response()
+
+        CHAT_TURN_SECONDS.labels(mode=settings.chat_pipeline_mode).observe(time.perf_counter() - turn_start)
+
+        """
+        7. Load agent's next message and the form's field updates into
+           the DB in one transaction, return response with agent's
+           message details.
+        """
+        await turn.add_agent_message(output_text)
+
+        return turn.to_response()
+    finally:
+        turn.release()
+
+
+def _sse_event(event: str, data: dict) -> str:
     """
-    3. Load the latest state of the conversation's form.
-       Specifically, load:
-        a.  The `form_template` record associated with the 
-          conversation's form.
-        b. All `field_submission` records associated with 
-          the conversation's form.
-       
-       Then format context in the following format:
-        ```### LATEST STATE OF THE FORM
-           Field name: Business/Org Title
-           Field data type: String
-           Field instructions: The title of the business or org...
-           Current value: NONE
-           --
-           Field name: Project Description
-           Field data type: String
-           Field instructions: A detailed description of the business's project...
-           --
-           ...
-        ```
+    Format a single Server-Sent Event frame.
     """
-    try:
-        form = conv.form
-        if not form:
-            logger.warning(f"No form associated with conversation {conv.id}.")
-
-        form_template = form.form_template if form else None
-        if form_template == None:
-            logger.warning(f"No form template associated with form {form.id if form else None} in conversation {conv.id}.")
-
-        field_templates = form_template.field_templates if form_template else []
-        if len(field_templates) == 0:
-            logger.warning(f"No field templates associated with form template {form_template.id if form_template else None} in conversation {conv.id}.")
-
-        field_submissions = [fs for fs in form.field_submissions] if form else []
-
-        form_context: str = "### LATEST STATE OF THE FORM\n\n"
-
-        for field_template in field_templates:
-            submission = next((fs for fs in field_submissions if fs.field_template_id == field_template.id), None)
-            form_context += f"Field name: {field_template.name}\n"
-            form_context += f"Template field ID: {field_template.id}\n"
-            form_context += f"Field data type: {field_template.field_type}\n"
-            form_context += f"Field instructions: {field_template.description}\n"
-            form_context += f"Current value: {submission.value if submission else 'NONE'}\n"
-            form_context += "--\n"
-        logger.info(f"Successfully loaded form context for conversation {conv.id}.")
-    except Exception as e:
-        logger.error(f"Fatal error loading form context for conversation {conv.id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to load form context.")
-    
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class _TurnStreamingResponse(StreamingResponse):
     """
-    4. LLM CALL 1 - call first LLM with "update_form" prompt
-       to make any necessary updates to the form.
-
-       LLM will return in the following format:
-        ```json
-            {
-                "fields_to_update": [
-                    {
-                        "type": "create" | "update",
-                        "template_field_id": "abc123",
-                        "field_name": "Business/Org Title",
-                        "new_value": "New Title Here",
-                        "confidence": 0.95,
-                        "reasoning": "The user mentioned the new title explicitly..."
-                    },
-                    {
-                        "type": "create" | "update",
-                        "template_field_id": "def456",
-                        "field_name": "Project Description",
-                        "new_value": "Updated project description here.",
-                        "confidence": 0.87,
-                        "reasoning": "The user provided additional details about the project..."
-                    },
-                    ...
-                ]
-            }
-        ```
+    `StreamingResponse` that releases its chat turn (see
+    `ChatTurn.release`) once the response is over, however it ended.
+    The body generator's own cleanup only runs if it was iterated: a
+    client that disconnects, or a failed `http.response.start`, before
+    the first chunk would otherwise leave the conversation locked.
     """
-    try:
-        # Load prompt template, fill in with form context
-        prompt_template = read_markdown_file("app/prompts/update_form.md")
-        full_prompt = prompt_template.replace("{{FORM_CONTEXT}}", form_context)
-        chat_history = ""
-
-        # Fill in prompt with previous 10 messages in the conv (load
-        # 20 for later usage)
-        recent_messages = (
-            db.query(Message)
-            .filter(Message.conversation_id == conv.id)
-            .order_by(Message.message_num.desc())
-            .limit(20)
-            .all()
-        )
-        recent_messages.reverse() # So oldest messages first
-
-        recent_messages_llm1 = recent_messages[-10:]  # Last 10 messages for LLM 1
-
-        for msg in recent_messages_llm1:
-            role = "User" if msg.sender == "user" else "Agent"
-            chat_history += f"{role}: {msg.content}\n"
-        full_prompt = full_prompt.replace("{{CHAT_HISTORY}}", chat_history)
-        logger.info(f"Successfully loaded and filled update_form prompt for conversation {conv.id}.")
 
-        logger.info(f"FULL PROMPT LLM CALL 1: {full_prompt}")
-
-        # Call LLM to get fields to update
-        logger.info(f"LLM CALL 1 - calling LLM to update form for conversation {conv.id}.")
-        llm_response = openai_service.handle_message(
-            user_prompt=full_prompt,
-            response_format=UpdateFormLLMOutput,
-            system_prompt=""
-        ).get("response")
-        logger.info(f"LLM CALL 1 - received response from LLM to update form for conversation {conv.id}.")
+    def __init__(self, content, turn: ChatTurn, **kwargs):
+        super().__init__(content, **kwargs)
+        self.turn = turn
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                await self.body_iterator.aclose()
+            finally:
+                self.turn.release()
+
+@router.post("/advance/stream")
+async def advance_chat_stream(
+    payload: AdvanceChatRequest,
+    request: Request,
+    db = db_dependency,
+    user = user_dependency,
+    openai_service = openai_service_dependency
+):
+    """
+    Streaming variant of `/advance`, served as Server-Sent Events.
 
-        logger.info(f"LLM CALL 1 RESPONSE: {llm_response}")
+    Steps 1-5 run exactly as in `/advance` before the response starts, so
+    request errors (404 conversation, failed form update...) are still
+    returned as normal HTTP errors. LLM call 2 is then streamed:
 
-    except Exception as e:
-        logger.error(f"Fatal error during LLM call to update form for conversation {conv.id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to update form via LLM.")
+        event: token   data: {"delta": "..."}           (repeated)
+        event: done    data: <AdvanceChatResponse>      (after the agent
+                                                          message is stored)
+        event: error   data: {"detail": "..."}          (if the stream fails)
 
+    A retried step (same message_step_num) is answered with the stored
+    agent message as a single `token` event followed by `done`.
     """
-    5. Update fields in the database as necessary based on
-       LLM response from step 4.
-    """
-    try:
-        for field_update in llm_response.fields_to_update:
-            if field_update.type == "create":
-                # Create new FieldSubmission
-                new_submission = FieldSubmission(
-                    value=field_update.new_value,
-                    llm_confidence=field_update.confidence,
-                    status="DRAFT",
-                    form_id=form.id,
-                    field_template_id=field_update.template_field_id
-                )
-                db.add(new_submission)
-                logger.info(f"Created new FieldSubmission for field {field_update.field_name} in conversation {conv.id}.")
-            elif field_update.type == "update":
-                # Update existing FieldSubmission.
-                # Find from the list we loaded earlier.
-                submission = next((fs for fs in form.field_submissions if fs.field_template_id == 
-                                   field_update.template_field_id), None)
-                if submission:
-                    submission.value = field_update.new_value
-                    submission.llm_confidence = field_update.confidence
-                    submission.status = "FINAL"
-                    db.add(submission)
-                    logger.info(f"Updated FieldSubmission for field {field_update.field_name} in conversation {conv.id}.")
-        db.commit()
-        logger.info(f"Successfully updated form fields in database for conversation {conv.id}.")
-    except Exception as e:
-        logger.error(f"Fatal error updating form fields in database for conversation {conv.id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to update form fields in database.")
+    turn = ChatTurn(db=db, user=user, openai_service=openai_service, payload=payload)
+
+    # 1-5. Same as /advance
+    await turn.load_conversation()
+    if await turn.claim():
+        try:
+            await turn.add_user_message()
+            if not turn.replayed:
+                await turn.admit()
+                await turn.load_form_context()
+                await turn.release_connection()
+                await turn.update_form()
+                turn.rebuild_form_context()
+        except BaseException:
+            turn.release()
+            raise
+
+    async def event_stream():
+        # 6. Stream LLM call 2, 7. persist and send final metadata
+        try:
+            if turn.replayed:
+                yield _sse_event("token", {"delta": turn.agent_message.content})
+                yield _sse_event("done", turn.to_response().model_dump())
+                return
+            deltas = []
+            async for delta in turn.stream_response():
+                deltas.append(delta)
+                yield _sse_event("token", {"delta": delta})
+            await turn.add_agent_message("".join(deltas))
+            yield _sse_event("done", turn.to_response().model_dump())
+        except HTTPException as e:
+            yield _sse_event("error", {"detail": e.detail})
+
+    return _TurnStreamingResponse(
+        event_stream(),
+        turn,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
+@router.websocket("/advance/ws")
+async def advance_chat_ws(
+    websocket: WebSocket,
+    token: str = Query(..., description="Access token (browsers cannot set headers on websockets)"),
+    db = db_dependency,
+    openai_service = openai_service_dependency
+):
     """
-    6. LLM CALL 2 - call second LLM with "generate_response" prompt
-       to generate the agent's next message or question in the conversation.
+    WebSocket variant of `/advance/stream`. One socket can carry many
+    turns: the client sends an `AdvanceChatRequest` JSON object per turn
+    and receives the same `token` / `done` / `error` events as the SSE
+    endpoint, as JSON objects with an `event` key. Retried steps are
+    replayed as in `/advance/stream`.
     """
-    # Rebuild form context after updates
     try:
-        field_submissions = [fs for fs in form.field_submissions] if form else [] # Reload submissions
-        form_context: str = "### LATEST STATE OF THE FORM\n\n"
-
-        for field_template in field_templates:
-            submission = next((fs for fs in field_submissions if fs.field_template_id == field_template.id), None)
-            form_context += f"Field name: {field_template.name}\n"
-            form_context += f"Field data type: {field_template.field_type}\n"
-            form_context += f"Field instructions: {field_template.description}\n"
-            form_context += f"Current value: {submission.value if submission else 'NONE'}\n"
-            form_context += "--\n"
-        logger.info(f"Successfully rebuilt form context for conversation {conv.id} after updates.")
-    except Exception as e:
-        logger.error(f"Fatal error rebuilding form context for conversation {conv.id} after updates: {e}")
-        raise HTTPException(status_code=500, detail="Failed to rebuild form context.")
-    
-    # Load prompt template, fill in with form context and recent chat history,
-    # make LLM call
+        user = await authenticate_token(token, db)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    # Don't hold a connection while waiting on the client
+    await db.close()
+
+    await websocket.accept()
     try:
-        prompt_template = read_markdown_file("app/prompts/generate_response.md")
-        full_prompt = prompt_template.replace("{{FORM_CONTEXT}}", form_context)
-
-        # Fill in prompt with previous 30 messages in the conv
-        chat_history = ""
-        for msg in recent_messages:
-            role = "User" if msg.sender == "user" else "Agent"
-            chat_history += f"{role}: {msg.content}\n"
-        full_prompt = full_prompt.replace("{{CHAT_HISTORY}}", chat_history)
-        full_prompt = full_prompt.replace("{{LATEST_MESSAGE}}", user_message.content)
-        logger.info(f"Successfully loaded and filled generate_response prompt for conversation {conv.id}.")
-
-        # Call LLM to get agent's next message
-        logger.info(f"LLM CALL 2 - calling LLM to generate agent response for conversation {conv.id}.")
-        llm_response = openai_service.handle_message(
-            user_prompt=full_prompt,
-            response_format=DefaultLLMOutput,
-            system_prompt=""
-        ).get("response")
-        logger.info(f"LLM CALL 2 - received response from LLM to generate agent response for conversation {conv.id}.")
-    except Exception as e:
-        logger.error(f"Fatal error during LLM call to generate agent response for conversation {conv.id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to generate agent response via LLM.")
-    
-
-
-    """
-    7. Load agent's next message into the DB,
-       return response with agent's message details.
-    """
-    try:
-        agent_message = Message(
-            sender="agent",
-            message_num=user_message.message_num + 1,
-            content=llm_response.output_text,
-            user_id=user.id,
-            conversation_id=conv.id
-        )
-        db.add(agent_message)
-        db.commit()
-        db.refresh(agent_message)
-        logger.info(f"Agent message added to conversation {conv.id} with message num {agent_message.message_num} and system ID {agent_message.id}.")
-    except Exception as e:
-        logger.error(f"Fatal error adding agent message to conversation {conv.id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to add agent message.")
-    
-    return AdvanceChatResponse(
-        message_id=agent_message.id,
-        message_num=agent_message.message_num,
-        sender=agent_message.sender,
-        content=agent_message.content
-    )
\ No newline at end of file
+        while True:
+            try:
+                payload = AdvanceChatRequest.model_validate(await websocket.receive_json())
+            except (ValidationError, ValueError) as e:
+                await websocket.send_json({"event": "error", "detail": f"Invalid request: {e}"})
+                continue
+
+            turn = ChatTurn(db=db, user=user, openai_service=openai_service, payload=payload)
+            try:
+                await turn.load_conversation()
+                if await turn.claim():
+                    await turn.add_user_message()
+                if not turn.replayed:
+                    await turn.admit()
+                    await turn.load_form_context()
+                    await turn.release_connection()
+                    await turn.update_form()
+                    turn.rebuild_form_context()
+
+                    deltas = []
+                    async for delta in turn.stream_response():
+                        deltas.append(delta)
+                        await websocket.send_json({"event": "token", "delta": delta})
+                    await turn.add_agent_message("".join(deltas))
+                else:
+                    # Retried step: resend the stored agent message
+                    await websocket.send_json({"event": "token", "delta": turn.agent_message.content})
+                await websocket.send_json({"event": "done", **turn.to_response().model_dump()})
+            except HTTPException as e:
+                await websocket.send_json({"event": "error", "status_code": e.status_code, "detail": e.detail})
+            finally:
+                turn.release()
+                # Roll back whatever a failed turn left open and give the
+                # connection back before waiting for the next message
+                await db.close()
+    except WebSocketDisconnect:
+        logger.info(f"Chat websocket closed by user {user.id}.")
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import REGISTRY
+
+# Prometheus scrape endpoint, served at the root like other exporters
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    All registered metrics in the Prometheus text exposition format.
+    (`/api/admin/metrics` serves the same data as JSON.)
+    """
+    return PlainTextResponse(REGISTRY.exposition(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -2,6 +2,7 @@ import os
 import dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Literal
 
 dotenv.load_dotenv(".env.development.local")
 
@@ -21,6 +22,178 @@ class Settings(BaseSettings):
     airtable_api_key: str
     postgres_url: str
 
+    # Async engine connection pool (Postgres only; SQLite keeps the
+    # driver defaults). Chat turns only hold a connection while they
+    # query, never during LLM calls, so a small pool serves many
+    # concurrent turns.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # Seconds to wait for a free connection before failing the request
+    db_pool_timeout: float = 30.0
+    # Recycle connections older than this, ahead of server/proxy idle timeouts
+    db_pool_recycle: int = 1800
+
+    # Chat pipeline
+    # "sequential" runs form extraction, then reply generation.
+    # "speculative" runs both LLM calls concurrently and only regenerates
+    # the reply if extraction materially changed the form.
+    chat_pipeline_mode: Literal["sequential", "speculative"] = "sequential"
+    # Field updates below this LLM confidence don't count as a material
+    # change (the update_form prompt marks uncertain values with <0.3)
+    speculative_min_confidence: float = 0.3
+    # Rule-based gate ahead of LLM call 1 (see app/services/extraction_gate.py).
+    # "on" skips extraction for messages that can't change the form;
+    # "shadow" always extracts but records what the gate would have
+    # done, counting skips that would have lost an update; "off"
+    # disables it
+    extraction_gate_mode: Literal["off", "shadow", "on"] = "shadow"
+    # Parse messages that are just a value (an email, a date, "yes")
+    # locally instead of with LLM call 1, when every missing field has
+    # a deterministic type (see app/services/field_values.py)
+    local_field_extraction: bool = True
+    # Token budgets for CHAT_HISTORY in each prompt; the oldest
+    # messages that don't fit are left out
+    chat_history_tokens_update_form: int = 1500
+    chat_history_tokens_generate_response: int = 3000
+    # Older messages are folded into a rolling per-conversation summary
+    # (used by generate_response) once this many have piled up behind
+    # the newest ones, which are always kept verbatim
+    chat_summary_keep_recent_messages: int = 10
+    chat_summary_refresh_messages: int = 10
+    # LLM responses are cached by model, prompts and response format
+    # ("memory": per process, "disk": shared by the workers on a host,
+    # under llm_cache_dir; "off" disables it). Stored zstd-compressed
+    llm_cache_backend: Literal["off", "memory", "disk"] = "memory"
+    llm_cache_size: int = 1000
+    llm_cache_ttl_seconds: float = 3600.0
+    llm_cache_dir: str = ".cache/llm_responses"
+    llm_cache_compression_level: int = 3
+
+    # Admission control for LLM calls (see app/services/admission.py),
+    # per process: at most this many calls in flight, within the OpenAI
+    # account's rate limits for the model (divide them between workers).
+    # A call's tokens are estimated as its prompt plus the expected output
+    llm_max_concurrency: int = 32
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 150000
+    llm_expected_output_tokens: int = 300
+    # How long an LLM call or a chat turn may queue for admission; when
+    # the predicted wait is longer, it gets a 429 with Retry-After at once
+    admission_queue_timeout_seconds: float = 10.0
+    # Chat turns each user may start per minute, with bursts of up to
+    # chat_user_turn_burst (over that: 429 with Retry-After)
+    chat_user_turns_per_minute: float = 20.0
+    chat_user_turn_burst: int = 5
+    # How long a retried step waits for the original attempt still
+    # running in this process (longer than a turn's LLM deadlines);
+    # after that it gets a 409 with Retry-After
+    chat_turn_retry_wait_seconds: float = 60.0
+
+    # Resilience policy for LLM calls (see app/services/llm_resilience.py).
+    # Each call has a deadline, retries included, by prompt name, and
+    # each attempt its own timeout; attempts failing with timeouts,
+    # connection errors, 429s or 5xx are retried with jittered
+    # exponential backoff
+    llm_deadline_seconds: float = 30.0
+    llm_prompt_deadlines_seconds: dict[str, float] = {
+        "update_form": 20.0,
+        "generate_response": 30.0,
+        "summarize_history": 60.0
+    }
+    llm_attempt_timeout_seconds: float = 15.0
+    llm_max_attempts: int = 3
+    llm_retry_backoff_seconds: float = 0.5
+    llm_retry_backoff_max_seconds: float = 4.0
+    # Send a second, identical request when the first hasn't answered
+    # after the prompt's recent p95 latency (structured calls only,
+    # never streams), for at most llm_hedge_max_ratio of calls
+    llm_hedge: bool = False
+    llm_hedge_quantile: float = 0.95
+    llm_hedge_min_delay_seconds: float = 1.0
+    llm_hedge_min_samples: int = 20
+    llm_hedge_max_ratio: float = 0.1
+    # Fail LLM calls fast (503 with Retry-After) for the cooldown once
+    # this share of at least min_calls calls in the window failed
+    llm_breaker_window_seconds: float = 30.0
+    llm_breaker_min_calls: int = 10
+    llm_breaker_failure_ratio: float = 0.5
+    llm_breaker_cooldown_seconds: float = 15.0
+
+    # LLM routing (see app/services/llm_router.py). Each prompt name maps
+    # to "provider:model" candidates, best first; a call that fails on
+    # one moves on to the next. Providers without an API key are skipped
+    anthropic_api_key: str = ""
+    gemini_api_key: str = ""
+    anthropic_max_tokens: int = 1024
+    llm_routes: dict[str, list[str]] = {
+        "update_form": ["openai:gpt-4o", "anthropic:claude-sonnet-4-5", "gemini:gemini-2.5-pro"],
+        "generate_response": ["openai:gpt-4o", "anthropic:claude-sonnet-4-5", "gemini:gemini-2.5-pro"],
+        "summarize_history": ["openai:gpt-4o-mini", "anthropic:claude-haiku-4-5", "gemini:gemini-2.5-flash"]
+    }
+    llm_default_route: list[str] = ["openai:gpt-4o"]
+    # Candidate order: "ordered" as configured, or by observed latency,
+    # estimated cost, or both ("balanced", a dollar counting as
+    # llm_router_seconds_per_dollar seconds)
+    llm_router_selection: Literal["ordered", "latency", "cost", "balanced"] = "ordered"
+    llm_router_seconds_per_dollar: float = 100.0
+    # HTTP connection pool per LLM provider (see app/services/llm_http.py).
+    # Sized above llm_max_concurrency so admitted calls (and their hedges)
+    # never queue for a connection; idle connections are kept warm for
+    # keepalive_expiry, under the providers' ~90s idle timeouts. HTTP/2
+    # uses the h2 package from requirements.txt (without it, HTTP/1.1)
+    llm_http_max_connections: int = 64
+    llm_http_max_keepalive_connections: int = 32
+    llm_http_keepalive_expiry_seconds: float = 60.0
+    llm_http2: bool = True
+    llm_http_connect_timeout_seconds: float = 5.0
+    # Per read/write of a single request; whole calls are bounded by
+    # the resilience deadlines above
+    llm_http_timeout_seconds: float = 60.0
+    # Connections opened per provider at startup
+    llm_http_warm_connections: int = 4
+    # Deterministic local "fake:<model>" provider, for load tests
+    llm_fake_provider: bool = False
+    llm_fake_provider_latency_seconds: float = 0.5
+
+    # Rendered chat history of active conversations is cached per
+    # process (LRU), so turns append to it instead of re-reading it;
+    # the TTL frees idle conversations
+    conversation_history_cache_size: int = 1000
+    conversation_history_cache_ttl_seconds: float = 1800.0
+
+    # Prompt templates are cached in memory; when auto-reload is on,
+    # each template's mtime is re-checked at most this often
+    prompt_auto_reload: bool = True
+    prompt_reload_check_seconds: float = 2.0
+
+    # Compiled form templates are cached per process; admin edits
+    # invalidate them, the TTL covers edits made by other workers
+    form_template_cache_size: int = 128
+    form_template_cache_ttl_seconds: float = 300.0
+
+    # Authenticated users are cached per process by user id, decoded
+    # tokens until they expire. Deleting a user invalidates the local
+    # entry; the TTL bounds how long other workers keep serving it
+    principal_cache_size: int = 10000
+    principal_cache_ttl_seconds: float = 60.0
+    token_cache_size: int = 10000
+
+    # bcrypt cost factor for new password hashes (each +1 doubles the
+    # work); existing hashes keep the cost they were created with
+    bcrypt_rounds: int = 12
+    # Password hashing runs on its own thread pool; calls beyond
+    # workers + queue limit get a 503 with Retry-After
+    password_hash_workers: int = 2
+    password_hash_queue_limit: int = 32
+
+    # Request log (one JSON line per request on stdout). Errors (5xx)
+    # and requests slower than the threshold are always logged; other
+    # requests are sampled at this rate (0 disables them)
+    request_log_sample_rate: float = 1.0
+    request_log_slow_ms: float = 2000.0
+    # Lines waiting for the writer thread; beyond this they are dropped
+    request_log_queue_size: int = 10000
+
     model_config: SettingsConfigDict = {
         "env_file": (
             ".env.development",
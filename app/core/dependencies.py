@@ -1,19 +1,21 @@
 from fastapi import Depends, Request, Header, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import get_settings
-from jose import JWTError
-from app.core.jwt import decode_token
-from app.services.openai_service import OpenAIService
-from app.db.database import get_db
-from app.db.models.user import User
+from app.services.llm_router import LLMRouter
+from app.services.principal_cache import principal_cache, Principal
+from app.db.database import get_db, get_async_db
 import logging
 
 # LOGGER FOR TESTING
 logger = logging.getLogger(__name__)
 
 
-# Database dependency
-db_dependency = Depends(get_db)
+# Database dependency (async session, used by all routes)
+db_dependency = Depends(get_async_db)
+
+# Sync database dependency, kept for scripts and tooling
+# that still run on the blocking engine
+sync_db_dependency = Depends(get_db)
 
 # Define settings dependency (used for routes)
 settings_dependency = Depends(get_settings)
@@ -21,10 +23,33 @@ settings_dependency = Depends(get_settings)
 # Security dependency for extracting and verifying JWT tokens
 bearer_scheme = HTTPBearer(auto_error=True)
 
-def get_openai_service(request: Request) -> OpenAIService:
+def get_openai_service(request: Request) -> LLMRouter:
     return request.app.state.openai_client
 
-def get_current_user(
+async def authenticate_token(token: str, db) -> Principal:
+    """
+    Decode and validate a raw JWT and return the user it belongs to.
+    Shared by the bearer-header dependency and the websocket endpoint,
+    which cannot send an Authorization header from the browser.
+
+    Both the decoded token and the user are served from
+    `principal_cache` when possible, in which case `db` is never
+    used (and no connection is checked out).
+    """
+
+    # Decode the token
+    user_id = principal_cache.user_id_for_token(token)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    # Load the user
+    user = await principal_cache.get(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return user
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     db = db_dependency
 ):
@@ -38,26 +63,7 @@ def get_current_user(
     # Extract the raw token (no need to reconstruct "Bearer ...")
     token = credentials.credentials
 
-    # Decode the token
-    try:
-        payload = decode_token(token)
-        if not payload:
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
-
-        # FIX: use the field you actually encode
-        user_id = payload.get("user_id")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Token decode error")
-
-    # Load the user
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    return user
+    return await authenticate_token(token, db)
 
 user_dependency = Depends(get_current_user)
 
@@ -0,0 +1,247 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from sqlalchemy import event
+from app.core import metrics
+
+"""
+Per-request instrumentation: a pure-ASGI middleware that times every
+HTTP request and attributes its latency to phases (DB, LLM, render),
+then emits one JSON line per request through a queue-backed log
+handler.
+
+Code being timed marks its phase with
+
+    with instrumentation.phase("llm"):
+        ...
+
+which is a no-op outside a request. DB time is collected
+automatically from engine events (`track_db_phase`). Phase times are
+summed per request, so overlapping work (e.g. speculative LLM calls)
+can add up to more than the request's wall time.
+
+Request and response bodies are never read, and headers are never
+logged.
+"""
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_seconds",
+    "HTTP request latency, by method, route template and status",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_PHASE_SECONDS = metrics.histogram(
+    "http_request_phase_seconds",
+    "Time spent per phase (db, llm, render) within an HTTP request, by route template",
+    ["route", "phase"]
+)
+HTTP_REQUESTS_IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled (including streaming responses)"
+)
+WEBSOCKETS_OPEN = metrics.gauge(
+    "websocket_connections_open",
+    "WebSocket connections currently open"
+)
+REQUEST_LOG_DROPPED = metrics.counter(
+    "request_log_dropped_total",
+    "Request log lines dropped because the log queue was full"
+)
+
+PHASES = ("db", "llm", "render")
+
+request_logger = logging.getLogger("app.requests")
+
+# Timings of the request being handled: {phase: [seconds, count]}
+_request_phases = contextvars.ContextVar("request_phases", default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Attribute the time spent in the block to `name` for the current
+    request. Does nothing when called outside a request.
+    """
+    phases = _request_phases.get()
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_phase_time(phases, name, time.perf_counter() - start)
+
+
+def record_phase(name: str, seconds: float, calls: int = 1):
+    """
+    Attribute already-measured time to `name` for the current request,
+    for work that can't be wrapped in a single `phase()` block.
+    """
+    phases = _request_phases.get()
+    if phases is not None:
+        _add_phase_time(phases, name, seconds, calls)
+
+
+def _add_phase_time(phases: dict, name: str, seconds: float, calls: int = 1):
+    entry = phases.get(name)
+    if entry is None:
+        phases[name] = [seconds, calls]
+    else:
+        entry[0] += seconds
+        entry[1] += calls
+
+
+def track_db_phase(sync_engine):
+    """
+    Count every statement executed on an engine (pass
+    `async_engine.sync_engine` for async engines) towards the current
+    request's "db" phase.
+    """
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and _request_phases.get() is not None:
+            context._phase_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        phases = _request_phases.get()
+        start = getattr(context, "_phase_start", None)
+        if phases is not None and start is not None:
+            _add_phase_time(phases, "db", time.perf_counter() - start)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    `QueueHandler` over a bounded queue that drops records instead of
+    blocking the event loop when the writer thread falls behind.
+    """
+
+    def prepare(self, record):
+        # The message is already a JSON string; skip QueueHandler's
+        # formatting and traceback handling
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            REQUEST_LOG_DROPPED.inc()
+
+
+class RequestLogSink:
+    """
+    Owns the queue between `request_logger` and the thread that writes
+    request log lines to stdout. `start()`/`stop()` are called from
+    the app lifespan; until started, lines queue up (and are dropped
+    once the queue is full).
+    """
+
+    def __init__(self, maxsize: int = 10000, stream=None):
+        self.queue = queue.Queue(maxsize=maxsize)
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(logging.Formatter("%(message)s"))
+        self._listener = logging.handlers.QueueListener(self.queue, output)
+        self._started = False
+
+        request_logger.handlers = [_DroppingQueueHandler(self.queue)]
+        request_logger.setLevel(logging.INFO)
+        request_logger.propagate = False
+
+    def start(self):
+        if not self._started:
+            self._listener.start()
+            self._started = True
+
+    def stop(self):
+        if self._started:
+            self._listener.stop()
+            self._started = False
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Pure-ASGI middleware (no body buffering, streaming untouched) that
+    records method, route template, status and latency per HTTP
+    request, split into phases.
+
+    Every request is recorded in the metrics registry. Log lines are
+    sampled: a `sample_rate` fraction of requests is logged, plus
+    every 5xx and every request slower than `slow_ms`.
+    WebSockets are only counted while open; lifespan passes straight
+    through.
+    """
+
+    def __init__(self, app, sample_rate: float = 1.0, slow_ms: float = 2000.0):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            WEBSOCKETS_OPEN.inc()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                WEBSOCKETS_OPEN.dec()
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        phases = {}
+        token = _request_phases.set(phases)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            _request_phases.reset(token)
+            self._record(scope, status_code, time.perf_counter() - start, phases)
+
+    def _record(self, scope, status_code: int, seconds: float, phases: dict):
+        route = scope.get("route")
+        # Unmatched paths share one label so 404 scans can't blow up
+        # the metric's cardinality
+        route_path = getattr(route, "path", None) or "<unmatched>"
+        method = scope["method"]
+
+        HTTP_REQUEST_SECONDS.labels(method=method, route=route_path, status=status_code).observe(seconds)
+        for name, (phase_seconds, _count) in phases.items():
+            HTTP_REQUEST_PHASE_SECONDS.labels(route=route_path, phase=name).observe(phase_seconds)
+
+        duration_ms = seconds * 1000
+        if not (
+            status_code >= 500
+            or duration_ms >= self.slow_ms
+            or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        ):
+            return
+
+        line = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "method": method,
+            "route": route_path,
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+        }
+        for name in PHASES:
+            phase_seconds, count = phases.get(name, (0.0, 0))
+            line[f"{name}_ms"] = round(phase_seconds * 1000, 2)
+            line[f"{name}_calls"] = count
+        request_logger.info(json.dumps(line))
@@ -0,0 +1,269 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+"""
+Minimal in-process metrics registry (counters, gauges, histograms)
+with Prometheus-style names and labels.
+
+Metrics are declared once at module level where they are used, e.g.
+
+    CHAT_TURN_SECONDS = metrics.histogram(
+        "chat_turn_seconds", "End-to-end chat turn latency", ["mode"]
+    )
+    CHAT_TURN_SECONDS.labels(mode="sequential").observe(1.23)
+
+and read back through `REGISTRY.snapshot()` (JSON, /api/admin/metrics)
+or `REGISTRY.exposition()` (Prometheus text format, /metrics).
+
+Recording is cheap enough to leave on everywhere: an observation is
+a dict lookup for the label values, a bisect over the buckets and an
+uncontended lock, a few microseconds (see app/api/README.md and
+benchmarks/bench_metrics_overhead.py).
+"""
+
+# Latency buckets (seconds), sized for LLM-backed requests
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _default(self):
+        # Unlabelled metrics are used directly, e.g. `counter.inc()`
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        return [(dict(zip(self.labelnames, key)), child) for key, child in list(self._children.items())]
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile from the bucket counts (upper bound of
+        the bucket holding the q-th observation).
+        """
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for upper, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return upper
+        return float("inf")
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Re-importing a module must not create a second series
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def metrics(self):
+        return list(self._metrics.values())
+
+    def snapshot(self) -> dict:
+        """
+        JSON-friendly view of every registered metric.
+        """
+        snapshot = {}
+        for metric in self.metrics():
+            series = []
+            for labels, child in metric.samples():
+                if metric.kind == "histogram":
+                    series.append({
+                        "labels": labels,
+                        "count": child.count,
+                        "sum": child.sum,
+                        "mean": child.sum / child.count if child.count else 0.0,
+                        "p50": child.quantile(0.5),
+                        "p95": child.quantile(0.95),
+                        "p99": child.quantile(0.99),
+                    })
+                else:
+                    series.append({"labels": labels, "value": child.value})
+            snapshot[metric.name] = {"type": metric.kind, "help": metric.documentation, "series": series}
+        return snapshot
+
+
+    def exposition(self) -> str:
+        """
+        Render every registered metric in the Prometheus text
+        exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, child in metric.samples():
+                if metric.kind == "histogram":
+                    with child._lock:
+                        counts = list(child.counts)
+                        total, count = child.sum, child.count
+                    running = 0
+                    for upper, bucket_count in zip(metric.buckets + (float("inf"),), counts):
+                        running += bucket_count
+                        le = "+Inf" if upper == float("inf") else _format_value(upper)
+                        lines.append(f"{metric.name}_bucket{_format_labels(labels, le=le)} {running}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {count}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(child.value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r'\"').replace("\n", r"\n")
+
+
+def _format_labels(labels: dict, **extra) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames=()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
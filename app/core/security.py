@@ -1,20 +1,121 @@
 import bcrypt
-import logging
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import get_settings
+from app.core import metrics
 
 # pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+settings = get_settings()
+
+PASSWORD_HASH_SECONDS = metrics.histogram(
+    "password_hash_seconds",
+    "Time spent in bcrypt on the password worker pool, by operation",
+    ["op"]
+)
+PASSWORD_HASH_QUEUED = metrics.gauge(
+    "password_hash_in_flight",
+    "Password hash/verify calls running or queued on the worker pool"
+)
+PASSWORD_HASH_REJECTED = metrics.counter(
+    "password_hash_rejected_total",
+    "Password hash/verify calls rejected because the worker pool queue was full",
+    ["op"]
+)
+
 def hash_password(password: str) -> str:
     """
     Hash a plain password using bcrypt.
+    Blocking (CPU-bound); routes use `password_hasher.hash` instead.
     """
-    logging.debug("Hashing password: {}".format(password))
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a plain password against its hashed version.
+    Blocking (CPU-bound); routes use `password_hasher.verify` instead.
 
     Returns:
     - bool: True if the password matches, False otherwise.
     """
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
\ No newline at end of file
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the password worker pool's queue is full.
+    `retry_after` is a whole number of seconds for the Retry-After header.
+    """
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hashing is saturated, retry in {retry_after}s.")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool so that a burst of
+    logins can't stall the event loop (and every chat turn on it).
+    bcrypt releases the GIL while hashing, so threads run in parallel.
+
+    At most `workers + queue_limit` calls are admitted at once; past
+    that, calls fail fast with `PasswordHasherBusy` instead of queueing
+    without bound. A call counts until its bcrypt job has finished (or
+    been dropped from the queue), even if its caller was cancelled.
+    """
+
+    def __init__(self, workers: int = 2, queue_limit: int = 32):
+        self.workers = workers
+        self.capacity = workers + queue_limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        # Running estimate of one bcrypt call, for Retry-After
+        self._avg_seconds = 0.25
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.in_flight / self.workers * self._avg_seconds))
+
+    async def _run(self, op: str, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                PASSWORD_HASH_REJECTED.labels(op=op).inc()
+                raise PasswordHasherBusy(self.retry_after())
+            self.in_flight += 1
+        PASSWORD_HASH_QUEUED.inc()
+        job = self._executor.submit(self._timed, op, fn, *args)
+        # Runs on the worker thread once the job finishes, or wherever
+        # it is cancelled before it starts
+        job.add_done_callback(self._done)
+        return await asyncio.wrap_future(job)
+
+    def _done(self, job):
+        with self._lock:
+            self.in_flight -= 1
+        PASSWORD_HASH_QUEUED.dec()
+
+    def _timed(self, op: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            PASSWORD_HASH_SECONDS.labels(op=op).observe(elapsed)
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    queue_limit=settings.password_hash_queue_limit
+)
@@ -1,7 +1,12 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
+from app.db.pool import InstrumentedAsyncQueuePool, instrument_pool
+from app.core.instrumentation import track_db_phase
 
 # Creates the SQLAlchemy engine and session
 settings = get_settings()
@@ -23,4 +28,83 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def to_async_url(url: str) -> str:
+    """
+    Convert a sync database URL (as stored in POSTGRES_URL) into
+    its async-driver equivalent, e.g. postgresql:// -> postgresql+asyncpg://.
+    URLs that already name an async driver are returned unchanged.
+    """
+    parsed = make_url(url)
+    async_drivers = {
+        "postgresql": "postgresql+asyncpg",
+        "sqlite": "sqlite+aiosqlite",
+    }
+    backend = parsed.get_backend_name()
+    if parsed.drivername in ("postgresql+asyncpg", "sqlite+aiosqlite"):
+        return url
+    if backend in async_drivers:
+        return parsed.set(drivername=async_drivers[backend]).render_as_string(hide_password=False)
+    return url
+
+
+def async_pool_options(url: str, settings) -> dict:
+    """
+    Connection pool arguments for `create_async_engine`, sized from
+    settings. Only applied to Postgres; SQLite (local development,
+    benchmarks) keeps the driver's default pool.
+    """
+    if make_url(url).get_backend_name() != "postgresql":
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+# Async engine and session, used by the API routes so that DB
+# round trips never block the event loop.
+async_engine = create_async_engine(
+    to_async_url(postgres_url),
+    pool_pre_ping=True,
+    **async_pool_options(postgres_url, settings)
+)
+instrument_pool(async_engine.sync_engine)
+track_db_phase(async_engine.sync_engine)
+
+# expire_on_commit=False so that ORM objects stay readable after a
+# commit without triggering an (illegal in async) lazy refresh.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Dialects with INSERT ... ON CONFLICT ... RETURNING support
+_INSERT_BY_DIALECT = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def dialect_insert(db):
+    """
+    The `insert()` construct of the session's dialect, which supports
+    `on_conflict_do_update` / `on_conflict_do_nothing`.
+    """
+    dialect = db.get_bind().dialect.name
+    insert = _INSERT_BY_DIALECT.get(dialect)
+    if insert is None:
+        raise NotImplementedError(f"INSERT ... ON CONFLICT is not supported on {dialect}.")
+    return insert
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
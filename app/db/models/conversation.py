@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -23,8 +23,13 @@ class Conversation(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Rolling summary of the messages up to and including
+    # `summary_through_message_num`; newer messages are sent verbatim
+    summary = Column(Text, nullable=True)
+    summary_through_message_num = Column(Integer, nullable=False, default=0, server_default="0")
+
     # ----Foreign Keys----
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     form_id = Column(Integer, ForeignKey("forms.id"))
 
     # ----Relationships----
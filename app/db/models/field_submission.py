@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, String, ForeignKey, DateTime, Integer, Enum
+from sqlalchemy import Column, Float, String, ForeignKey, DateTime, Integer, Enum, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -26,6 +26,11 @@ class FieldSubmission(Base):
     """
 
     __tablename__ = "field_submissions"
+    __table_args__ = (
+        # One submission per field per form. Also serves lookups
+        # by form_id alone, as its leading column.
+        UniqueConstraint("form_id", "field_template_id", name="uq_field_submissions_form_id_field_template_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     value = Column(String, nullable=True)
@@ -28,7 +28,7 @@ class FieldTemplate(Base):
 
     # ----Foreign Keys----
     form_id = Column(Integer, ForeignKey("forms.id"))
-    form_template_id = Column(Integer, ForeignKey("form_templates.id"))
+    form_template_id = Column(Integer, ForeignKey("form_templates.id"), index=True)
 
     # ----Relationships----
     form = relationship("Form", back_populates="field_templates")
@@ -18,7 +18,7 @@ class Form(Base):
     lastname = Column(String, nullable=True)
 
     # ----Foreign Keys----
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     form_template_id = Column(Integer, ForeignKey("form_templates.id"))
 
     # ----Timestamps----
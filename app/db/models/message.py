@@ -1,11 +1,17 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Enum, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
 
 class Message(Base):
     __tablename__ = "messages"
-    
+    __table_args__ = (
+        # One message per step and sender, so a retried /advance can't
+        # write its messages twice. Also serves "latest N messages of a
+        # conversation" (and lookups by conversation_id alone)
+        UniqueConstraint("conversation_id", "message_num", "sender", name="uq_messages_conversation_id_message_num_sender"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     sender = Column(Enum("user", "agent", "system", name="sender_enum"), nullable=False)
     
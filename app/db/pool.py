@@ -0,0 +1,74 @@
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core import metrics
+import time
+
+"""
+Connection pool instrumentation for the async engine.
+
+Exposes, through `app.core.metrics`:
+ - how long requests wait to check a connection out of the pool
+   (the first thing to grow when the pool is too small),
+ - how long each connection stays checked out (should be a few
+   milliseconds per DB phase, never the length of an LLM call),
+ - how many connections are checked out right now.
+"""
+
+# Waits are usually sub-millisecond, holds a few milliseconds
+POOL_BUCKETS = (0.0005, 0.001, 0.0025) + metrics.DEFAULT_BUCKETS
+
+DB_POOL_CHECKOUT_WAIT_SECONDS = metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to check a usable connection out of the pool (queueing, connecting, pre-ping)",
+    buckets=POOL_BUCKETS
+)
+DB_POOL_CHECKOUT_TIMEOUTS = metrics.counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT seconds"
+)
+DB_POOL_CONNECTION_HOLD_SECONDS = metrics.histogram(
+    "db_pool_connection_hold_seconds",
+    "Time a connection stays checked out of the pool",
+    buckets=POOL_BUCKETS
+)
+DB_POOL_CHECKED_OUT = metrics.gauge(
+    "db_pool_connections_checked_out",
+    "Connections currently checked out of the pool"
+)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    `AsyncAdaptedQueuePool` that times how long each checkout waits
+    for a free connection.
+    """
+
+    def connect(self):
+        # Covers queueing for a free connection, opening a new one and
+        # the pre-ping; pools have no event for the wait itself
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+
+def instrument_pool(sync_engine):
+    """
+    Track checked-out connections and their hold time on an engine
+    (pass `async_engine.sync_engine` for async engines).
+    """
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            DB_POOL_CHECKED_OUT.dec()
+            DB_POOL_CONNECTION_HOLD_SECONDS.observe(time.perf_counter() - checked_out_at)
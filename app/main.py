@@ -1,11 +1,17 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.services import openai_service
-from app.api import chat, auth, admin
+from app.api import chat, auth, admin, metrics
 from dotenv import load_dotenv
 from app.core import config
-import os
+from app.db.database import async_engine
+from app.core.security import password_hasher
+from app.core.instrumentation import RequestInstrumentationMiddleware, RequestLogSink
+from app.utils.prompt_registry import prompt_registry
+from app.services.llm_response_cache import build_llm_response_cache
+from app.services.admission import build_llm_admission
+from app.services.llm_router import build_llm_router
+from app.services.chat_history import token_counter
+import asyncio
 import logging
 
 # Configure logging
@@ -18,18 +24,9 @@ logger = logging.getLogger(__name__)
 # Load env variables
 load_dotenv(dotenv_path=".env.development.local")
 
-# Add middleware for formatting request logs
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        body = await request.body()
-        print(f"--- Incoming Request ---")
-        print(f"URL: {request.url}")
-        print(f"Method: {request.method}")
-        print(f"Headers: {dict(request.headers)}")
-        # print(f"Body: {body.decode('utf-8')}")
-        response = await call_next(request)
-        print(f"--- End Request ---\n")
-        return response
+# Request log lines are written to stdout by a background
+# thread, so logging never blocks the event loop
+request_log_sink = RequestLogSink(maxsize=config.get_settings().request_log_queue_size)
 
 # Properly create the lifespan of this fastapi app
 # to start up and shut down services as needed
@@ -37,17 +34,48 @@ async def lifespan(app: FastAPI):
     # Startup actions
     logger.info("Starting up the FastAPI application.")
     
+    request_log_sink.start()
+
+    # Load and compile prompt templates once
+    settings = config.get_settings()
+    prompt_registry.configure(
+        auto_reload=settings.prompt_auto_reload,
+        check_interval=settings.prompt_reload_check_seconds
+    )
+    prompt_registry.load_all()
+
+    # Load the tokenizer used for prompt budgets off the event loop
+    # (tiktoken may download its encoding file the first time)
+    await asyncio.to_thread(token_counter.load)
+
     # Initialize services
-    app.state.openai_client = openai_service.OpenAIService(api_key=os.getenv("OPENAI_KEY"))
+    # LLM router (OpenAI, plus Anthropic and Gemini when configured)
+    app.state.openai_client = build_llm_router(
+        settings,
+        cache=build_llm_response_cache(settings),
+        admission=build_llm_admission(settings)
+    )
+    # Open pooled connections to the providers now, so the first
+    # chat turns don't pay the TCP + TLS handshakes
+    if settings.llm_http_warm_connections:
+        await app.state.openai_client.warm_up(settings.llm_http_warm_connections)
     yield
     
     # Shutdown actions
     logger.info("Shutting down the FastAPI application.")
+    await app.state.openai_client.close()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+    request_log_sink.stop()
 
 # Create app instance
 app = FastAPI(lifespan=lifespan)
 
-app.add_middleware(LoggingMiddleware)
+app.add_middleware(
+    RequestInstrumentationMiddleware,
+    sample_rate=config.get_settings().request_log_sample_rate,
+    slow_ms=config.get_settings().request_log_slow_ms
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=config.get_settings().cors_origin_list,
@@ -59,4 +87,5 @@ app.add_middleware(
 # Include routers
 app.include_router(chat.router)
 app.include_router(auth.router)
-app.include_router(admin.router)
\ No newline at end of file
+app.include_router(admin.router)
+app.include_router(metrics.router)
\ No newline at end of file
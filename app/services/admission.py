@@ -0,0 +1,245 @@
+from cachetools import TTLCache
+from contextlib import asynccontextmanager
+from app.core.config import get_settings
+from app.core import metrics
+import asyncio
+import math
+import time
+import weakref
+import logging
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+LLM_ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "llm_admission_wait_seconds",
+    "Time LLM calls spent queued for rate limit budget and a concurrency slot"
+)
+LLM_ADMISSION_QUEUED = metrics.gauge(
+    "llm_admission_queued",
+    "LLM calls waiting for rate limit budget or a concurrency slot"
+)
+ADMISSION_REJECTED = metrics.counter(
+    "admission_rejected_total",
+    "Requests rejected by admission control, by reason "
+    "(llm_rate_limit, llm_deadline, user_rate_limit, conversation_busy)",
+    ["reason"]
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request can't be admitted before its deadline.
+    `retry_after` is a whole number of seconds for the Retry-After header.
+    """
+    status_code = 429
+
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Request rejected ({reason}), retry in {self.retry_after}s.")
+        ADMISSION_REJECTED.labels(reason=reason).inc()
+
+
+class TokenBucket:
+    """
+    Continuously refilled budget of `per_minute` units, holding at
+    most `capacity` (a full minute's worth by default). The level may
+    go below zero when actual usage turns out higher than what was
+    taken up front; later takers then wait for the debt to refill.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` is available (capped at `capacity`, so a
+        single oversized request can still go through once full).
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class LLMAdmission:
+    """
+    Global admission control for the LLM calls of this process: at
+    most `max_concurrency` calls in flight, within the account's
+    requests- and tokens-per-minute limits (`TokenBucket`s).
+
+    A call takes one request and its estimated tokens (prompt plus
+    `expected_output_tokens`) up front; `LLMSlot.record_usage` settles
+    the difference once the actual usage is known. Waiting calls are
+    admitted in arrival order. A call whose predicted wait (for the
+    budget of everything queued ahead of it) exceeds `queue_timeout`
+    is rejected at once with `AdmissionRejected`, as is one still
+    queued when its deadline passes; nothing waits unbounded.
+
+    Limits are per process; with several workers, divide the account
+    limits between them.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 150000,
+        expected_output_tokens: int = 300,
+        queue_timeout: float = 10.0
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.expected_output_tokens = expected_output_tokens
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queue = asyncio.Lock()
+        self._queued_requests = 0
+        self._queued_tokens = 0
+
+    def predicted_wait(self, cost: int) -> float:
+        return max(
+            self.requests.wait_time(self._queued_requests + 1),
+            self.tokens.wait_time(self._queued_tokens + cost)
+        )
+
+    @asynccontextmanager
+    async def slot(self, prompt_tokens: int):
+        """
+        Hold a concurrency slot (and the rate limit budget for one
+        call) for the duration of the block.
+        """
+        cost = prompt_tokens + self.expected_output_tokens
+        wait = self.predicted_wait(cost)
+        if wait > self.queue_timeout:
+            raise AdmissionRejected("llm_rate_limit", wait)
+
+        start = time.perf_counter()
+        taken = False
+        self._queued_requests += 1
+        self._queued_tokens += cost
+        LLM_ADMISSION_QUEUED.inc()
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                # The lock keeps waiters in arrival order, so a large
+                # call isn't starved by a stream of small ones
+                async with self._queue:
+                    while (wait := max(self.requests.wait_time(1), self.tokens.wait_time(cost))) > 0:
+                        await asyncio.sleep(wait)
+                    self.requests.take(1)
+                    self.tokens.take(cost)
+                    taken = True
+                    self._queued_requests -= 1
+                    self._queued_tokens -= cost
+                await self._semaphore.acquire()
+        except TimeoutError:
+            if taken:
+                self.requests.give_back(1)
+                self.tokens.give_back(cost)
+            raise AdmissionRejected("llm_deadline", self.predicted_wait(cost) or 1)
+        finally:
+            if not taken:
+                self._queued_requests -= 1
+                self._queued_tokens -= cost
+            LLM_ADMISSION_QUEUED.dec()
+        LLM_ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+        try:
+            yield LLMSlot(self, cost)
+        finally:
+            self._semaphore.release()
+
+
+class LLMSlot:
+    def __init__(self, admission: LLMAdmission, cost: int):
+        self._admission = admission
+        self._cost = cost
+
+    def record_usage(self, total_tokens: int):
+        """
+        Settle the tokens taken up front against the call's actual usage.
+        """
+        self._admission.tokens.take(total_tokens - self._cost)
+        self._cost = total_tokens
+
+
+class TurnAdmission:
+    """
+    Per-user and per-conversation admission for chat turns:
+     - each user gets a `TokenBucket` of `turns_per_minute`, holding
+       up to `burst` turns; a user out of turns is rejected with
+       `AdmissionRejected` right away;
+     - turns of one conversation run one at a time (`conversation_lock`),
+       so a double-click queues behind the turn already running instead
+       of racing it. A turn still waiting after `queue_timeout` is
+       rejected.
+
+    Both are per process. Idle buckets expire once they would have
+    refilled anyway; locks are dropped once no turn holds a reference.
+    """
+
+    def __init__(self, turns_per_minute: float = 20, burst: int = 5, queue_timeout: float = 10.0, maxsize: int = 10000):
+        self.turns_per_minute = turns_per_minute
+        self.burst = burst
+        self.queue_timeout = queue_timeout
+        self._buckets = TTLCache(maxsize=maxsize, ttl=60.0 * burst / turns_per_minute)
+        self._locks = weakref.WeakValueDictionary()
+
+    def admit_user(self, user_id):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.turns_per_minute, capacity=self.burst)
+        # Re-inserting restarts the entry's TTL
+        self._buckets[user_id] = bucket
+        wait = bucket.wait_time(1)
+        if wait > 0:
+            raise AdmissionRejected("user_rate_limit", wait)
+        bucket.take(1)
+
+    def conversation_lock(self, conv_id) -> asyncio.Lock:
+        lock = self._locks.get(conv_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[conv_id] = lock
+        return lock
+
+    async def lock_conversation(self, lock: asyncio.Lock):
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await lock.acquire()
+        except TimeoutError:
+            raise AdmissionRejected("conversation_busy", 1)
+
+
+def build_llm_admission(settings) -> LLMAdmission:
+    return LLMAdmission(
+        max_concurrency=settings.llm_max_concurrency,
+        requests_per_minute=settings.llm_requests_per_minute,
+        tokens_per_minute=settings.llm_tokens_per_minute,
+        expected_output_tokens=settings.llm_expected_output_tokens,
+        queue_timeout=settings.admission_queue_timeout_seconds
+    )
+
+
+turn_admission = TurnAdmission(
+    turns_per_minute=settings.chat_user_turns_per_minute,
+    burst=settings.chat_user_turn_burst,
+    queue_timeout=settings.admission_queue_timeout_seconds
+)
@@ -0,0 +1,141 @@
+from app.core import metrics
+import threading
+import logging
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Used when tiktoken's encoding file can't be loaded; English
+# prose averages a little over 4 characters per token for GPT-4o
+CHARS_PER_TOKEN = 4
+
+CHAT_HISTORY_TOKENS = metrics.histogram(
+    "chat_history_tokens",
+    "Estimated tokens of CHAT_HISTORY rendered into a prompt, by prompt",
+    ["prompt"],
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+)
+CHAT_HISTORY_DROPPED_MESSAGES = metrics.counter(
+    "chat_history_dropped_messages_total",
+    "Loaded messages left out of a prompt's CHAT_HISTORY to stay within its token budget",
+    ["prompt"]
+)
+
+
+class TokenCounter:
+    """
+    Counts tokens locally with tiktoken's encoding for the chat model.
+
+    The encoding is loaded by `load`, which the app runs off the event
+    loop at startup: tiktoken downloads its BPE file the first time
+    (then caches it, see TIKTOKEN_CACHE_DIR), which would otherwise
+    block every request on the worker during the first chat turn.
+    Scripts that never call it load the encoding on first use. If the
+    file can't be downloaded, counts fall back to
+    `len(text) / CHARS_PER_TOKEN` (with a warning), so a missing
+    encoding never fails a chat turn.
+    """
+
+    def __init__(self, model: str = "gpt-4o"):
+        self.model = model
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the encoding (blocking; may download it). Safe to call
+        more than once.
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._encoding = tiktoken.encoding_for_model(self.model)
+                    except Exception as e:
+                        logger.warning(f"Could not load tiktoken encoding for {self.model}, estimating tokens from length: {e}")
+                    self._loaded = True
+        return self._encoding
+
+    def _get_encoding(self):
+        if not self._loaded:
+            return self.load()
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Keep the first `max_tokens` tokens of `text`.
+        """
+        encoding = self._get_encoding()
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+        return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+token_counter = TokenCounter()
+
+
+def format_message(message) -> str:
+    role = "User" if message.sender == "user" else "Agent"
+    return f"{role}: {message.content}\n"
+
+
+class HistoryLine:
+    """
+    One message as it appears in `{{CHAT_HISTORY}}`, rendered and
+    token-counted once, detached from any session.
+    """
+    __slots__ = ("message_num", "sender", "text", "tokens")
+
+    def __init__(self, message):
+        self.message_num = message.message_num
+        self.sender = message.sender
+        self.text = format_message(message)
+        self.tokens = token_counter.count(self.text)
+
+
+def render_chat_history(lines, budget_tokens: int, prompt: str, summary: str = None) -> str:
+    """
+    Render `{{CHAT_HISTORY}}` for a prompt from `HistoryLine`s (oldest
+    first), keeping the newest messages that fit in `budget_tokens`.
+
+    If the conversation has a rolling summary of older messages, it
+    comes first and is counted against the budget. The newest message
+    is always included; if it alone exceeds what is left of the
+    budget it is truncated.
+    """
+    parts = []
+    remaining = budget_tokens
+    if summary:
+        summary_block = f"Summary of the earlier conversation:\n{summary}\n\nMost recent messages:\n"
+        summary_tokens = token_counter.count(summary_block)
+        # Never let the summary crowd out the recent messages entirely
+        if summary_tokens > budget_tokens // 2:
+            summary_block = token_counter.truncate(summary_block, budget_tokens // 2) + "\n\nMost recent messages:\n"
+            summary_tokens = token_counter.count(summary_block)
+        parts.append(summary_block)
+        remaining -= summary_tokens
+
+    kept = []
+    for line in reversed(lines):
+        if line.tokens > remaining:
+            if not kept:
+                kept.append(token_counter.truncate(line.text, max(remaining, 0)) + "\n")
+                remaining = 0
+            break
+        kept.append(line.text)
+        remaining -= line.tokens
+
+    kept.reverse()
+    parts.extend(kept)
+    CHAT_HISTORY_TOKENS.labels(prompt=prompt).observe(budget_tokens - remaining)
+    if len(kept) < len(lines):
+        CHAT_HISTORY_DROPPED_MESSAGES.labels(prompt=prompt).inc(len(lines) - len(kept))
+    return "".join(parts)
@@ -0,0 +1,788 @@
+from fastapi import HTTPException
+from app.core import metrics, instrumentation
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from app.db.database import dialect_insert
+from app.db.models.form import Form
+from app.db.models.message import Message
+from app.db.models.conversation import Conversation
+from app.schemas.chat_schemas import AdvanceChatRequest, AdvanceChatResponse
+from app.schemas.openai_schemas import UpdateFormLLMOutput, DefaultLLMOutput
+from app.services.form_template_cache import form_template_cache
+from app.services.form_state import FormState
+from app.services.field_submission_service import normalize_field_updates, upsert_field_submissions
+from app.services.chat_history import HistoryLine, render_chat_history
+from app.services.conversation_history_cache import conversation_history_cache
+from app.services.conversation_summary import conversation_summarizer
+from app.services import extraction_gate
+from app.services.in_flight_turns import in_flight_turns
+from app.services.admission import AdmissionRejected, turn_admission
+from app.services.llm_resilience import LLMUnavailable
+from app.services.field_values import extract_locally, verify_field_updates
+from app.core.config import get_settings
+from app.utils.prompt_registry import prompt_registry
+import asyncio
+import functools
+import inspect
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+CHAT_TURN_SECONDS = metrics.histogram(
+    "chat_turn_seconds",
+    "Latency of the LLM section of a chat turn (steps 3-6), by pipeline mode",
+    ["mode"]
+)
+SPECULATIVE_REPLIES = metrics.counter(
+    "chat_speculative_replies_total",
+    "Speculative replies kept vs regenerated after form extraction",
+    ["outcome"]
+)
+CHAT_TURN_REPLAYS = metrics.counter(
+    "chat_turn_replays_total",
+    "Retried chat steps answered without a new reply (in_flight, stored, lost_race) or resumed after a failed attempt",
+    ["outcome"]
+)
+CHAT_STEP_SECONDS = metrics.histogram(
+    "chat_step_seconds",
+    "Latency of each step of a chat turn (see ChatTurn), successful or not",
+    ["step"]
+)
+
+
+# LLM calls given up on before reaching (or hearing back from) the
+# model: rejected by admission control (429), out of time (504), or
+# failed fast by the circuit breaker (503)
+_LLM_UNAVAILABLE = (AdmissionRejected, LLMUnavailable)
+_LLM_UNAVAILABLE_DETAILS = {
+    429: "Too many requests, please retry shortly.",
+    503: "The language model is unavailable, please retry shortly.",
+    504: "The language model did not respond in time."
+}
+
+
+def _llm_unavailable(e: Exception) -> HTTPException:
+    logger.warning(f"Chat turn not completed: {e}")
+    return HTTPException(
+        status_code=e.status_code,
+        detail=_LLM_UNAVAILABLE_DETAILS[e.status_code],
+        headers={"Retry-After": str(e.retry_after)} if e.retry_after else None
+    )
+
+
+def _timed_step(step: str):
+    """
+    Record a `ChatTurn` step's duration in `chat_step_seconds`.
+    """
+    def decorator(method):
+        child = CHAT_STEP_SECONDS.labels(step=step)
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def wrapper(*args, **kwargs):
+                with child.time():
+                    return await method(*args, **kwargs)
+        else:
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                with child.time():
+                    return method(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ChatTurn:
+    """
+    One turn of a conversation: the user's latest message in,
+    the agent's next message out.
+
+    Each step of the `/api/chat/advance` pipeline is a method here, so
+    the plain, streaming and websocket endpoints can run the same
+    steps in the same order. State produced by one step (the loaded
+    conversation, the form context, recent messages...) is kept on
+    the instance for the steps that follow.
+
+    Every step raises `HTTPException` on failure, matching the
+    behaviour of the original inline route. Turns and LLM calls turned
+    away by admission control (app/services/admission.py) raise a 429
+    with Retry-After, and LLM calls that ran out of time or hit an open
+    circuit breaker (app/services/llm_resilience.py) a 504 or 503,
+    instead of a 500.
+
+    A turn runs in two short DB phases around the LLM calls, each
+    ending in a commit that returns the connection to the pool:
+     1. load the conversation and form and insert the user's
+        message, then `release_connection` (commit 1 of 2);
+     2. after the LLM calls, write the field updates and the agent's
+        message together in `add_agent_message` (commit 2 of 2).
+    The LLM steps in between only use state already loaded on the
+    instance and never touch the session, so no connection is held
+    while waiting on the LLM. IDs come back from the INSERTs
+    (INSERT ... RETURNING), so nothing is re-SELECTed with `refresh()`.
+
+    Turns are idempotent per (conversation_id, message_step_num): a
+    retry waits for the original if it is still running in this
+    process (`claim`), and a step whose reply is already stored is
+    answered with it (`replayed` is set) without calling the LLM. The
+    messages table's unique constraint backs this up across workers.
+
+    Chat history comes from `conversation_history_cache`, which each
+    committed turn appends to; only a cold or stale entry costs a
+    messages query. It is cut to a token budget in both prompts (see
+    `render_chat_history`). Older messages live on in the
+    conversation's rolling summary, which `conversation_summarizer`
+    refreshes in the background after the turn when enough of them
+    have piled up.
+    """
+
+    def __init__(self, db, user, openai_service, payload: AdvanceChatRequest):
+        self.db = db
+        self.user = user
+        self.openai_service = openai_service
+        self.payload = payload
+
+        self.conv = None
+        self.form = None
+        self.form_state = None
+        self.user_message = None
+        self.history = None
+        self.form_context = ""
+        self.changed_fields = []
+        self.gate_decision = None
+        self.agent_message = None
+        self.replayed = None
+        self._in_flight_key = None
+        self._conversation_lock = None
+
+    @_timed_step("1_load_conversation")
+    async def load_conversation(self):
+        """
+        Load conv from db, raise exception if conversation
+        not found or malformed.
+        """
+        return await self._load_conversation()
+
+    async def _load_conversation(self, refresh: bool = False):
+        # Eager-load the form and its submissions up front, in one joined
+        # query (lazy loads are not allowed on an async session). The
+        # form template comes from `form_template_cache` instead.
+        query = (
+            select(Conversation)
+            .options(
+                joinedload(Conversation.form)
+                .joinedload(Form.field_submissions)
+            )
+            .where(Conversation.id == self.payload.conversation_id)
+        )
+        if refresh:
+            # Overwrite the objects already in the session
+            query = query.execution_options(populate_existing=True)
+        result = await self.db.execute(query)
+        conv = result.unique().scalars().first()
+        if not conv or conv.user_id != self.user.id:
+            logger.error(f"Conversation ID {self.payload.conversation_id} not found or does not belong to user {self.user.id}.")
+            raise HTTPException(status_code=404, detail="Conversation not found.")
+        self.conv = conv
+        return conv
+
+    async def claim(self) -> bool:
+        """
+        Register this turn as the one computing its step. If the same
+        step is already running in this process (a retry arriving
+        before the original finished), wait for it instead, without
+        holding a DB connection: returns False once its reply is
+        stored, with `agent_message` set to it. If the original fails,
+        this turn runs the step itself. Waits at most
+        `chat_turn_retry_wait_seconds`, then raises a 409 with
+        Retry-After.
+
+        Called after `load_conversation`, so only the conversation's
+        owner ever waits on a turn; `release` must follow.
+
+        The turn then waits for any other turn of the conversation to
+        finish (see `turn_admission`), raising a 429 with Retry-After
+        if that takes too long. A turn that had to wait re-loads the
+        conversation, whose form and summary the turn ahead of it may
+        have changed.
+        """
+        key = (self.conv.id, self.payload.message_step_num)
+        while (pending := in_flight_turns.get(key)) is not None:
+            await self.db.commit()
+            try:
+                agent_message = await asyncio.wait_for(asyncio.shield(pending), settings.chat_turn_retry_wait_seconds)
+            except asyncio.TimeoutError:
+                logger.warning(f"Step {key[1]} of conversation {key[0]} still running after {settings.chat_turn_retry_wait_seconds}s; not waiting for it.")
+                raise HTTPException(
+                    status_code=409,
+                    detail="This message is still being processed, please retry shortly.",
+                    headers={"Retry-After": "5"}
+                )
+            if agent_message is not None:
+                self._replay(agent_message, "in_flight")
+                return False
+        in_flight_turns.start(key)
+        self._in_flight_key = key
+
+        lock = turn_admission.conversation_lock(self.conv.id)
+        queued = lock.locked()
+        try:
+            if queued:
+                # Don't hold a connection while queued
+                await self.db.commit()
+            await turn_admission.lock_conversation(lock)
+        except AdmissionRejected as e:
+            self.release()
+            raise _llm_unavailable(e)
+        self._conversation_lock = lock
+        if queued:
+            try:
+                await self._load_conversation(refresh=True)
+            except BaseException:
+                self.release()
+                raise
+        return True
+
+    async def admit(self):
+        """
+        Charge a turn that will run (not a replay, see
+        `add_user_message`) to the user's rate limit in
+        `turn_admission`. A user out of turns gets a 429 with
+        Retry-After, and their message is rolled back.
+        """
+        try:
+            turn_admission.admit_user(self.user.id)
+        except AdmissionRejected as e:
+            await self.db.rollback()
+            raise _llm_unavailable(e)
+
+    def release(self):
+        """
+        Hand this turn's result (or failure) to any retry waiting in
+        `claim`, and let the conversation's next turn run.
+        """
+        if self._in_flight_key is not None:
+            in_flight_turns.finish(self._in_flight_key, self.agent_message)
+            self._in_flight_key = None
+        if self._conversation_lock is not None:
+            self._conversation_lock.release()
+            self._conversation_lock = None
+
+    def _replay(self, agent_message, outcome: str):
+        self.agent_message = agent_message
+        self.replayed = outcome
+        CHAT_TURN_REPLAYS.labels(outcome=outcome).inc()
+        logger.info(f"Replaying stored agent message {agent_message.message_num} of conversation {self.conv.id} ({outcome}).")
+
+    async def _insert_message(self, sender: str, message_num: int, content: str):
+        """
+        INSERT a message unless its (conversation, message_num, sender)
+        already exists; returns the new `Message`, or None.
+        """
+        insert = dialect_insert(self.db)
+        return (await self.db.scalars(
+            insert(Message)
+            .values(
+                sender=sender,
+                message_num=message_num,
+                content=content,
+                user_id=self.user.id,
+                conversation_id=self.conv.id
+            )
+            .on_conflict_do_nothing(index_elements=[Message.conversation_id, Message.message_num, Message.sender])
+            .returning(Message)
+        )).first()
+
+    @_timed_step("2_add_user_message")
+    async def add_user_message(self):
+        """
+        Add user's latest message to the db; it is committed by
+        `release_connection`.
+
+        If the step was already written (a retried request), nothing is
+        inserted: when its agent message exists too, it is replayed
+        (`replayed` is set and the route returns it); otherwise the
+        earlier attempt failed half-way and this turn resumes it with
+        the stored user message.
+        """
+        conv = self.conv
+        step = self.payload.message_step_num
+        try:
+            user_message = await self._insert_message("user", step, self.payload.user_message)
+            if user_message is None:
+                stored = {
+                    message.sender: message for message in (await self.db.execute(
+                        select(Message).where(
+                            Message.conversation_id == conv.id,
+                            ((Message.message_num == step) & (Message.sender == "user"))
+                            | ((Message.message_num == step + 1) & (Message.sender == "agent"))
+                        )
+                    )).scalars().all()
+                }
+                user_message = stored["user"]
+                if "agent" in stored:
+                    self.user_message = user_message
+                    self._replay(stored["agent"], "stored")
+                    return user_message
+                CHAT_TURN_REPLAYS.labels(outcome="resumed").inc()
+                logger.info(f"Resuming step {step} of conversation {conv.id}; its user message was stored without a reply.")
+            else:
+                logger.info(f"User message added to conversation {conv.id} with message num {user_message.message_num} and system ID {user_message.id}.")
+        except Exception as e:
+            logger.error(f"Fatal error adding user message to conversation {conv.id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to add user message.")
+        self.user_message = user_message
+        return user_message
+
+    @_timed_step("3_load_form_context")
+    async def load_form_context(self):
+        """
+        Load the latest state of the conversation's form.
+        Specifically, load:
+         a. The `form_template` record associated with the
+            conversation's form (compiled and cached per template,
+            see `form_template_cache`).
+         b. All `field_submission` records associated with
+            the conversation's form.
+
+        Then format context in the following format:
+         ```### LATEST STATE OF THE FORM
+            Field name: Business/Org Title
+            Template field ID: 1
+            Current value: NONE
+            --
+            ...
+         ```
+        The fields' data types and instructions are not part of it:
+        they go in the system prompts (`FormState.definitions`).
+        """
+        conv = self.conv
+        try:
+            form = conv.form
+            if not form:
+                logger.warning(f"No form associated with conversation {conv.id}.")
+
+            template = None
+            if form and form.form_template_id is not None:
+                template = await form_template_cache.get(self.db, form.form_template_id)
+            if template == None:
+                logger.warning(f"No form template associated with form {form.id if form else None} in conversation {conv.id}.")
+            elif len(template.fields) == 0:
+                logger.warning(f"No field templates associated with form template {template.id} in conversation {conv.id}.")
+
+            self.form = form
+            self.form_state = FormState(template, form.field_submissions if form else [])
+            with instrumentation.phase("render"):
+                self.form_context, _ = self.form_state.render()
+            logger.info(f"Successfully loaded form context for conversation {conv.id}.")
+        except Exception as e:
+            logger.error(f"Fatal error loading form context for conversation {conv.id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to load form context.")
+        return self.form_context
+
+    async def load_history(self):
+        """
+        Rebuild the chat history from the database: the messages not
+        yet folded into the conversation's rolling summary (oldest
+        first), at most as many as `conversation_summarizer` lets pile
+        up. Each prompt renders as many of the newest ones as fit its
+        token budget.
+        """
+        result = await self.db.execute(
+            select(Message)
+            .where(
+                Message.conversation_id == self.conv.id,
+                Message.message_num > self.conv.summary_through_message_num
+            )
+            .order_by(Message.message_num.desc())
+            .limit(conversation_summarizer.load_limit)
+        )
+        history = [HistoryLine(message) for message in result.scalars().all()]
+        history.reverse() # So oldest messages first
+        self.history = history
+        return history
+
+    @_timed_step("3_release_connection")
+    async def release_connection(self):
+        """
+        End DB phase 1 before the LLM calls: get the chat history
+        (from `conversation_history_cache`, or the database if the
+        cached entry is missing or stale), then commit the user's
+        message (commit 1 of 2), which hands the connection back to
+        the pool.
+        """
+        conv = self.conv
+        if self.history is None:
+            history = conversation_history_cache.get(
+                conv.id,
+                conv.summary_through_message_num,
+                self.user_message.message_num
+            )
+            if history is None:
+                await self.load_history()
+            else:
+                history.append(HistoryLine(self.user_message))
+                self.history = history[-conversation_summarizer.load_limit:]
+        try:
+            await self.db.commit()
+        except Exception as e:
+            logger.error(f"Fatal error committing user message to conversation {conv.id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to add user message.")
+
+    def should_extract(self) -> bool:
+        """
+        Ask `extraction_gate` whether the user's message could change
+        the form, i.e. whether LLM call 1 is needed. Depending on
+        `extraction_gate_mode` the decision is acted on ("on"), only
+        recorded ("shadow") or not made at all ("off").
+        """
+        mode = settings.extraction_gate_mode
+        if mode == "off":
+            return True
+        field_types = [field.field_type for field in self.form_state.template.fields] if self.form_state.template else []
+        self.gate_decision = extraction_gate.classify(self.user_message.content, field_types)
+        extraction_gate.record_decision(self.gate_decision)
+        if mode == "on" and not self.gate_decision.extract:
+            logger.info(f"Skipping LLM CALL 1 for conversation {self.conv.id}: {self.gate_decision.reason}.")
+            return False
+        return True
+
+    async def update_form(self):
+        """
+        LLM CALL 1 - call first LLM with "update_form" prompt
+        to make any necessary updates to the form, then write
+        the updates to the database. Skipped when the message is
+        parsed locally (`local_form_updates`) or `should_extract` says
+        it can't change the form.
+        """
+        llm_response = self.local_form_updates()
+        if llm_response is None:
+            if not self.should_extract():
+                return None
+            llm_response = await self.extract_form_updates()
+        await self.apply_field_updates(llm_response)
+        return llm_response
+
+    def local_form_updates(self):
+        """
+        Parse the user's message locally when it is just a value for
+        the form's only kind of missing field (see
+        `field_values.extract_locally`), in place of LLM call 1.
+        """
+        if not settings.local_field_extraction or self.form_state is None:
+            return None
+        updates = extract_locally(self.user_message.content, self.form_state)
+        if updates is not None:
+            logger.info(f"Skipping LLM CALL 1 for conversation {self.conv.id}: message parsed locally.")
+        return updates
+
+    @_timed_step("4_extract_form_updates")
+    async def extract_form_updates(self) -> UpdateFormLLMOutput:
+        """
+        LLM CALL 1 itself, without writing anything to the database.
+
+        LLM will return in the following format:
+         ```json
+             {
+                 "fields_to_update": [
+                     {
+                         "type": "create" | "update",
+                         "template_field_id": "abc123",
+                         "field_name": "Business/Org Title",
+                         "new_value": "New Title Here",
+                         "confidence": 0.95,
+                         "reasoning": "The user mentioned the new title explicitly..."
+                     },
+                     ...
+                 ]
+             }
+         ```
+        """
+        conv = self.conv
+        try:
+            with instrumentation.phase("render"):
+                # Fill in prompt with the newest messages that fit the
+                # budget; extraction only needs the recent exchange, so
+                # the rolling summary is left out
+                chat_history = render_chat_history(
+                    self.history,
+                    settings.chat_history_tokens_update_form,
+                    "update_form"
+                )
+
+                # Stable prefix first (instructions, then the template's
+                # field definitions) as the system prompt, so providers
+                # can cache it; form values and history after it
+                definitions, _ = self.form_state.definitions()
+                system_prompt = prompt_registry.render("update_form_system", FIELD_DEFINITIONS=definitions)
+                full_prompt = prompt_registry.render(
+                    "update_form",
+                    FORM_CONTEXT=self.form_context,
+                    CHAT_HISTORY=chat_history
+                )
+            logger.info(f"Successfully loaded and filled update_form prompt for conversation {conv.id}.")
+
+            logger.info(f"FULL PROMPT LLM CALL 1: {full_prompt}")
+
+            # Call LLM to get fields to update
+            logger.info(f"LLM CALL 1 - calling LLM to update form for conversation {conv.id}.")
+            with instrumentation.phase("llm"):
+                llm_response = (await self.openai_service.handle_message(
+                    user_prompt=full_prompt,
+                    response_format=UpdateFormLLMOutput,
+                    system_prompt=system_prompt,
+                    prompt_name="update_form"
+                )).get("response")
+            logger.info(f"LLM CALL 1 - received response from LLM to update form for conversation {conv.id}.")
+
+            logger.info(f"LLM CALL 1 RESPONSE: {llm_response}")
+
+        except _LLM_UNAVAILABLE as e:
+            raise _llm_unavailable(e)
+        except Exception as e:
+            logger.error(f"Fatal error during LLM call to update form for conversation {conv.id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to update form via LLM.")
+
+        return llm_response
+
+    @_timed_step("5_apply_field_updates")
+    async def apply_field_updates(self, llm_response: UpdateFormLLMOutput):
+        """
+        Apply the LLM response from `update_form` to the turn's
+        `FormState`. The updates are staged in memory, so LLM call 2
+        sees them, and written to the database by `add_agent_message`
+        in the same transaction as the agent's reply. Values of typed
+        fields (email, phone, date...) are canonicalized first, see
+        `verify_field_updates`.
+        """
+        conv = self.conv
+        form_state = self.form_state
+        try:
+            valid_field_ids = form_state.template.field_ids if form_state.template else frozenset()
+            updates = normalize_field_updates(llm_response.fields_to_update, valid_field_ids)
+            updates = verify_field_updates(updates, form_state.template)
+            for field_template_id, field_update in updates.items():
+                if form_state.value(field_template_id) != field_update.new_value:
+                    self.changed_fields.append(field_update)
+            form_state.stage(updates)
+            logger.info(f"Staged {len(updates)} form field update(s) for conversation {conv.id}.")
+            if self.gate_decision is not None and not self.gate_decision.extract and self.changed_fields:
+                extraction_gate.EXTRACTION_GATE_FALSE_NEGATIVES.inc()
+                logger.warning(f"Extraction gate false negative ({self.gate_decision.reason}) on message {self.user_message.id} of conversation {conv.id}: {len(self.changed_fields)} field(s) changed.")
+        except Exception as e:
+            logger.error(f"Fatal error updating form fields for conversation {conv.id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to update form fields in database.")
+
+    @_timed_step("6_rebuild_form_context")
+    def rebuild_form_context(self):
+        """
+        Rebuild form context after updates (without template
+        field IDs, which only LLM call 1 needs).
+        """
+        conv = self.conv
+        try:
+            with instrumentation.phase("render"):
+                _, self.form_context = self.form_state.render()
+            logger.info(f"Successfully rebuilt form context for conversation {conv.id} after updates.")
+        except Exception as e:
+            logger.error(f"Fatal error rebuilding form context for conversation {conv.id} after updates: {e}")
+            raise HTTPException(status_code=500, detail="Failed to rebuild form context.")
+        return self.form_context
+
+    def build_response_prompt(self, form_context: str = None) -> tuple:
+        """
+        Load "generate_response" prompt templates, fill in with form
+        context, recent chat history and the latest user message.
+        Uses the turn's current form context unless one is given.
+        Returns `(system_prompt, user_prompt)`: the system prompt is
+        the stable prefix (instructions and field definitions).
+        """
+        conv = self.conv
+        if form_context is None:
+            form_context = self.form_context
+        try:
+            with instrumentation.phase("render"):
+                # Fill in prompt with the rolling summary and the newest
+                # messages that fit the budget
+                chat_history = render_chat_history(
+                    self.history,
+                    settings.chat_history_tokens_generate_response,
+                    "generate_response",
+                    summary=conv.summary
+                )
+                _, definitions = self.form_state.definitions()
+                system_prompt = prompt_registry.render("generate_response_system", FIELD_DEFINITIONS=definitions)
+                full_prompt = prompt_registry.render(
+                    "generate_response",
+                    FORM_CONTEXT=form_context,
+                    CHAT_HISTORY=chat_history,
+                    LATEST_MESSAGE=self.user_message.content
+                )
+            logger.info(f"Successfully loaded and filled generate_response prompt for conversation {conv.id}.")
+        except Exception as e:
+            logger.error(f"Fatal error building generate_response prompt for conversation {conv.id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to generate agent response via LLM.")
+        return system_prompt, full_prompt
+
+    @_timed_step("6_generate_response")
+    async def generate_response(self, form_context: str = None) -> str:
+        """
+        LLM CALL 2 - call second LLM with "generate_response" prompt
+        to generate the agent's next message or question in the conversation.
+        """
+        conv = self.conv
+        system_prompt, full_prompt = self.build_response_prompt(form_context)
+        try:
+            # Call LLM to get agent's next message
+            logger.info(f"LLM CALL 2 - calling LLM to generate agent response for conversation {conv.id}.")
+            with instrumentation.phase("llm"):
+                llm_response = (await self.openai_service.handle_message(
+                    user_prompt=full_prompt,
+                    response_format=DefaultLLMOutput,
+                    system_prompt=system_prompt,
+                    prompt_name="generate_response"
+                )).get("response")
+            logger.info(f"LLM CALL 2 - received response from LLM to generate agent response for conversation {conv.id}.")
+        except _LLM_UNAVAILABLE as e:
+            raise _llm_unavailable(e)
+        except Exception as e:
+            logger.error(f"Fatal error during LLM call to generate agent response for conversation {conv.id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to generate agent response via LLM.")
+        return llm_response.output_text
+
+    def is_material_change(self, min_confidence: float) -> bool:
+        """
+        Whether the field updates applied this turn should change the
+        agent's reply: any field whose value actually changed with at
+        least `min_confidence`. Low-confidence guesses still read as
+        "needs more info" to the reply prompt, so they don't count.
+        """
+        return any(
+            field_update.confidence is None or field_update.confidence >= min_confidence
+            for field_update in self.changed_fields
+        )
+
+    async def run_speculative(self, min_confidence: float) -> str:
+        """
+        Speculative variant of steps 4-6: LLM call 2 starts on the
+        pre-update form context at the same time as LLM call 1.
+
+        Once the extraction has been applied, the speculative reply is
+        kept if the form did not materially change, and regenerated
+        against the updated form otherwise. Returns the reply text.
+        """
+        conv = self.conv
+        local_updates = self.local_form_updates()
+        if local_updates is not None or not self.should_extract():
+            # Nothing to speculate on: the reply is final
+            if local_updates is not None:
+                await self.apply_field_updates(local_updates)
+            self.rebuild_form_context()
+            return await self.generate_response()
+        _, speculative_context = self.form_state.render()
+        speculative_reply = asyncio.create_task(self.generate_response(speculative_context))
+        try:
+            llm_response = await self.extract_form_updates()
+            await self.apply_field_updates(llm_response)
+            self.rebuild_form_context()
+        except BaseException:
+            speculative_reply.cancel()
+            raise
+
+        if not self.is_material_change(min_confidence):
+            SPECULATIVE_REPLIES.labels(outcome="kept").inc()
+            logger.info(f"Keeping speculative reply for conversation {conv.id}; form did not materially change.")
+            return await speculative_reply
+
+        SPECULATIVE_REPLIES.labels(outcome="regenerated").inc()
+        logger.info(f"Regenerating reply for conversation {conv.id}; {len(self.changed_fields)} field(s) changed.")
+        speculative_reply.cancel()
+        return await self.generate_response()
+
+    async def stream_response(self):
+        """
+        Streaming variant of `generate_response`: yields text deltas
+        from LLM call 2 as they arrive. The caller is responsible for
+        joining them and persisting the final text.
+        """
+        conv = self.conv
+        system_prompt, full_prompt = self.build_response_prompt()
+        # Only time spent waiting on the LLM counts towards the "llm"
+        # phase, not time spent sending deltas to the client
+        llm_seconds = 0.0
+        try:
+            logger.info(f"LLM CALL 2 (stream) - calling LLM to generate agent response for conversation {conv.id}.")
+            stream = self.openai_service.stream_message(
+                user_prompt=full_prompt,
+                system_prompt=system_prompt,
+                prompt_name="generate_response"
+            )
+            while True:
+                start = time.perf_counter()
+                try:
+                    delta = await anext(stream)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    llm_seconds += time.perf_counter() - start
+                yield delta
+            logger.info(f"LLM CALL 2 (stream) - finished streaming agent response for conversation {conv.id}.")
+        except _LLM_UNAVAILABLE as e:
+            raise _llm_unavailable(e)
+        except Exception as e:
+            logger.error(f"Fatal error during streamed LLM call to generate agent response for conversation {conv.id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to generate agent response via LLM.")
+        finally:
+            instrumentation.record_phase("llm", llm_seconds)
+
+    @_timed_step("7_add_agent_message")
+    async def add_agent_message(self, content: str):
+        """
+        Load agent's next message into the DB, together with the
+        field updates staged by `apply_field_updates`, in a single
+        transaction (commit 2 of 2).
+        """
+        conv = self.conv
+        message_num = self.user_message.message_num + 1
+        try:
+            agent_message = await self._insert_message("agent", message_num, content)
+            if agent_message is None:
+                # Another attempt at this step (a retry served by another
+                # worker) stored its reply first; return that one and
+                # drop this turn's field updates
+                agent_message = (await self.db.execute(
+                    select(Message).where(
+                        Message.conversation_id == conv.id,
+                        Message.message_num == message_num,
+                        Message.sender == "agent"
+                    )
+                )).scalars().first()
+                await self.db.commit()
+                self._replay(agent_message, "lost_race")
+                return agent_message
+
+            staged = self.form_state.staged if self.form_state else {}
+            submissions = await upsert_field_submissions(self.db, self.form.id, staged) if staged else []
+            for submission in submissions:
+                self.form_state.add(submission)
+            await self.db.commit()
+            logger.info(f"Agent message added to conversation {conv.id} with message num {agent_message.message_num} and system ID {agent_message.id}; {len(submissions)} form field(s) upserted.")
+        except Exception as e:
+            logger.error(f"Fatal error adding agent message to conversation {conv.id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to add agent message.")
+        self.agent_message = agent_message
+
+        history = self.history + [HistoryLine(agent_message)]
+        conversation_history_cache.put(conv.id, conv.summary_through_message_num, agent_message.message_num, history)
+        if conversation_summarizer.needs_refresh(len(history)):
+            conversation_summarizer.schedule(conv.id, self.openai_service, self.db.bind)
+        return agent_message
+
+    def to_response(self) -> AdvanceChatResponse:
+        return AdvanceChatResponse(
+            message_id=self.agent_message.id,
+            message_num=self.agent_message.message_num,
+            sender=self.agent_message.sender,
+            content=self.agent_message.content
+        )
@@ -0,0 +1,96 @@
+from cachetools import TTLCache
+from app.core.config import get_settings
+from app.core import metrics
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+HISTORY_CACHE_LOOKUPS = metrics.counter(
+    "conversation_history_cache_lookups_total",
+    "Conversation history cache lookups (hit, miss, stale)",
+    ["result"]
+)
+
+
+class CachedHistory:
+    """
+    Immutable snapshot of a conversation's unsummarized messages as
+    `HistoryLine`s (oldest first), as of `last_message_num`.
+    """
+    __slots__ = ("summary_through_message_num", "last_message_num", "lines")
+
+    def __init__(self, summary_through_message_num: int, last_message_num: int, lines: tuple):
+        self.summary_through_message_num = summary_through_message_num
+        self.last_message_num = last_message_num
+        self.lines = lines
+
+
+class ConversationHistoryCache:
+    """
+    Process-wide LRU of active conversations' rendered chat history,
+    keyed by conversation_id, so a turn appends its two new messages
+    instead of re-reading the history. An entry is only used by the
+    turn that directly continues it (see `get`).
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 1800.0, max_lines: int = 20):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.max_lines = max_lines
+
+    def get(self, conversation_id: int, summary_through_message_num: int, next_message_num: int):
+        """
+        Return the cached `HistoryLine`s preceding `next_message_num`,
+        minus any folded into the summary up to
+        `summary_through_message_num`, or None if the turn has to
+        rebuild from the database: no entry, an entry whose last
+        message isn't `next_message_num - 1`, or a summary that moved
+        backwards.
+        """
+        with self._lock:
+            entry = self._cache.get(conversation_id)
+        if entry is None:
+            HISTORY_CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+        if (
+            entry.last_message_num != next_message_num - 1
+            or entry.summary_through_message_num > summary_through_message_num
+        ):
+            HISTORY_CACHE_LOOKUPS.labels(result="stale").inc()
+            return None
+        HISTORY_CACHE_LOOKUPS.labels(result="hit").inc()
+        return [
+            line for line in entry.lines
+            if line.message_num > summary_through_message_num
+        ]
+
+    def put(self, conversation_id: int, summary_through_message_num: int, last_message_num: int, lines):
+        """
+        Store a conversation's history after a turn has been committed.
+        Only the newest `max_lines` lines are kept, the same window a
+        rebuild loads from the database.
+        """
+        entry = CachedHistory(
+            summary_through_message_num,
+            last_message_num,
+            tuple(lines[-self.max_lines:]) if self.max_lines else ()
+        )
+        with self._lock:
+            self._cache[conversation_id] = entry
+
+    def invalidate(self, conversation_id: int):
+        with self._lock:
+            self._cache.pop(conversation_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+settings = get_settings()
+conversation_history_cache = ConversationHistoryCache(
+    maxsize=settings.conversation_history_cache_size,
+    ttl=settings.conversation_history_cache_ttl_seconds,
+    max_lines=settings.chat_summary_keep_recent_messages + settings.chat_summary_refresh_messages
+)
@@ -0,0 +1,142 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core import metrics
+from app.db.models.conversation import Conversation
+from app.db.models.message import Message
+from app.schemas.openai_schemas import DefaultLLMOutput
+from app.services.chat_history import format_message
+from app.utils.prompt_registry import prompt_registry
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_REFRESHES = metrics.counter(
+    "conversation_summary_refreshes_total",
+    "Rolling summary refreshes, by outcome (updated, skipped, conflict, error)",
+    ["outcome"]
+)
+SUMMARY_REFRESH_SECONDS = metrics.histogram(
+    "conversation_summary_refresh_seconds",
+    "Duration of a rolling summary refresh, including the LLM call"
+)
+
+
+class ConversationSummarizer:
+    """
+    Keeps each conversation's rolling summary (`Conversation.summary`)
+    up to date, so prompts can carry a bounded amount of history.
+
+    Messages after `summary_through_message_num` are "unsummarized".
+    The newest `keep_recent` of them always stay verbatim. Once at
+    least `refresh_messages` more have piled up behind them, those
+    older ones are folded into the summary with a single LLM call,
+    built from the previous summary and just those messages, so the
+    cost of a refresh doesn't grow with the conversation.
+
+    Refreshes run in the background after the agent's reply has been
+    stored, on their own session, and never hold a connection during
+    the LLM call. A refresh only writes if nobody else moved
+    `summary_through_message_num` in the meantime.
+    """
+
+    def __init__(self, refresh_messages: int = 10, keep_recent: int = 10):
+        self.refresh_messages = refresh_messages
+        self.keep_recent = keep_recent
+        self._running = {}
+
+    @property
+    def load_limit(self) -> int:
+        """
+        Most unsummarized messages a turn needs to load.
+        """
+        return self.keep_recent + self.refresh_messages
+
+    def needs_refresh(self, unsummarized_count: int) -> bool:
+        return unsummarized_count - self.keep_recent >= self.refresh_messages
+
+    def schedule(self, conversation_id: int, openai_service, bind):
+        """
+        Start a background refresh for a conversation, unless one is
+        already running. `bind` is the engine of the caller's session.
+        """
+        if conversation_id in self._running:
+            return
+        task = asyncio.create_task(self.refresh(conversation_id, openai_service, bind))
+        self._running[conversation_id] = task
+        task.add_done_callback(lambda _task: self._running.pop(conversation_id, None))
+
+    async def refresh(self, conversation_id: int, openai_service, bind):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            outcome = await self._refresh(conversation_id, openai_service, bind)
+        except Exception as e:
+            logger.error(f"Failed to refresh rolling summary for conversation {conversation_id}: {e}")
+        finally:
+            SUMMARY_REFRESHES.labels(outcome=outcome).inc()
+            SUMMARY_REFRESH_SECONDS.observe(time.perf_counter() - start)
+
+    async def _refresh(self, conversation_id: int, openai_service, bind) -> str:
+        async with AsyncSession(bind=bind, expire_on_commit=False) as db:
+            conv = (await db.execute(
+                select(Conversation.summary, Conversation.summary_through_message_num)
+                .where(Conversation.id == conversation_id)
+            )).first()
+            if conv is None:
+                return "skipped"
+            messages = list((await db.execute(
+                select(Message)
+                .where(
+                    Message.conversation_id == conversation_id,
+                    Message.message_num > conv.summary_through_message_num
+                )
+                .order_by(Message.message_num)
+            )).scalars().all())
+
+        if not self.needs_refresh(len(messages)):
+            return "skipped"
+        to_fold = messages[:-self.keep_recent] if self.keep_recent else messages
+
+        full_prompt = prompt_registry.render(
+            "summarize_history",
+            PREVIOUS_SUMMARY=conv.summary or "None yet, this is the start of the conversation.",
+            NEW_MESSAGES="".join(format_message(message) for message in to_fold)
+        )
+        llm_response = (await openai_service.handle_message(
+            user_prompt=full_prompt,
+            response_format=DefaultLLMOutput,
+            system_prompt=prompt_registry.render("summarize_history_system"),
+            prompt_name="summarize_history",
+            # Each refresh folds in messages no other prompt has had;
+            # an identical prompt won't come again
+            use_cache=False
+        )).get("response")
+
+        async with AsyncSession(bind=bind, expire_on_commit=False) as db:
+            result = await db.execute(
+                update(Conversation)
+                .where(
+                    Conversation.id == conversation_id,
+                    Conversation.summary_through_message_num == conv.summary_through_message_num
+                )
+                .values(
+                    summary=llm_response.output_text,
+                    summary_through_message_num=to_fold[-1].message_num
+                )
+            )
+            await db.commit()
+        if result.rowcount == 0:
+            logger.info(f"Rolling summary for conversation {conversation_id} changed during refresh; discarding.")
+            return "conflict"
+        logger.info(f"Folded {len(to_fold)} message(s) into the rolling summary of conversation {conversation_id}.")
+        return "updated"
+
+
+settings = get_settings()
+conversation_summarizer = ConversationSummarizer(
+    refresh_messages=settings.chat_summary_refresh_messages,
+    keep_recent=settings.chat_summary_keep_recent_messages
+)
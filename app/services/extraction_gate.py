@@ -0,0 +1,105 @@
+from app.core import metrics
+from app.db.models.field_template import FieldType
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_GATE_DECISIONS = metrics.counter(
+    "extraction_gate_decisions_total",
+    "Extraction gate decisions (extract or skip) by reason; in shadow mode extraction runs either way",
+    ["decision", "reason"]
+)
+EXTRACTION_GATE_FALSE_NEGATIVES = metrics.counter(
+    "extraction_gate_false_negatives_total",
+    "Shadow-mode turns the gate would have skipped but whose extraction changed the form"
+)
+
+# Messages made up only of these words carry no form data. Yes/no
+# words are deliberately absent: they can answer a question about a
+# field ("Are you affiliated with Duke?" - "yes").
+ACKNOWLEDGEMENT_WORDS = frozenset({
+    "ok", "okay", "k", "kk", "cool", "great", "awesome", "perfect", "nice",
+    "thanks", "thank", "you", "thx", "ty", "much", "so", "very",
+    "got", "it", "sounds", "good", "makes", "sense", "understood",
+    "hi", "hello", "hey", "bye", "goodbye", "cheers", "alright",
+})
+MAX_ACKNOWLEDGEMENT_WORDS = 6
+
+_WORD = re.compile(r"[a-z']+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Speaking about themselves or their organization means the user may
+# be giving information, even in a question ("Can we start in March?")
+_FIRST_PERSON = re.compile(r"\b(i|i'm|im|i've|i'd|i'll|we|we're|we've|we'd|we'll|our|ours|my|mine)\b")
+
+# Values a field of each type could take. Questions containing one
+# are sent to extraction.
+FIELD_TYPE_SIGNALS = {
+    FieldType.EMAIL: re.compile(r"[^@\s]+@[^@\s]+\.[a-z]{2,}"),
+    FieldType.PHONE: re.compile(r"\+?\d[\d\s().-]{6,}\d"),
+    FieldType.INTEGER: re.compile(r"\d"),
+    FieldType.DATE: re.compile(
+        r"\d{1,4}[/-]\d{1,2}|\b(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b"
+        r"|\b(today|tomorrow|next|this) (week|month|year|quarter|semester)\b"
+    ),
+    FieldType.ADDRESS: re.compile(r"\d+\s+\w+.*\b(st|street|ave|avenue|rd|road|blvd|drive|dr|lane|ln|way|suite)\b"),
+}
+
+
+class GateDecision:
+    __slots__ = ("extract", "reason")
+
+    def __init__(self, extract: bool, reason: str):
+        self.extract = extract
+        self.reason = reason
+
+    def __repr__(self):
+        return f"GateDecision(extract={self.extract}, reason={self.reason!r})"
+
+
+def classify(message: str, field_types) -> GateDecision:
+    """
+    Decide, without calling an LLM, whether a user message could
+    change the form, i.e. whether LLM call 1 (`update_form`) is
+    needed. `field_types` are the `FieldType`s of the form's template.
+
+    Only skips what is clearly not form data:
+     - "no_fields": the form has no fields to fill;
+     - "acknowledgement": short messages made up only of
+       acknowledgement words ("ok", "thanks!", "got it");
+     - "question": messages that are all questions, don't talk about
+       the user or their organization, and contain nothing that looks
+       like a value for one of the form's field types ("What does
+       CFCI do?").
+    Anything else is extracted; a wasted extraction only costs
+    latency, a skipped one loses form data.
+    """
+    field_types = set(field_types)
+    if not field_types:
+        return GateDecision(False, "no_fields")
+
+    text = message.strip().lower()
+    words = _WORD.findall(text)
+    if not words:
+        return GateDecision(True, "no_words") if text else GateDecision(False, "acknowledgement")
+    if len(words) <= MAX_ACKNOWLEDGEMENT_WORDS and all(word in ACKNOWLEDGEMENT_WORDS for word in words):
+        return GateDecision(False, "acknowledgement")
+
+    sentences = [sentence for sentence in _SENTENCE_END.split(text) if sentence]
+    if all(sentence.endswith("?") for sentence in sentences):
+        if _FIRST_PERSON.search(text):
+            return GateDecision(True, "first_person")
+        for field_type in field_types:
+            signal = FIELD_TYPE_SIGNALS.get(field_type)
+            if signal is not None and signal.search(text):
+                return GateDecision(True, f"{field_type.value}_signal")
+        return GateDecision(False, "question")
+
+    return GateDecision(True, "statement")
+
+
+def record_decision(decision: GateDecision):
+    EXTRACTION_GATE_DECISIONS.labels(
+        decision="extract" if decision.extract else "skip",
+        reason=decision.reason
+    ).inc()
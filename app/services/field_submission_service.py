@@ -0,0 +1,71 @@
+from sqlalchemy import func
+from app.db.database import dialect_insert
+from app.db.models.field_submission import FieldSubmission, FieldStatus
+from app.schemas.openai_schemas import FieldToUpdate, FieldUpdateType
+import logging
+
+logger = logging.getLogger(__name__)
+
+def normalize_field_updates(fields_to_update: list[FieldToUpdate], valid_field_ids) -> dict:
+    """
+    Turn LLM call 1's `fields_to_update` into one update per field,
+    keyed by integer field_template_id.
+
+    Updates for fields that aren't on the form's template (or whose id
+    isn't an integer) are dropped with a warning. If the LLM names the
+    same field twice, the last entry wins - a single upsert statement
+    cannot touch the same row twice.
+    """
+    updates = {}
+    for field_update in fields_to_update:
+        try:
+            field_template_id = int(field_update.template_field_id)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring field update with non-integer template_field_id {field_update.template_field_id!r}.")
+            continue
+        if field_template_id not in valid_field_ids:
+            logger.warning(f"Ignoring field update for template field {field_template_id}, which is not on this form's template.")
+            continue
+        updates[field_template_id] = field_update
+    return updates
+
+
+async def upsert_field_submissions(db, form_id: int, updates: dict) -> list[FieldSubmission]:
+    """
+    Apply a batch of field updates (as returned by
+    `normalize_field_updates`) to a form in a single
+    `INSERT ... ON CONFLICT (form_id, field_template_id) DO UPDATE
+    ... RETURNING` statement.
+
+    "create" and "update" are treated alike: missing rows are inserted,
+    existing ones updated. The status follows the LLM's intent
+    (create -> DRAFT, update -> FINAL). Returns the written
+    `FieldSubmission`s; instances already in the session are refreshed
+    in place.
+    """
+    if not updates:
+        return []
+
+    insert = dialect_insert(db)
+    rows = [
+        {
+            "form_id": form_id,
+            "field_template_id": field_template_id,
+            "value": field_update.new_value,
+            "llm_confidence": field_update.confidence,
+            "status": FieldStatus.FINAL if field_update.type == FieldUpdateType.UPDATE else FieldStatus.DRAFT,
+        } for field_template_id, field_update in updates.items()
+    ]
+    stmt = insert(FieldSubmission).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FieldSubmission.form_id, FieldSubmission.field_template_id],
+        set_={
+            "value": stmt.excluded.value,
+            "llm_confidence": stmt.excluded.llm_confidence,
+            "status": stmt.excluded.status,
+            "updated_at": func.now(),
+        }
+    ).returning(FieldSubmission)
+
+    result = await db.scalars(stmt, execution_options={"populate_existing": True})
+    return list(result.all())
@@ -0,0 +1,212 @@
+from datetime import datetime
+from email_validator import validate_email, EmailNotValidError
+from app.core import metrics
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import FieldToUpdate, FieldUpdateType, UpdateFormLLMOutput
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+FIELD_VALUE_CHECKS = metrics.counter(
+    "field_value_checks_total",
+    "LLM-proposed field values checked against their field type (canonicalized, unchanged or invalid)",
+    ["field_type", "result"]
+)
+LOCAL_EXTRACTIONS = metrics.counter(
+    "field_value_local_extractions_total",
+    "Turns whose field update was parsed locally instead of by LLM call 1",
+    ["field_type"]
+)
+
+# Confidence given to LLM-proposed values that don't parse as their
+# field's type: kept (the raw text is still useful to a reviewer) but
+# marked uncertain, like the update_form prompt's own guesses (<0.3)
+UNVERIFIED_CONFIDENCE = 0.2
+# Confidence of values parsed locally from a message that is nothing
+# but the value itself
+LOCAL_CONFIDENCE = 0.95
+
+_PHONE_CHARS = re.compile(r"^\+?[\d\s().-]+$")
+_ORDINAL = re.compile(r"(\d)(st|nd|rd|th)\b")
+_SEPT = re.compile(r"\bsept\b", re.IGNORECASE)
+_DATE_FORMATS = (
+    ("%Y-%m-%d", "%Y-%m-%d"),
+    ("%m/%d/%Y", "%Y-%m-%d"),
+    ("%m/%d/%y", "%Y-%m-%d"),
+    ("%m-%d-%Y", "%Y-%m-%d"),
+    ("%B %d %Y", "%Y-%m-%d"),
+    ("%b %d %Y", "%Y-%m-%d"),
+    ("%d %B %Y", "%Y-%m-%d"),
+    ("%d %b %Y", "%Y-%m-%d"),
+    ("%Y-%m", "%Y-%m"),
+    ("%m/%Y", "%Y-%m"),
+    ("%B %Y", "%Y-%m"),
+    ("%b %Y", "%Y-%m"),
+)
+_INTEGER = re.compile(r"^\$?(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*(k|m|thousand|million)?$")
+_MULTIPLIERS = {None: 1, "k": 1_000, "thousand": 1_000, "m": 1_000_000, "million": 1_000_000}
+_NUMBER_WORDS = {
+    word: number for number, word in enumerate((
+        "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+        "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen",
+        "eighteen", "nineteen", "twenty"
+    ))
+}
+_BOOLEANS = {
+    **dict.fromkeys(("yes", "y", "yep", "yeah", "yup", "true", "correct", "affirmative", "absolutely", "definitely", "of course"), "Yes"),
+    **dict.fromkeys(("no", "n", "nope", "nah", "false", "negative", "not yet", "not really"), "No"),
+}
+
+
+def normalize_email(value: str):
+    value = value.strip().strip("<>").removeprefix("mailto:")
+    try:
+        return validate_email(value, check_deliverability=False).normalized
+    except EmailNotValidError:
+        return None
+
+
+def normalize_phone(value: str):
+    """
+    E.164 (`+19195550143`). Numbers without a country code are taken
+    to be North American.
+    """
+    value = value.strip()
+    if not _PHONE_CHARS.match(value):
+        return None
+    digits = re.sub(r"\D", "", value)
+    if value.startswith("+"):
+        return f"+{digits}" if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10:
+        return f"+1{digits}"
+    if len(digits) == 11 and digits.startswith("1"):
+        return f"+{digits}"
+    return None
+
+
+def normalize_date(value: str):
+    """
+    ISO 8601: `YYYY-MM-DD`, or `YYYY-MM` for a month. Relative or
+    partial dates ("next spring", "March 5") don't parse.
+    """
+    value = _ORDINAL.sub(r"\1", value.strip().replace(",", " "))
+    value = _SEPT.sub("Sep", value)  # %b only knows "Sep"
+    value = " ".join(value.split())
+    for parse_format, output_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, parse_format).strftime(output_format)
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_integer(value: str):
+    value = value.strip().lower()
+    if value in _NUMBER_WORDS:
+        return str(_NUMBER_WORDS[value])
+    match = _INTEGER.match(value)
+    if not match:
+        return None
+    whole, fraction, multiplier = match.groups()
+    number = float(f"{whole.replace(',', '')}{fraction or ''}") * _MULTIPLIERS[multiplier]
+    return str(int(number)) if number.is_integer() else None
+
+
+def normalize_boolean(value: str):
+    return _BOOLEANS.get(value.strip().lower().rstrip(".!"))
+
+
+# Field types with a deterministic parser; STRING and ADDRESS values
+# are free text and only ever come from the LLM
+NORMALIZERS = {
+    FieldType.EMAIL: normalize_email,
+    FieldType.PHONE: normalize_phone,
+    FieldType.DATE: normalize_date,
+    FieldType.INTEGER: normalize_integer,
+    FieldType.BOOLEAN: normalize_boolean,
+}
+
+
+def normalize_value(field_type: FieldType, value: str):
+    """
+    Canonical form of `value` for `field_type`, `value` itself for
+    free-text types, or None if it doesn't parse.
+    """
+    normalizer = NORMALIZERS.get(field_type)
+    if normalizer is None:
+        return value
+    return normalizer(value)
+
+
+def verify_field_updates(updates: dict, template) -> dict:
+    """
+    Check LLM call 1's updates (as returned by `normalize_field_updates`)
+    against their fields' types: values that parse are stored in
+    canonical form, values that don't are kept as-is but with
+    `UNVERIFIED_CONFIDENCE` at most.
+    """
+    verified = {}
+    for field_template_id, field_update in updates.items():
+        field = template.fields_by_id.get(field_template_id) if template else None
+        normalizer = NORMALIZERS.get(field.field_type) if field else None
+        if normalizer is None:
+            verified[field_template_id] = field_update
+            continue
+
+        canonical = normalizer(field_update.new_value)
+        if canonical is None:
+            FIELD_VALUE_CHECKS.labels(field_type=field.field_type.value, result="invalid").inc()
+            logger.warning(f"LLM value for {field.field_type.value} field {field_template_id} does not parse: {field_update.new_value!r}.")
+            if field_update.confidence is None or field_update.confidence > UNVERIFIED_CONFIDENCE:
+                field_update = field_update.model_copy(update={"confidence": UNVERIFIED_CONFIDENCE})
+        elif canonical != field_update.new_value:
+            FIELD_VALUE_CHECKS.labels(field_type=field.field_type.value, result="canonicalized").inc()
+            field_update = field_update.model_copy(update={"new_value": canonical})
+        else:
+            FIELD_VALUE_CHECKS.labels(field_type=field.field_type.value, result="unchanged").inc()
+        verified[field_template_id] = field_update
+    return verified
+
+
+def extract_locally(message: str, form_state):
+    """
+    Fill a field from the user's message without LLM call 1, when
+    that is unambiguous:
+     - every field still missing a value has a deterministic type, and
+     - the whole message (ignoring trailing punctuation) parses as a
+       value for exactly one of them ("dana@acme.io", "yes",
+       "03/15/2026").
+    Returns an `UpdateFormLLMOutput` with that one update, or None if
+    the turn needs the LLM.
+    """
+    template = form_state.template
+    if template is None:
+        return None
+    missing = [template.fields_by_id[field_id] for field_id in form_state.missing_field_ids()]
+    if not missing or any(field.field_type not in NORMALIZERS for field in missing):
+        return None
+
+    text = message.strip().rstrip(".!")
+    matches = []
+    for field in missing:
+        canonical = NORMALIZERS[field.field_type](text)
+        if canonical is not None:
+            matches.append((field, canonical))
+            if len(matches) > 1:
+                return None
+    if not matches:
+        return None
+
+    field, canonical = matches[0]
+    LOCAL_EXTRACTIONS.labels(field_type=field.field_type.value).inc()
+    return UpdateFormLLMOutput(fields_to_update=[
+        FieldToUpdate(
+            type=FieldUpdateType.CREATE,
+            template_field_id=str(field.id),
+            field_name=field.name,
+            new_value=canonical,
+            confidence=LOCAL_CONFIDENCE,
+            reasoning=f"The user's message is a {field.field_type.value} value, parsed locally."
+        )
+    ])
@@ -0,0 +1,98 @@
+from app.services.form_template_cache import CompiledFormTemplate, FIELD_SEPARATOR
+
+FORM_CONTEXT_HEADER = "### LATEST STATE OF THE FORM\n\n"
+# Field definitions of a form without a template
+NO_FIELD_DEFINITIONS = "No form fields."
+
+
+class FormState:
+    """
+    Per-request view of a form being filled out: the compiled form
+    template plus the form's `FieldSubmission`s indexed by
+    field_template_id.
+
+    Built once per chat turn and updated in place as LLM call 1's
+    `fields_to_update` are applied, so lookups are O(1) instead of a
+    scan over every submission. Both form context variants (with
+    template field IDs for LLM call 1, without for LLM call 2) are
+    rendered together in a single pass and cached until the next
+    change. The form context only holds the current values: the
+    field definitions go in the system prompts, so the volatile part
+    of each prompt comes after a stable, cacheable prefix.
+
+    Updates are first `stage`d in memory (so the reply prompt sees
+    them), then written to the database at the end of the turn and
+    indexed back in with `add`.
+    """
+
+    def __init__(self, template: CompiledFormTemplate, submissions=()):
+        self.template = template
+        self.submissions = {fs.field_template_id: fs for fs in submissions}
+        self.staged = {}
+        self._rendered = None
+
+    def value(self, field_template_id: int):
+        if field_template_id in self.staged:
+            return self.staged[field_template_id].new_value
+        submission = self.submissions.get(field_template_id)
+        return submission.value if submission else None
+
+    def stage(self, updates: dict):
+        """
+        Apply not-yet-persisted field updates (field_template_id ->
+        `FieldToUpdate`) on top of the stored submissions.
+        """
+        if updates:
+            self.staged.update(updates)
+            self._rendered = None
+
+    def add(self, submission):
+        """
+        Index a newly written submission, replacing any staged
+        update for the same field.
+        """
+        self.submissions[submission.field_template_id] = submission
+        self.staged.pop(submission.field_template_id, None)
+        self._rendered = None
+
+    def missing_field_ids(self) -> list:
+        """
+        Template field ids that have no value yet, in template order.
+        """
+        if self.template is None:
+            return []
+        return [field.id for field in self.template.fields if self.value(field.id) is None]
+
+    def definitions(self) -> tuple:
+        """
+        The template's field definitions as `(with_ids, without_ids)`,
+        for the system prompts. Unlike the form context, they never
+        change during a turn.
+        """
+        if self.template is None:
+            return NO_FIELD_DEFINITIONS, NO_FIELD_DEFINITIONS
+        return self.template.definitions_with_ids, self.template.definitions_without_ids
+
+    def render(self) -> tuple:
+        """
+        Render the form context (each field's current value; their
+        definitions are in `definitions()`) as `(with_ids, without_ids)`.
+        """
+        if self._rendered is not None:
+            return self._rendered
+
+        with_ids = [FORM_CONTEXT_HEADER]
+        without_ids = [FORM_CONTEXT_HEADER]
+        if self.template is not None:
+            for field in self.template.fields:
+                value = self.value(field.id)
+                value = "NONE" if value is None else str(value)
+                with_ids.append(field.prefix_with_id)
+                with_ids.append(value)
+                with_ids.append(FIELD_SEPARATOR)
+                without_ids.append(field.prefix_without_id)
+                without_ids.append(value)
+                without_ids.append(FIELD_SEPARATOR)
+
+        self._rendered = ("".join(with_ids), "".join(without_ids))
+        return self._rendered
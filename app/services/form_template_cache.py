@@ -0,0 +1,125 @@
+from cachetools import TTLCache
+from sqlalchemy import select
+from app.core.config import get_settings
+from app.core import metrics
+from app.db.models.field_template import FieldTemplate
+from app.db.models.form_template import FormTemplate
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Between field blocks, in both the field definitions and the form state
+FIELD_SEPARATOR = "\n--\n"
+
+TEMPLATE_CACHE_LOOKUPS = metrics.counter(
+    "form_template_cache_lookups_total",
+    "Form template cache lookups",
+    ["result"]
+)
+
+
+class CompiledField:
+    """
+    Static, per-template parts of one field's blocks in the prompts,
+    each rendered up front in both variants (with and without the
+    template field ID):
+     - its definition (name, data type, instructions), listed in the
+       "FORM FIELDS" section of the system prompts;
+     - its prefix in the "LATEST STATE OF THE FORM" context, up to and
+       including "Current value: ", so a turn only has to append the
+       submission value.
+    """
+    __slots__ = (
+        "id", "name", "field_type", "description",
+        "definition_with_id", "definition_without_id", "prefix_with_id", "prefix_without_id"
+    )
+
+    def __init__(self, field_template: FieldTemplate):
+        self.id = field_template.id
+        self.name = field_template.name
+        self.field_type = field_template.field_type
+        self.description = field_template.description
+
+        name_line = f"Field name: {self.name}\n"
+        id_line = f"Template field ID: {self.id}\n"
+        rest = (
+            f"Field data type: {self.field_type}\n"
+            f"Field instructions: {self.description}"
+        )
+        self.definition_with_id = f"{name_line}{id_line}{rest}"
+        self.definition_without_id = f"{name_line}{rest}"
+        self.prefix_with_id = f"{name_line}{id_line}Current value: "
+        self.prefix_without_id = f"{name_line}Current value: "
+
+
+class CompiledFormTemplate:
+    """
+    Immutable snapshot of a `FormTemplate` and its field templates,
+    ordered by field template id, with its field definitions rendered
+    once (`definitions_with_ids`, `definitions_without_ids`). They
+    only change with the template, so the system prompts they go in
+    are a stable prefix across every turn of every conversation on
+    this template, which providers can cache.
+    """
+
+    def __init__(self, form_template: FormTemplate, field_templates):
+        self.id = form_template.id
+        self.name = form_template.name
+        self.fields = tuple(CompiledField(ft) for ft in field_templates)
+        self.fields_by_id = {field.id: field for field in self.fields}
+        self.field_ids = frozenset(self.fields_by_id)
+        self.definitions_with_ids = FIELD_SEPARATOR.join(field.definition_with_id for field in self.fields)
+        self.definitions_without_ids = FIELD_SEPARATOR.join(field.definition_without_id for field in self.fields)
+
+
+class FormTemplateCache:
+    """
+    Process-wide cache of `CompiledFormTemplate`s keyed by
+    form_template_id, invalidated by the admin field_template endpoints.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 300.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    async def get(self, db, form_template_id: int) -> CompiledFormTemplate:
+        with self._lock:
+            compiled = self._cache.get(form_template_id)
+        if compiled is not None:
+            TEMPLATE_CACHE_LOOKUPS.labels(result="hit").inc()
+            return compiled
+
+        TEMPLATE_CACHE_LOOKUPS.labels(result="miss").inc()
+        form_template = (await db.execute(
+            select(FormTemplate).where(FormTemplate.id == form_template_id)
+        )).scalars().first()
+        if form_template is None:
+            return None
+        field_templates = (await db.execute(
+            select(FieldTemplate)
+            .where(FieldTemplate.form_template_id == form_template_id)
+            .order_by(FieldTemplate.id)
+        )).scalars().all()
+
+        compiled = CompiledFormTemplate(form_template, field_templates)
+        with self._lock:
+            self._cache[form_template_id] = compiled
+        logger.info(f"Compiled form template {form_template_id} with {len(compiled.fields)} fields.")
+        return compiled
+
+    def invalidate(self, form_template_id: int):
+        with self._lock:
+            self._cache.pop(form_template_id, None)
+        logger.info(f"Invalidated cached form template {form_template_id}.")
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+settings = get_settings()
+form_template_cache = FormTemplateCache(
+    maxsize=settings.form_template_cache_size,
+    ttl=settings.form_template_cache_ttl_seconds
+)
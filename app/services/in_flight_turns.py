@@ -0,0 +1,35 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightTurns:
+    """
+    Chat turns currently being computed in this process, keyed by
+    (conversation_id, message_step_num), so a retry that arrives while
+    the original is still running waits for its result instead of
+    running the LLM calls a second time.
+
+    Each entry is a future that resolves to the stored agent `Message`,
+    or to None if the original turn failed (the waiter then runs the
+    turn itself). Retries handled by another worker process are caught
+    by the messages table's unique constraint instead.
+    """
+
+    def __init__(self):
+        self._turns = {}
+
+    def get(self, key):
+        return self._turns.get(key)
+
+    def start(self, key):
+        self._turns[key] = asyncio.get_running_loop().create_future()
+
+    def finish(self, key, agent_message=None):
+        future = self._turns.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(agent_message)
+
+
+in_flight_turns = InFlightTurns()
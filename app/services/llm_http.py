@@ -0,0 +1,203 @@
+from app.core import metrics
+import asyncio
+import weakref
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+"""
+HTTP connection pools for the LLM provider SDKs.
+
+Each provider gets one long-lived `httpx.AsyncClient` (see
+`build_llm_http_client`), sized from the settings rather than the
+SDK defaults, so concurrent calls reuse warm connections instead of
+paying a TCP + TLS handshake each. The pool is warmed at startup
+(`warm_up`) and closed with its SDK client on shutdown.
+
+Exposes, through `app.core.metrics`, per provider:
+ - requests holding a connection, and requests queued for one (the
+   first thing to grow when the pool is too small),
+ - connections opened (steady growth means churn: keepalive expiry
+   too short, or more concurrency than keepalive connections).
+These are counted from httpcore's public `trace` request extension,
+not read from the pool's internals.
+"""
+
+LLM_HTTP_REQUESTS_ACTIVE = metrics.gauge(
+    "llm_http_requests_active",
+    "LLM requests holding a pooled connection (sent, response not yet closed), by provider",
+    ["provider"]
+)
+LLM_HTTP_REQUESTS_QUEUED = metrics.gauge(
+    "llm_http_requests_queued",
+    "LLM requests waiting for a pooled connection, by provider",
+    ["provider"]
+)
+LLM_HTTP_CONNECTIONS_OPENED = metrics.counter(
+    "llm_http_connections_opened_total",
+    "Connections opened by the LLM client pools (TCP + TLS handshakes), by provider",
+    ["provider"]
+)
+
+# Pooled clients built by `build_llm_http_client`, to their transport
+_transports = weakref.WeakKeyDictionary()
+
+
+class InstrumentedAsyncTransport(httpx.AsyncHTTPTransport):
+    """
+    `AsyncHTTPTransport` that counts its requests and new connections
+    through httpcore's `trace` extension, and reports them in `stats()`.
+
+    A request is queued from when it reaches the transport until
+    httpcore starts sending it on a connection, then active until its
+    response is closed (or it fails).
+    """
+
+    def __init__(self, provider: str, limits: httpx.Limits = httpx.Limits(), **kwargs):
+        super().__init__(limits=limits, **kwargs)
+        self.provider = provider
+        self.http2 = kwargs.get("http2", False)
+        self.limits = limits
+        self.requests_active = 0
+        self.requests_queued = 0
+        self.connections_opened = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stage = _RequestStage(self)
+        previous = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict):
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+                LLM_HTTP_CONNECTIONS_OPENED.labels(provider=self.provider).inc()
+            elif event_name.endswith(".send_request_headers.started"):
+                stage.send()
+            if previous is not None:
+                await previous(event_name, info)
+
+        request.extensions["trace"] = trace
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            stage.finish()
+            raise
+        # The connection goes back to the pool when the body is closed
+        response.stream = _FinishOnClose(response.stream, stage)
+        return response
+
+    def _update_gauges(self):
+        LLM_HTTP_REQUESTS_ACTIVE.labels(provider=self.provider).set(self.requests_active)
+        LLM_HTTP_REQUESTS_QUEUED.labels(provider=self.provider).set(self.requests_queued)
+
+    def stats(self) -> dict:
+        """
+        The pool's limits, its requests right now (active/queued) and
+        the connections it has opened so far.
+        """
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "requests_active": self.requests_active,
+            "requests_queued": self.requests_queued,
+            "connections_opened": self.connections_opened,
+        }
+
+
+class _RequestStage:
+    """
+    Where one request is in the transport: queued, then active (once
+    sent, including retries on a new connection), then finished.
+    """
+
+    def __init__(self, transport: InstrumentedAsyncTransport):
+        self.transport = transport
+        self.state = "queued"
+        transport.requests_queued += 1
+        transport._update_gauges()
+
+    def send(self):
+        if self.state == "queued":
+            self.state = "active"
+            self.transport.requests_queued -= 1
+            self.transport.requests_active += 1
+            self.transport._update_gauges()
+
+    def finish(self):
+        if self.state == "queued":
+            self.transport.requests_queued -= 1
+        elif self.state == "active":
+            self.transport.requests_active -= 1
+        else:
+            return
+        self.state = "finished"
+        self.transport._update_gauges()
+
+
+class _FinishOnClose(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, stage: _RequestStage):
+        self._stream = stream
+        self._stage = stage
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._stage.finish()
+
+
+def pool_stats(client: httpx.AsyncClient) -> dict:
+    """
+    `stats()` of a client built by `build_llm_http_client`, or None.
+    """
+    transport = _transports.get(client)
+    return transport.stats() if transport is not None else None
+
+
+def build_llm_http_client(settings, provider: str) -> httpx.AsyncClient:
+    """
+    Pooled client for one provider's SDK, over HTTP/2 (one multiplexed
+    connection per host) unless `llm_http2` is off.
+    """
+    transport = InstrumentedAsyncTransport(
+        provider,
+        http2=settings.llm_http2,
+        limits=httpx.Limits(
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive_connections=settings.llm_http_max_keepalive_connections,
+            keepalive_expiry=settings.llm_http_keepalive_expiry_seconds
+        )
+    )
+    client = httpx.AsyncClient(
+        transport=transport,
+        # Overall deadlines are the resilience policy's; these bound
+        # each phase of a single request
+        timeout=httpx.Timeout(settings.llm_http_timeout_seconds, connect=settings.llm_http_connect_timeout_seconds),
+        follow_redirects=True
+    )
+    _transports[client] = transport
+    return client
+
+
+async def warm_up(client: httpx.AsyncClient, url: str, connections: int) -> int:
+    """
+    Open up to `connections` pooled connections to `url`'s host ahead
+    of the first calls (DNS, TCP and TLS), with concurrent HEAD
+    requests; any HTTP status will do. Returns how many succeeded;
+    failures are logged, never raised.
+    """
+    async def touch():
+        response = await client.head(url)
+        await response.aclose()
+
+    results = await asyncio.gather(*(touch() for _ in range(connections)), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        logger.warning(f"LLM connection warm-up to {url}: {len(errors)}/{connections} failed ({type(errors[0]).__name__}: {errors[0]}).")
+    return connections - len(errors)
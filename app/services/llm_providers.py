@@ -0,0 +1,392 @@
+from openai import AsyncOpenAI
+from google import genai
+from google.genai import errors as genai_errors, types as genai_types
+from pydantic import BaseModel
+from app.services.llm_resilience import LLMResponseError, TransientLLMError
+from app.services import llm_http
+import asyncio
+import anthropic
+import json
+import logging
+import httpx
+import xxhash
+
+logger = logging.getLogger(__name__)
+
+"""
+Adapters between `LLMRouter` (app/services/llm_router.py) and each
+provider's SDK. Every adapter exposes the same two calls:
+
+ - `parse(model, system_prompt, user_prompt, response_format)`, one
+   structured request, returning `(parsed, usage)` where `parsed` is
+   an instance of the pydantic `response_format`;
+ - `stream(model, system_prompt, user_prompt)`, an async iterator of
+   plain-text deltas (`str`), ending with a single `Usage`;
+
+plus `close()`. Adapters built with a pooled `http_client` (see
+app/services/llm_http.py) also have `warm_up(connections)` and
+`pool_stats()`. Transient upstream failures (timeouts, dropped
+connections, 429s, 5xx) surface as errors the resilience policy
+retries: the OpenAI SDK's own, `TransientLLMError` for the others.
+Responses that failed or were cut short raise `LLMResponseError`, so
+a stream only ends normally (with its `Usage`) once it is complete.
+"""
+
+
+class Usage:
+    """
+    Tokens billed for one request. `cached_tokens` are the part of
+    `input_tokens` read from the provider's prompt cache (a repeated
+    prompt prefix), billed at a discount.
+    """
+    __slots__ = ("input_tokens", "output_tokens", "cached_tokens")
+
+    def __init__(self, input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0):
+        self.input_tokens = input_tokens or 0
+        self.output_tokens = output_tokens or 0
+        self.cached_tokens = cached_tokens or 0
+
+
+def _openai_usage(usage) -> Usage:
+    if usage is None:
+        return Usage()
+    details = usage.input_tokens_details
+    return Usage(usage.input_tokens, usage.output_tokens, details.cached_tokens if details else 0)
+
+
+# Responses API error codes worth retrying
+_OPENAI_TRANSIENT_CODES = {"server_error", "rate_limit_exceeded"}
+
+
+def _openai_stream_error(event) -> Exception:
+    """
+    The error to raise for a failed (`error`, `response.failed`) or
+    cut short (`response.incomplete`) stream.
+    """
+    if event.type == "response.incomplete":
+        details = event.response.incomplete_details
+        return LLMResponseError(f"openai: response incomplete ({details.reason if details else 'unknown reason'})")
+    error = event if event.type == "error" else event.response.error
+    code = error.code if error else None
+    message = f"openai: {event.type} ({code}: {error.message if error else 'no details'})"
+    if code in _OPENAI_TRANSIENT_CODES:
+        return TransientLLMError(message)
+    return LLMResponseError(message)
+
+
+class OpenAIProvider:
+    """
+    OpenAI Responses API (`responses.parse` for structured output).
+    Pass the `http_client` the `AsyncOpenAI` client was built with to
+    warm it up and report its pool.
+    """
+    name = "openai"
+
+    def __init__(self, client: AsyncOpenAI, http_client: httpx.AsyncClient = None):
+        self.client = client
+        self.http_client = http_client
+
+    async def warm_up(self, connections: int) -> int:
+        if self.http_client is None:
+            return 0
+        return await llm_http.warm_up(self.http_client, str(self.client.base_url), connections)
+
+    def pool_stats(self) -> dict:
+        if self.http_client is None:
+            return None
+        return llm_http.pool_stats(self.http_client)
+
+    @staticmethod
+    def _input(system_prompt: str, user_prompt: str) -> list:
+        return [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": user_prompt
+            }
+        ]
+
+    async def parse(self, model: str, system_prompt: str, user_prompt: str, response_format: type[BaseModel]):
+        response = await self.client.responses.parse(
+            model=model,
+            input=self._input(system_prompt, user_prompt),
+            text_format=response_format
+        )
+        return response.output_parsed, _openai_usage(response.usage)
+
+    async def stream(self, model: str, system_prompt: str, user_prompt: str):
+        stream = await self.client.responses.create(
+            model=model,
+            input=self._input(system_prompt, user_prompt),
+            stream=True
+        )
+        usage = None
+        async with stream:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+                elif event.type == "response.completed":
+                    usage = _openai_usage(event.response.usage)
+                elif event.type in ("error", "response.failed", "response.incomplete"):
+                    raise _openai_stream_error(event)
+        # Only a response.completed event means the text is complete
+        if usage is None:
+            raise TransientLLMError("openai: stream ended before response.completed")
+        yield usage
+
+    async def close(self):
+        await self.client.close()
+
+
+def _anthropic_usage(usage) -> Usage:
+    # Anthropic's input_tokens leave out the tokens read from or
+    # written to the prompt cache
+    cache_read = usage.cache_read_input_tokens or 0
+    cache_write = usage.cache_creation_input_tokens or 0
+    return Usage(usage.input_tokens + cache_read + cache_write, usage.output_tokens, cache_read)
+
+
+def _anthropic_transient(e: Exception) -> bool:
+    if isinstance(e, (anthropic.APIConnectionError, anthropic.RateLimitError)):
+        return True
+    # 5xx, including 529 "overloaded"
+    return isinstance(e, anthropic.APIStatusError) and e.status_code >= 500
+
+
+class AnthropicProvider:
+    """
+    Anthropic Messages API. Structured output is requested as a forced
+    tool call whose input schema is the `response_format`'s JSON schema.
+    Anthropic only caches prompt prefixes marked for it, so the system
+    prompt (the stable prefix of our prompts) carries a cache breakpoint.
+    """
+    name = "anthropic"
+
+    def __init__(self, api_key: str, max_tokens: int = 1024, http_client: httpx.AsyncClient = None):
+        self.client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            max_retries=0,
+            http_client=http_client,
+            **({"timeout": http_client.timeout} if http_client is not None else {})
+        )
+        self.http_client = http_client
+        self.max_tokens = max_tokens
+
+    async def warm_up(self, connections: int) -> int:
+        if self.http_client is None:
+            return 0
+        return await llm_http.warm_up(self.http_client, str(self.client.base_url), connections)
+
+    def pool_stats(self) -> dict:
+        if self.http_client is None:
+            return None
+        return llm_http.pool_stats(self.http_client)
+
+    def _request(self, model: str, system_prompt: str, user_prompt: str) -> dict:
+        request = {
+            "model": model,
+            "max_tokens": self.max_tokens,
+            "messages": [{"role": "user", "content": user_prompt}]
+        }
+        # Anthropic rejects an empty system prompt
+        if system_prompt:
+            request["system"] = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+        return request
+
+    async def parse(self, model: str, system_prompt: str, user_prompt: str, response_format: type[BaseModel]):
+        tool = {
+            "name": response_format.__name__,
+            "description": "Record the response.",
+            "input_schema": response_format.model_json_schema()
+        }
+        try:
+            message = await self.client.messages.create(
+                **self._request(model, system_prompt, user_prompt),
+                tools=[tool],
+                tool_choice={"type": "tool", "name": tool["name"]}
+            )
+        except Exception as e:
+            if _anthropic_transient(e):
+                raise TransientLLMError(f"anthropic: {e}") from e
+            raise
+        tool_input = next((block.input for block in message.content if block.type == "tool_use"), None)
+        if tool_input is None:
+            # e.g. cut short by max_tokens before the tool call
+            raise LLMResponseError(f"anthropic: no {tool['name']} tool call in the response (stop reason {message.stop_reason})")
+        return response_format.model_validate(tool_input), _anthropic_usage(message.usage)
+
+    async def stream(self, model: str, system_prompt: str, user_prompt: str):
+        try:
+            async with self.client.messages.stream(**self._request(model, system_prompt, user_prompt)) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                message = await stream.get_final_message()
+        except Exception as e:
+            if _anthropic_transient(e):
+                raise TransientLLMError(f"anthropic: {e}") from e
+            raise
+        if message.stop_reason in ("max_tokens", "refusal"):
+            raise LLMResponseError(f"anthropic: response incomplete ({message.stop_reason})")
+        yield _anthropic_usage(message.usage)
+
+    async def close(self):
+        await self.client.close()
+
+
+def _gemini_transient(e: Exception) -> bool:
+    if isinstance(e, genai_errors.ServerError):
+        return True
+    return isinstance(e, genai_errors.APIError) and e.code == 429
+
+
+def _gemini_usage(metadata) -> Usage:
+    if metadata is None:
+        return Usage()
+    return Usage(metadata.prompt_token_count, metadata.candidates_token_count, metadata.cached_content_token_count)
+
+
+class GeminiProvider:
+    """
+    Google Gemini API (google-genai). Structured output uses the
+    `response_format` as the response schema. Gemini 2.5 models cache
+    repeated prompt prefixes implicitly.
+    """
+    name = "gemini"
+
+    def __init__(self, api_key: str):
+        self.client = genai.Client(api_key=api_key)
+
+    async def parse(self, model: str, system_prompt: str, user_prompt: str, response_format: type[BaseModel]):
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=model,
+                contents=user_prompt,
+                config=genai_types.GenerateContentConfig(
+                    system_instruction=system_prompt or None,
+                    response_mime_type="application/json",
+                    response_schema=response_format
+                )
+            )
+        except Exception as e:
+            if _gemini_transient(e):
+                raise TransientLLMError(f"gemini: {e}") from e
+            raise
+        parsed = response.parsed
+        if not isinstance(parsed, response_format):
+            if not response.text:
+                # e.g. blocked by a safety filter before any output
+                finish_reason = response.candidates[0].finish_reason if response.candidates else None
+                raise LLMResponseError(f"gemini: no structured output in the response (finish reason {finish_reason})")
+            parsed = response_format.model_validate_json(response.text)
+        return parsed, _gemini_usage(response.usage_metadata)
+
+    async def stream(self, model: str, system_prompt: str, user_prompt: str):
+        metadata = None
+        finish_reason = None
+        try:
+            chunks = await self.client.aio.models.generate_content_stream(
+                model=model,
+                contents=user_prompt,
+                config=genai_types.GenerateContentConfig(system_instruction=system_prompt or None)
+            )
+            async for chunk in chunks:
+                if chunk.usage_metadata is not None:
+                    metadata = chunk.usage_metadata
+                if chunk.candidates and chunk.candidates[0].finish_reason is not None:
+                    finish_reason = chunk.candidates[0].finish_reason
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            if _gemini_transient(e):
+                raise TransientLLMError(f"gemini: {e}") from e
+            raise
+        if finish_reason is not None and finish_reason != genai_types.FinishReason.STOP:
+            raise LLMResponseError(f"gemini: response incomplete ({finish_reason})")
+        yield _gemini_usage(metadata)
+
+    async def close(self):
+        close = getattr(self.client.aio, "aclose", None)
+        if close is not None:
+            await close()
+
+
+def fake_instance(schema: dict, text: str = "fake", defs: dict = None):
+    """
+    Smallest JSON value matching `schema`, with `text` for strings.
+    """
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return fake_instance(defs[schema["$ref"].split("/")[-1]], text, defs)
+    if "anyOf" in schema:
+        return fake_instance(schema["anyOf"][0], text, defs)
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: fake_instance(prop, text, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return []
+    if kind == "string":
+        return schema["enum"][0] if "enum" in schema else text
+    if kind in ("number", "integer"):
+        return 0
+    if kind == "boolean":
+        return False
+    return None
+
+
+class FakeProvider:
+    """
+    Deterministic local provider for tests and benchmarks: no network,
+    and the same prompt always gets the same answer. Structured calls
+    return the smallest instance of the `response_format` (strings
+    set to the reply text, lists empty); streams yield the reply text
+    word by word.
+
+    Each model answers after `latencies[model]` seconds (`latency`
+    otherwise). Models in `failing` raise `TransientLLMError`, to
+    exercise failover. Prompt caching is simulated on the system
+    prompt: once a model has seen one, its tokens count as cached.
+    """
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, latencies: dict = None):
+        self.latency = latency
+        self.latencies = dict(latencies or {})
+        self.failing = set()
+        self.calls = []
+        self._cached_prefixes = set()
+
+    def reply(self, model: str, user_prompt: str) -> str:
+        digest = xxhash.xxh3_64_hexdigest(user_prompt.encode())[:8]
+        return f"Thanks! Could you tell me a bit more about your project? ({model} {digest})"
+
+    def _usage(self, model: str, system_prompt: str, user_prompt: str, text: str) -> Usage:
+        prefix = (model, xxhash.xxh3_64_intdigest(system_prompt.encode()))
+        cached = len(system_prompt) // 4 if prefix in self._cached_prefixes else 0
+        self._cached_prefixes.add(prefix)
+        return Usage((len(system_prompt) + len(user_prompt)) // 4, max(1, len(text) // 4), cached)
+
+    async def _respond(self, model: str):
+        self.calls.append(model)
+        await asyncio.sleep(self.latencies.get(model, self.latency))
+        if model in self.failing:
+            raise TransientLLMError(f"fake: {model} is failing")
+
+    async def parse(self, model: str, system_prompt: str, user_prompt: str, response_format: type[BaseModel]):
+        await self._respond(model)
+        text = self.reply(model, user_prompt)
+        parsed = response_format.model_validate(fake_instance(response_format.model_json_schema(), text))
+        return parsed, self._usage(model, system_prompt, user_prompt, json.dumps(parsed.model_dump()))
+
+    async def stream(self, model: str, system_prompt: str, user_prompt: str):
+        await self._respond(model)
+        text = self.reply(model, user_prompt)
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+        yield self._usage(model, system_prompt, user_prompt, text)
+
+    async def close(self):
+        pass
@@ -0,0 +1,377 @@
+from collections import deque
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+from app.core import metrics
+import asyncio
+import math
+import time
+import logging
+import openai
+
+logger = logging.getLogger(__name__)
+
+LLM_RETRIES = metrics.counter(
+    "llm_retries_total",
+    "LLM call attempts retried after a retryable error, by prompt and error",
+    ["prompt", "error"]
+)
+LLM_DEADLINES_EXCEEDED = metrics.counter(
+    "llm_deadline_exceeded_total",
+    "LLM calls that ran out of time (retries included), by prompt",
+    ["prompt"]
+)
+LLM_HEDGES = metrics.counter(
+    "llm_hedges_total",
+    "Hedged LLM requests sent after the p95 delay, by prompt and which request answered first",
+    ["prompt", "winner"]
+)
+LLM_CIRCUIT_STATE = metrics.gauge(
+    "llm_circuit_state",
+    "LLM circuit breaker state (0 closed, 1 half-open, 2 open), by provider",
+    ["provider"]
+)
+LLM_CIRCUIT_REJECTIONS = metrics.counter(
+    "llm_circuit_rejections_total",
+    "LLM calls failed fast because the circuit breaker was open, by provider",
+    ["provider"]
+)
+
+
+class TransientLLMError(Exception):
+    """
+    A transient failure from a provider other than OpenAI (see
+    app/services/llm_providers.py), retried like OpenAI's own.
+    """
+
+
+class LLMResponseError(Exception):
+    """
+    A provider answered, but not with a usable response: it failed,
+    was cut short (output token limit, content filter) or is missing
+    its structured output. Not retried, but `LLMRouter` fails over to
+    the route's next model on it.
+    """
+
+
+# Errors worth another attempt: the request may well succeed if sent
+# again (timeouts, dropped connections, 429s and 5xx from upstream).
+# They are also what counts as a failure for the circuit breaker.
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    TransientLLMError,
+    TimeoutError
+)
+
+
+def is_retryable(e: BaseException) -> bool:
+    return isinstance(e, RETRYABLE_ERRORS)
+
+
+class LLMUnavailable(Exception):
+    """
+    Base for LLM calls given up on without an answer from upstream.
+    `status_code` is the HTTP status to answer with; `retry_after`, if
+    set, a whole number of seconds for the Retry-After header.
+    """
+    status_code = 503
+    retry_after = None
+
+
+class LLMDeadlineExceeded(LLMUnavailable):
+    status_code = 504
+
+    def __init__(self, prompt_name: str, deadline: float):
+        super().__init__(f"LLM call {prompt_name} did not complete within its {deadline:g}s deadline.")
+
+
+class CircuitOpen(LLMUnavailable):
+    status_code = 503
+
+    def __init__(self, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"LLM circuit breaker is open, retry in {self.retry_after}s.")
+
+
+class CircuitBreaker:
+    """
+    Fails LLM calls fast while upstream is failing.
+
+    Closed: calls go through, and their outcomes over the last `window`
+    seconds are kept. Once at least `min_calls` were made in the window
+    and `failure_ratio` of them failed (see `RETRYABLE_ERRORS`), the
+    breaker opens: every call raises `CircuitOpen` for `cooldown`
+    seconds. After that it is half-open: a single probe call goes
+    through, closing the breaker if it succeeds and reopening it if it
+    fails. Must be used from the event loop thread.
+
+    `provider` labels its metrics (one breaker per provider).
+    """
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, window: float = 30.0, min_calls: int = 10, failure_ratio: float = 0.5, cooldown: float = 15.0, provider: str = "openai"):
+        self.provider = provider
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._outcomes = deque()  # (time, failed)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _set_state(self, state: int):
+        self.state = state
+        LLM_CIRCUIT_STATE.labels(provider=self.provider).set(state)
+
+    def before_call(self):
+        """
+        Raise `CircuitOpen` unless a call may go through now.
+        """
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if remaining > 0:
+                LLM_CIRCUIT_REJECTIONS.labels(provider=self.provider).inc()
+                raise CircuitOpen(remaining)
+            self._set_state(self.HALF_OPEN)
+            logger.info(f"LLM circuit breaker ({self.provider}) half-open, sending a probe call.")
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                LLM_CIRCUIT_REJECTIONS.labels(provider=self.provider).inc()
+                raise CircuitOpen(1)
+            self._probing = True
+
+    def record(self, failed):
+        """
+        Record a call's outcome; `failed` is None for a call that was
+        cancelled before it got one (a losing hedge, a client gone).
+        """
+        if self.state == self.HALF_OPEN and self._probing:
+            self._probing = False
+            if failed:
+                self._open()
+            elif failed is not None:
+                self._close()
+            return
+        if failed is None:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            _, old_failed = self._outcomes.popleft()
+            self._failures -= old_failed
+        if (
+            self.state == self.CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and self._failures >= self.failure_ratio * len(self._outcomes)
+        ):
+            self._open()
+
+    def _open(self):
+        logger.warning(
+            f"LLM circuit breaker ({self.provider}) open for {self.cooldown:g}s "
+            f"({self._failures}/{len(self._outcomes)} calls failed in the last {self.window:g}s)."
+        )
+        self._opened_at = time.monotonic()
+        self._set_state(self.OPEN)
+
+    def _close(self):
+        logger.info(f"LLM circuit breaker ({self.provider}) closed, probe call succeeded.")
+        self._outcomes.clear()
+        self._failures = 0
+        self._set_state(self.CLOSED)
+
+
+class LatencyTracker:
+    """
+    The latencies of the last `size` successful attempts per prompt,
+    for the hedging delay.
+    """
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._samples = {}
+
+    def record(self, prompt_name: str, seconds: float):
+        samples = self._samples.get(prompt_name)
+        if samples is None:
+            samples = self._samples[prompt_name] = deque(maxlen=self.size)
+        samples.append(seconds)
+
+    def quantile(self, prompt_name: str, q: float, min_samples: int):
+        samples = self._samples.get(prompt_name)
+        if samples is None or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMResilience:
+    """
+    Deadlines, retries, hedging and a circuit breaker around single
+    LLM requests (`call`), for `LLMRouter`; the router keeps one per
+    provider, so each provider has its own circuit breaker.
+
+    - Every call has a deadline, retries included (`deadlines` by
+      prompt name, `default_deadline` otherwise), and each attempt
+      its own `attempt_timeout`. A call out of time raises
+      `LLMDeadlineExceeded`.
+    - Attempts failing with a retryable error (`RETRYABLE_ERRORS`) are
+      retried up to `max_attempts` in all, after a random exponential
+      backoff (full jitter, `backoff` doubling up to `backoff_max`).
+    - With `hedge` on, a call that hasn't answered after the prompt's
+      recent p95 latency (`hedge_quantile`, at least `hedge_min_delay`)
+      sends a second, identical request and takes whichever answers
+      first. Only calls made with `hedge=True` are hedged, once
+      `hedge_min_samples` latencies are known, and at most
+      `hedge_max_ratio` of calls: when upstream slows down as a whole,
+      hedging everything would only double the load on it.
+    - Attempts go through the `CircuitBreaker`, which fails them fast
+      with `CircuitOpen` while upstream is failing.
+
+    State is per process.
+    """
+
+    def __init__(
+        self,
+        default_deadline: float = 30.0,
+        deadlines: dict = None,
+        attempt_timeout: float = 15.0,
+        max_attempts: int = 3,
+        backoff: float = 0.5,
+        backoff_max: float = 4.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 1.0,
+        hedge_min_samples: int = 20,
+        hedge_max_ratio: float = 0.1,
+        breaker: CircuitBreaker = None
+    ):
+        self.default_deadline = default_deadline
+        self.deadlines = deadlines or {}
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_ratio = hedge_max_ratio
+        # Hedging budget: each hedgeable call earns `hedge_max_ratio`
+        # of a hedge, each hedge spends one (saving up to 10)
+        self._hedge_budget = 0.0
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyTracker()
+
+    def deadline_for(self, prompt_name: str) -> float:
+        return self.deadlines.get(prompt_name, self.default_deadline)
+
+    def hedge_delay(self, prompt_name: str):
+        p = self.latencies.quantile(prompt_name, self.hedge_quantile, self.hedge_min_samples)
+        return None if p is None else max(self.hedge_min_delay, p)
+
+    async def call(self, prompt_name: str, request, hedge: bool = False):
+        """
+        Run `request` (an async callable making one request) under the
+        policy and return its result.
+        """
+        deadline = self.deadline_for(prompt_name)
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_random_exponential(multiplier=self.backoff, max=self.backoff_max),
+            retry=retry_if_exception(is_retryable),
+            before_sleep=lambda state: self._before_retry(prompt_name, state),
+            reraise=True
+        )
+        hedged = hedge and self.hedge
+        try:
+            async with asyncio.timeout(deadline):
+                async for attempt in retrying:
+                    with attempt:
+                        if hedged:
+                            return await self._hedged(prompt_name, request)
+                        return await self._attempt(prompt_name, request)
+        except TimeoutError as e:
+            LLM_DEADLINES_EXCEEDED.labels(prompt=prompt_name).inc()
+            raise LLMDeadlineExceeded(prompt_name, deadline) from e
+
+    def _before_retry(self, prompt_name: str, state):
+        error = state.outcome.exception()
+        LLM_RETRIES.labels(prompt=prompt_name, error=type(error).__name__).inc()
+        logger.warning(
+            f"LLM call {prompt_name} attempt {state.attempt_number} failed ({type(error).__name__}: {error}), "
+            f"retrying in {state.upcoming_sleep:.2f}s."
+        )
+
+    async def _attempt(self, prompt_name: str, request):
+        self.breaker.before_call()
+        failed = None
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.attempt_timeout):
+                result = await request()
+            failed = False
+            self.latencies.record(prompt_name, time.perf_counter() - start)
+            return result
+        except RETRYABLE_ERRORS:
+            failed = True
+            raise
+        except Exception:
+            # Not an upstream outage (a rejected request, a bad response)
+            failed = False
+            raise
+        finally:
+            self.breaker.record(failed)
+
+    async def _hedged(self, prompt_name: str, request):
+        self._hedge_budget = min(10.0, self._hedge_budget + self.hedge_max_ratio)
+        delay = self.hedge_delay(prompt_name)
+        primary = asyncio.create_task(self._attempt(prompt_name, request))
+        tasks = [primary]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._hedge_budget >= 1:
+                    self._hedge_budget -= 1
+                    tasks.append(asyncio.create_task(self._attempt(prompt_name, request)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    if len(tasks) > 1:
+                        LLM_HEDGES.labels(prompt=prompt_name, winner="primary" if winner is primary else "hedge").inc()
+                    return winner.result()
+            # Every request failed: surface the primary's error
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+def build_llm_resilience(settings, provider: str = "openai") -> LLMResilience:
+    return LLMResilience(
+        default_deadline=settings.llm_deadline_seconds,
+        deadlines=settings.llm_prompt_deadlines_seconds,
+        attempt_timeout=settings.llm_attempt_timeout_seconds,
+        max_attempts=settings.llm_max_attempts,
+        backoff=settings.llm_retry_backoff_seconds,
+        backoff_max=settings.llm_retry_backoff_max_seconds,
+        hedge=settings.llm_hedge,
+        hedge_quantile=settings.llm_hedge_quantile,
+        hedge_min_delay=settings.llm_hedge_min_delay_seconds,
+        hedge_min_samples=settings.llm_hedge_min_samples,
+        hedge_max_ratio=settings.llm_hedge_max_ratio,
+        breaker=CircuitBreaker(
+            window=settings.llm_breaker_window_seconds,
+            min_calls=settings.llm_breaker_min_calls,
+            failure_ratio=settings.llm_breaker_failure_ratio,
+            cooldown=settings.llm_breaker_cooldown_seconds,
+            provider=provider
+        )
+    )
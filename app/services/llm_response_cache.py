@@ -0,0 +1,208 @@
+from cachetools import TTLCache
+from pydantic import BaseModel
+from app.core import metrics
+import asyncio
+import functools
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import logging
+import xxhash
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_LOOKUPS = metrics.counter(
+    "llm_cache_lookups_total",
+    "LLM response cache lookups (hit, miss, bypass), by prompt",
+    ["prompt", "result"]
+)
+LLM_CACHE_ERRORS = metrics.counter(
+    "llm_cache_errors_total",
+    "LLM response cache backend failures, by operation; the call itself goes on uncached",
+    ["op"]
+)
+
+_EXPIRY = struct.Struct(">d")
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    Whitespace-insensitive form of a prompt for keying: line endings
+    unified, trailing spaces and surrounding blank lines dropped.
+    """
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def cache_key(kind: str, model: str, system_prompt: str, user_prompt: str, response_format: type[BaseModel] = None) -> str:
+    """
+    xxh3-128 of everything that determines a response: the kind of
+    call ("parse" or "stream"), model, both prompts (normalized) and
+    the response format's JSON schema.
+    """
+    schema = _schema_json(response_format) if response_format is not None else None
+    payload = json.dumps(
+        [kind, model, normalize_prompt(system_prompt), normalize_prompt(user_prompt), schema],
+        separators=(",", ":")
+    )
+    return xxhash.xxh3_128_hexdigest(payload.encode())
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_json(response_format: type[BaseModel]) -> str:
+    return json.dumps(response_format.model_json_schema(), sort_keys=True, separators=(",", ":"))
+
+
+class MemoryBackend:
+    """
+    Per-process LRU with one TTL for every entry.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    async def get(self, key: str):
+        with self._lock:
+            return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes):
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+class DiskBackend:
+    """
+    One file per entry under `directory` (`ab/abcdef....bin`): the
+    expiry time, then the payload. Files are written atomically and
+    read in a thread; expired ones are deleted when read, and swept
+    every `sweep_every` writes.
+    """
+
+    def __init__(self, directory: str, ttl: float = 3600.0, sweep_every: int = 1000):
+        self.directory = directory
+        self.ttl = ttl
+        self.sweep_every = sweep_every
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.bin")
+
+    def _read(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        (expires_at,) = _EXPIRY.unpack_from(data)
+        if expires_at < time.time():
+            self._remove(path)
+            return None
+        return data[_EXPIRY.size:]
+
+    def _write(self, key: str, value: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_EXPIRY.pack(time.time() + self.ttl))
+                f.write(value)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+    def _sweep(self):
+        now = time.time()
+        removed = 0
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    with open(path, "rb") as f:
+                        (expires_at,) = _EXPIRY.unpack(f.read(_EXPIRY.size))
+                except (OSError, struct.error):
+                    continue
+                if expires_at < now:
+                    self._remove(path)
+                    removed += 1
+        logger.info(f"Swept {removed} expired LLM cache file(s) from {self.directory}.")
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def get(self, key: str):
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value: bytes):
+        await asyncio.to_thread(self._write, key, value)
+        self._writes += 1
+        if self.sweep_every and self._writes % self.sweep_every == 0:
+            await asyncio.to_thread(self._sweep)
+
+
+class LLMResponseCache:
+    """
+    Cache of LLM responses in front of `LLMRouter`, keyed by
+    `cache_key`. Values are the parsed output as JSON, compressed with
+    zstd, in a pluggable backend (`MemoryBackend` or `DiskBackend`,
+    anything with async `get`/`set` of bytes works).
+
+    A failing backend never fails the LLM call: errors are logged and
+    counted, and the call goes on uncached.
+    """
+
+    def __init__(self, backend, compression_level: int = 3):
+        self.backend = backend
+        self._compressor = zstandard.ZstdCompressor(level=compression_level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    async def get(self, key: str, prompt_name: str, response_format: type[BaseModel]):
+        try:
+            data = await self.backend.get(key)
+            value = None if data is None else response_format.model_validate_json(self._decompressor.decompress(data))
+        except Exception as e:
+            LLM_CACHE_ERRORS.labels(op="get").inc()
+            logger.warning(f"LLM cache read failed for {prompt_name}: {e}")
+            value = None
+        LLM_CACHE_LOOKUPS.labels(prompt=prompt_name, result="miss" if value is None else "hit").inc()
+        return value
+
+    async def set(self, key: str, prompt_name: str, value: BaseModel):
+        try:
+            await self.backend.set(key, self._compressor.compress(value.model_dump_json().encode()))
+        except Exception as e:
+            LLM_CACHE_ERRORS.labels(op="set").inc()
+            logger.warning(f"LLM cache write failed for {prompt_name}: {e}")
+
+    @staticmethod
+    def record_bypass(prompt_name: str):
+        LLM_CACHE_LOOKUPS.labels(prompt=prompt_name, result="bypass").inc()
+
+
+def build_llm_response_cache(settings):
+    """
+    Build the cache selected by `settings.llm_cache_backend`, or None
+    when caching is off.
+    """
+    if settings.llm_cache_backend == "memory":
+        backend = MemoryBackend(maxsize=settings.llm_cache_size, ttl=settings.llm_cache_ttl_seconds)
+    elif settings.llm_cache_backend == "disk":
+        backend = DiskBackend(settings.llm_cache_dir, ttl=settings.llm_cache_ttl_seconds)
+    else:
+        return None
+    return LLMResponseCache(backend, compression_level=settings.llm_cache_compression_level)
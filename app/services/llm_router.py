@@ -0,0 +1,430 @@
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+from app.core import metrics
+from app.schemas import openai_schemas
+from app.services.llm_response_cache import LLMResponseCache, cache_key
+from app.services.admission import AdmissionRejected, LLMAdmission
+from app.services.llm_resilience import build_llm_resilience
+from app.services.llm_providers import Usage, OpenAIProvider, AnthropicProvider, GeminiProvider, FakeProvider
+from app.services.llm_http import build_llm_http_client
+from app.services.chat_history import token_counter
+import asyncio
+import contextlib
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Metric names date from when every call went to OpenAI; they cover
+# every provider, told apart by the model label
+OPENAI_REQUEST_SECONDS = metrics.histogram(
+    "openai_request_seconds",
+    "LLM request latency (full response, or full stream), by prompt, model and outcome (ok, error, cancelled)",
+    ["prompt", "model", "outcome"]
+)
+OPENAI_FIRST_TOKEN_SECONDS = metrics.histogram(
+    "openai_stream_first_token_seconds",
+    "Time to the first streamed text delta, by prompt and model",
+    ["prompt", "model"]
+)
+OPENAI_TOKENS = metrics.counter(
+    "openai_tokens_total",
+    "Tokens billed by the LLM provider, by prompt, model and kind (input, output, and cached: the part of input read from the provider's prompt cache)",
+    ["prompt", "model", "kind"]
+)
+OPENAI_IN_FLIGHT = metrics.gauge(
+    "openai_requests_in_flight",
+    "LLM requests currently awaiting a response, by prompt",
+    ["prompt"]
+)
+LLM_COST = metrics.counter(
+    "llm_cost_usd_total",
+    "Estimated LLM spend at list prices (see MODEL_PRICES), by prompt and model",
+    ["prompt", "model"]
+)
+LLM_ROUTED_CALLS = metrics.counter(
+    "llm_routed_calls_total",
+    "LLM calls answered, by prompt, provider:model and whether it was the first choice or a failover",
+    ["prompt", "model", "choice"]
+)
+LLM_FAILOVERS = metrics.counter(
+    "llm_failovers_total",
+    "LLM calls moved on to the next model of their route after a failure, by prompt and failed provider:model",
+    ["prompt", "model"]
+)
+
+# List prices in USD per million (input, output, cached input) tokens,
+# for cost-aware selection and the spend counter. Models not listed
+# count as free.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00, 1.25),
+    "gpt-4o-mini": (0.15, 0.60, 0.075),
+    "gpt-4.1": (2.00, 8.00, 0.50),
+    "gpt-4.1-mini": (0.40, 1.60, 0.10),
+    "claude-sonnet-4-5": (3.00, 15.00, 0.30),
+    "claude-haiku-4-5": (1.00, 5.00, 0.10),
+    "gemini-2.5-pro": (1.25, 10.00, 0.125),
+    "gemini-2.5-flash": (0.30, 2.50, 0.03),
+}
+
+# Weight of the newest latency sample in a model's moving average
+LATENCY_EWMA_ALPHA = 0.2
+
+
+class ModelChoice:
+    """
+    One `provider:model` entry of a route, e.g. "openai:gpt-4o-mini".
+    """
+    __slots__ = ("provider", "model", "key")
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.key = f"{provider}:{model}"
+
+    @classmethod
+    def parse(cls, spec: str) -> "ModelChoice":
+        provider, sep, model = spec.partition(":")
+        if not sep or not model:
+            raise ValueError(f"Invalid model {spec!r}, expected 'provider:model'.")
+        return cls(provider, model)
+
+    def cost(self, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+        input_price, output_price, cached_price = MODEL_PRICES.get(self.model, (0.0, 0.0, 0.0))
+        return ((input_tokens - cached_tokens) * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1e6
+
+    def __repr__(self):
+        return self.key
+
+
+class LLMRouter:
+    """
+    Routes each LLM call to a model by prompt name, across providers
+    (`providers`, adapters from app/services/llm_providers.py, by name).
+
+    `routes` maps a prompt name ("update_form", "generate_response"...)
+    to its candidate `ModelChoice`s, best first; other prompts use
+    `default_route`. Candidates whose provider isn't configured are
+    left out. How the candidates of a call are ordered depends on
+    `selection`:
+     - "ordered": as configured;
+     - "latency": by each model's observed latency for the prompt
+       (moving average of successful requests; untried models first);
+     - "cost": by estimated cost of the call at `MODEL_PRICES`;
+     - "balanced": by latency plus cost, a dollar counting as
+       `seconds_per_dollar` seconds.
+    Models whose provider's circuit breaker is open always go last. A
+    call that fails on one model (after that provider's retries) fails
+    over to the next; a stream only until its first text delta.
+
+    Around the requests, as for the original single-model service:
+     - `cache`: identical calls (same model, prompts and response
+       format) are answered from it; pass `use_cache=False` to always
+       call a model. An answer is stored under the model that gave it,
+       and a call looks up the model it would try first, so an answer
+       from a fallback model is never served as the first choice's.
+     - `admission`: requests wait for a slot and rate limit budget
+       (`AdmissionRejected` if they can't get one in time). Each
+       request of a structured call is admitted on its own; a stream
+       holds one slot throughout.
+     - `resilience`: an `LLMResilience` per provider name (deadlines,
+       retries, hedging, circuit breaker).
+
+    `prompt_name` labels the metrics recorded for each call, picks its
+    route and its deadline.
+    """
+
+    def __init__(
+        self,
+        providers: dict,
+        routes: dict = None,
+        default_route: list = None,
+        cache: LLMResponseCache = None,
+        admission: LLMAdmission = None,
+        resilience: dict = None,
+        selection: str = "ordered",
+        seconds_per_dollar: float = 100.0,
+        expected_output_tokens: int = 300
+    ):
+        self.providers = providers
+        self.routes = {prompt_name: self._available(choices) for prompt_name, choices in (routes or {}).items()}
+        self.default_route = self._available(default_route or [])
+        self.cache = cache
+        self.admission = admission
+        self.resilience = resilience or {}
+        self.selection = selection
+        self.seconds_per_dollar = seconds_per_dollar
+        self.expected_output_tokens = expected_output_tokens
+        self._latency = {}
+
+    def _available(self, choices: list) -> list:
+        choices = [ModelChoice.parse(choice) if isinstance(choice, str) else choice for choice in choices]
+        for choice in choices:
+            if choice.provider not in self.providers:
+                logger.info(f"Leaving {choice.key} out of its LLM route, provider {choice.provider} is not configured.")
+        return [choice for choice in choices if choice.provider in self.providers]
+
+    def route(self, prompt_name: str) -> list:
+        route = self.routes.get(prompt_name) or self.default_route
+        if not route:
+            raise RuntimeError(f"No configured model for LLM prompt {prompt_name}.")
+        return route
+
+    def candidates(self, prompt_name: str, prompt_tokens: int) -> list:
+        """
+        The route's models in the order this call should try them.
+        """
+        choices = self.route(prompt_name)
+        if self.selection != "ordered" and len(choices) > 1:
+            choices = sorted(choices, key=lambda choice: self._score(prompt_name, choice, prompt_tokens))
+        return sorted(choices, key=self._circuit_open)
+
+    def _score(self, prompt_name: str, choice: ModelChoice, prompt_tokens: int) -> float:
+        latency = self._latency.get((prompt_name, choice.key), 0.0)
+        cost = choice.cost(prompt_tokens, self.expected_output_tokens)
+        if self.selection == "latency":
+            return latency
+        if self.selection == "cost":
+            return cost
+        return latency + self.seconds_per_dollar * cost
+
+    def _circuit_open(self, choice: ModelChoice) -> bool:
+        resilience = self.resilience.get(choice.provider)
+        return resilience is not None and resilience.breaker.state == resilience.breaker.OPEN
+
+    def _observe_latency(self, prompt_name: str, choice: ModelChoice, seconds: float):
+        key = (prompt_name, choice.key)
+        previous = self._latency.get(key)
+        self._latency[key] = seconds if previous is None else previous + LATENCY_EWMA_ALPHA * (seconds - previous)
+
+    def _admit(self, prompt_tokens: int):
+        if self.admission is None:
+            return contextlib.nullcontext()
+        return self.admission.slot(prompt_tokens)
+
+    def _call(self, choice: ModelChoice, prompt_name: str, request, hedge: bool = False):
+        resilience = self.resilience.get(choice.provider)
+        if resilience is None:
+            return request()
+        return resilience.call(prompt_name, request, hedge=hedge)
+
+    def _record_usage(self, prompt_name: str, choice: ModelChoice, usage: Usage, slot=None):
+        OPENAI_TOKENS.labels(prompt=prompt_name, model=choice.model, kind="input").inc(usage.input_tokens)
+        OPENAI_TOKENS.labels(prompt=prompt_name, model=choice.model, kind="output").inc(usage.output_tokens)
+        OPENAI_TOKENS.labels(prompt=prompt_name, model=choice.model, kind="cached").inc(usage.cached_tokens)
+        LLM_COST.labels(prompt=prompt_name, model=choice.model).inc(choice.cost(usage.input_tokens, usage.output_tokens, usage.cached_tokens))
+        if slot is not None:
+            slot.record_usage(usage.input_tokens + usage.output_tokens)
+
+    async def _failover(self, prompt_name: str, candidates: list, attempt):
+        """
+        `attempt(choice)` on each candidate in turn until one succeeds;
+        returns `(choice, result)`, or raises the last candidate's error.
+        """
+        for i, choice in enumerate(candidates):
+            try:
+                result = await attempt(choice)
+            except AdmissionRejected:
+                # Our own limit, the same whichever model is next
+                raise
+            except Exception as e:
+                if i == len(candidates) - 1:
+                    raise
+                LLM_FAILOVERS.labels(prompt=prompt_name, model=choice.key).inc()
+                logger.warning(f"LLM call {prompt_name} failed on {choice.key} ({type(e).__name__}: {e}), failing over to {candidates[i + 1].key}.")
+                continue
+            LLM_ROUTED_CALLS.labels(prompt=prompt_name, model=choice.key, choice="first" if i == 0 else "failover").inc()
+            return choice, result
+
+    async def handle_message(self, user_prompt: str, response_format: type[BaseModel] = openai_schemas.DefaultLLMOutput, system_prompt: str = "", prompt_name: str = "default", use_cache: bool = True):
+        prompt_tokens = token_counter.count(system_prompt) + token_counter.count(user_prompt)
+        candidates = self.candidates(prompt_name, prompt_tokens)
+        caching = self.cache is not None and use_cache
+        if caching:
+            cached = await self.cache.get(cache_key("parse", candidates[0].key, system_prompt, user_prompt, response_format), prompt_name, response_format)
+            if cached is not None:
+                return { "input message" : user_prompt, "response" : cached }
+        elif self.cache is not None:
+            self.cache.record_bypass(prompt_name)
+
+        async def attempt(choice: ModelChoice):
+            provider = self.providers[choice.provider]
+
+            async def request():
+                async with self._admit(prompt_tokens) as slot:
+                    in_flight = OPENAI_IN_FLIGHT.labels(prompt=prompt_name)
+                    in_flight.inc()
+                    start = time.perf_counter()
+                    outcome = "error"
+                    try:
+                        parsed, usage = await provider.parse(choice.model, system_prompt, user_prompt, response_format)
+                        outcome = "ok"
+                    except asyncio.CancelledError:
+                        outcome = "cancelled"
+                        raise
+                    finally:
+                        elapsed = time.perf_counter() - start
+                        in_flight.dec()
+                        OPENAI_REQUEST_SECONDS.labels(prompt=prompt_name, model=choice.model, outcome=outcome).observe(elapsed)
+                    self._observe_latency(prompt_name, choice, elapsed)
+                    self._record_usage(prompt_name, choice, usage, slot)
+                    return parsed
+
+            return await self._call(choice, prompt_name, request, hedge=True)
+
+        choice, parsed = await self._failover(prompt_name, candidates, attempt)
+        if caching and parsed is not None:
+            await self.cache.set(cache_key("parse", choice.key, system_prompt, user_prompt, response_format), prompt_name, parsed)
+        return { "input message" : user_prompt, "response" : parsed }
+
+    async def stream_message(self, user_prompt: str, system_prompt: str = "", prompt_name: str = "default", use_cache: bool = True):
+        """
+        Stream a plain-text completion, yielding text deltas as they
+        arrive. Used for the agent reply, whose structured output
+        (`DefaultLLMOutput`) is just a wrapper around the text.
+
+        A cached reply is yielded as a single delta; a reply is only
+        cached once it has streamed completely. The admission slot, if
+        any, is held until the stream ends.
+
+        The resilience policy and failover cover the request up to its
+        first text delta; once text has been yielded the stream can't
+        be retried or moved to another model, and is never hedged.
+        """
+        prompt_tokens = token_counter.count(system_prompt) + token_counter.count(user_prompt)
+        candidates = self.candidates(prompt_name, prompt_tokens)
+        caching = self.cache is not None and use_cache
+        if caching:
+            cached = await self.cache.get(cache_key("stream", candidates[0].key, system_prompt, user_prompt), prompt_name, openai_schemas.DefaultLLMOutput)
+            if cached is not None:
+                yield cached.output_text
+                return
+        elif self.cache is not None:
+            self.cache.record_bypass(prompt_name)
+
+        async def attempt(choice: ModelChoice):
+            provider = self.providers[choice.provider]
+
+            async def open_stream():
+                """
+                Start the stream and read it up to its first text delta;
+                returns the events read and the iterator over the rest.
+                """
+                events = provider.stream(choice.model, system_prompt, user_prompt)
+                head = []
+                try:
+                    async for event in events:
+                        head.append(event)
+                        if isinstance(event, str):
+                            break
+                except BaseException:
+                    await events.aclose()
+                    raise
+                return head, events
+
+            return await self._call(choice, prompt_name, open_stream)
+
+        deltas = []
+        async with self._admit(prompt_tokens) as slot:
+            in_flight = OPENAI_IN_FLIGHT.labels(prompt=prompt_name)
+            in_flight.inc()
+            start = time.perf_counter()
+            choice = None
+            outcome = "error"
+            try:
+                choice, (head, events) = await self._failover(prompt_name, candidates, attempt)
+                first_token_seconds = time.perf_counter() - start
+                OPENAI_FIRST_TOKEN_SECONDS.labels(prompt=prompt_name, model=choice.model).observe(first_token_seconds)
+                # Streams are compared on time to first token
+                self._observe_latency(prompt_name, choice, first_token_seconds)
+                async for event in _chain(head, events):
+                    if isinstance(event, str):
+                        deltas.append(event)
+                        yield event
+                    else:
+                        self._record_usage(prompt_name, choice, event, slot)
+                outcome = "ok"
+            except (asyncio.CancelledError, GeneratorExit):
+                outcome = "cancelled"
+                raise
+            finally:
+                in_flight.dec()
+                model = choice.model if choice is not None else self.route(prompt_name)[0].model
+                OPENAI_REQUEST_SECONDS.labels(prompt=prompt_name, model=model, outcome=outcome).observe(time.perf_counter() - start)
+        if caching:
+            await self.cache.set(cache_key("stream", choice.key, system_prompt, user_prompt), prompt_name, openai_schemas.DefaultLLMOutput(output_text="".join(deltas)))
+
+    async def warm_up(self, connections: int):
+        """
+        Open `connections` pooled connections per provider that has a
+        pool (see app/services/llm_http.py), concurrently.
+        """
+        providers = [provider for provider in self.providers.values() if hasattr(provider, "warm_up")]
+        opened = await asyncio.gather(*(provider.warm_up(connections) for provider in providers))
+        for provider, count in zip(providers, opened):
+            logger.info(f"Warmed up {count} LLM connection(s) to {provider.name}.")
+
+    def pool_stats(self) -> dict:
+        """
+        Connection pool state per provider that has a pool.
+        """
+        stats = {}
+        for name, provider in self.providers.items():
+            if hasattr(provider, "pool_stats"):
+                stats[name] = provider.pool_stats()
+        return stats
+
+    async def close(self):
+        for provider in self.providers.values():
+            await provider.close()
+
+
+async def _chain(head: list, events):
+    for event in head:
+        yield event
+    async for event in events:
+        yield event
+
+
+def build_llm_providers(settings) -> dict:
+    """
+    One adapter per provider with credentials in `settings` (OpenAI
+    always; Anthropic and Gemini when their API keys are set; the fake
+    provider when `llm_fake_provider` is on). OpenAI and Anthropic each
+    get their own pooled HTTP client (app/services/llm_http.py).
+    """
+    http_client = build_llm_http_client(settings, "openai")
+    providers = {
+        # Retries are left to the resilience policy
+        "openai": OpenAIProvider(
+            # The SDK sends its own timeout with each request; keep the pool's
+            AsyncOpenAI(api_key=settings.openai_key, max_retries=0, http_client=http_client, timeout=http_client.timeout),
+            http_client
+        )
+    }
+    if settings.anthropic_api_key:
+        providers["anthropic"] = AnthropicProvider(
+            settings.anthropic_api_key,
+            max_tokens=settings.anthropic_max_tokens,
+            http_client=build_llm_http_client(settings, "anthropic")
+        )
+    if settings.gemini_api_key:
+        providers["gemini"] = GeminiProvider(settings.gemini_api_key)
+    if settings.llm_fake_provider:
+        providers["fake"] = FakeProvider(latency=settings.llm_fake_provider_latency_seconds)
+    return providers
+
+
+def build_llm_router(settings, cache: LLMResponseCache = None, admission: LLMAdmission = None) -> LLMRouter:
+    providers = build_llm_providers(settings)
+    return LLMRouter(
+        providers,
+        routes=settings.llm_routes,
+        default_route=settings.llm_default_route,
+        cache=cache,
+        admission=admission,
+        resilience={name: build_llm_resilience(settings, provider=name) for name in providers},
+        selection=settings.llm_router_selection,
+        seconds_per_dollar=settings.llm_router_seconds_per_dollar,
+        expected_output_tokens=settings.llm_expected_output_tokens
+    )
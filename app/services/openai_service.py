@@ -1,13 +1,21 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, DEFAULT_MAX_RETRIES
 from pydantic import BaseModel
 from app.schemas import openai_schemas
+from app.services.llm_response_cache import LLMResponseCache
+from app.services.admission import LLMAdmission
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_providers import OpenAIProvider
+from app.services.llm_router import LLMRouter, ModelChoice
+
+MODEL = "gpt-4o"
+
 
 """
 Service used primarily to interact with the OpenAI API
 and OpenAI's various models.
 
-Much more functionality to be added soon as needed,
-along with Anthropic and Gemini services.
+The API routes go through `LLMRouter` (app/services/llm_router.py),
+which also routes to Anthropic and Gemini models.
 """
 class OpenAIService:
     def __init__(self, api_key: str):
@@ -18,7 +26,7 @@ class OpenAIService:
             model="gpt-4o",
             input=[
                 {
-                    "role": "system", 
+                    "role": "system",
                     "content": system_prompt
                 },
                 {
@@ -28,4 +36,36 @@ class OpenAIService:
             ],
             text_format=response_format
         )
-        return { "input message" : user_prompt, "response" : response.output_parsed }
\ No newline at end of file
+        return { "input message" : user_prompt, "response" : response.output_parsed }
+
+
+"""
+Async counterpart of `OpenAIService`: an `LLMRouter` sending every
+prompt to `MODEL` on OpenAI. For scripts and benchmarks that want a
+single model; the app builds its router from the settings
+(`build_llm_router`).
+"""
+class AsyncOpenAIService(LLMRouter):
+    """
+    `cache`, `admission` and `resilience` as for `LLMRouter` (one
+    resilience policy, for OpenAI). Without a resilience policy the
+    SDK's own retries stay on. `client` replaces the `AsyncOpenAI`
+    client, e.g. to point it at a fake server.
+    """
+    def __init__(self, api_key: str, cache: LLMResponseCache = None, admission: LLMAdmission = None, resilience: LLMResilience = None, client=None):
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                max_retries=0 if resilience is not None else DEFAULT_MAX_RETRIES
+            )
+        super().__init__(
+            {"openai": OpenAIProvider(client)},
+            default_route=[ModelChoice("openai", MODEL)],
+            cache=cache,
+            admission=admission,
+            resilience={"openai": resilience} if resilience is not None else None
+        )
+
+    @property
+    def client(self):
+        return self.providers["openai"].client
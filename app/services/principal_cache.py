@@ -0,0 +1,116 @@
+from cachetools import TLRUCache, TTLCache
+from sqlalchemy import select
+from app.core.config import get_settings
+from app.core import metrics
+from app.core.jwt import decode_token
+from app.db.models.user import User
+import hashlib
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CACHE_LOOKUPS = metrics.counter(
+    "principal_cache_lookups_total",
+    "Authenticated-user cache lookups, for decoded tokens and users",
+    ["cache", "result"]
+)
+
+
+class Principal:
+    """
+    The authenticated user as request handlers see it: the `User`
+    columns routes actually read, detached from any session (and
+    without the password hash).
+    """
+    __slots__ = ("id", "email", "firstname", "lastname")
+
+    def __init__(self, user: User):
+        self.id = user.id
+        self.email = user.email
+        self.firstname = user.firstname
+        self.lastname = user.lastname
+
+
+class PrincipalCache:
+    """
+    Process-wide cache of decoded tokens (by SHA-256 of the token,
+    until its `exp`) and of `Principal`s by user id, invalidated by
+    `delete_user`.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, token_maxsize: int = 10000):
+        self._principals = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Each entry lives until its token's `exp` (a wall-clock timestamp)
+        self._tokens = TLRUCache(
+            maxsize=token_maxsize,
+            ttu=lambda _key, value, _now: value[1],
+            timer=time.time
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def user_id_for_token(self, token: str):
+        """
+        Return the user id a valid token was issued for, or None if
+        the token is invalid, expired or carries no user id.
+        """
+        key = self._token_key(token)
+        with self._lock:
+            cached = self._tokens.get(key)
+        if cached is not None:
+            PRINCIPAL_CACHE_LOOKUPS.labels(cache="token", result="hit").inc()
+            return cached[0]
+
+        PRINCIPAL_CACHE_LOOKUPS.labels(cache="token", result="miss").inc()
+        payload = decode_token(token)
+        if not payload or not payload.get("user_id"):
+            return None
+        user_id = payload["user_id"]
+        exp = payload.get("exp")
+        if exp is not None:
+            with self._lock:
+                self._tokens[key] = (user_id, float(exp))
+        return user_id
+
+    async def get(self, db, user_id: int):
+        """
+        Return the `Principal` for a user id, loading it from the
+        database on a miss. Returns None if the user doesn't exist.
+        """
+        with self._lock:
+            principal = self._principals.get(user_id)
+        if principal is not None:
+            PRINCIPAL_CACHE_LOOKUPS.labels(cache="principal", result="hit").inc()
+            return principal
+
+        PRINCIPAL_CACHE_LOOKUPS.labels(cache="principal", result="miss").inc()
+        user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
+        if user is None:
+            return None
+        principal = Principal(user)
+        with self._lock:
+            self._principals[user_id] = principal
+        return principal
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._principals.pop(user_id, None)
+        logger.info(f"Invalidated cached principal for user {user_id}.")
+
+    def clear(self):
+        with self._lock:
+            self._principals.clear()
+            self._tokens.clear()
+
+
+settings = get_settings()
+principal_cache = PrincipalCache(
+    maxsize=settings.principal_cache_size,
+    ttl=settings.principal_cache_ttl_seconds,
+    token_maxsize=settings.token_cache_size
+)
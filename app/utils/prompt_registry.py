@@ -0,0 +1,163 @@
+import os
+import re
+import threading
+import time
+from app.core import metrics
+from app.utils.langgraph_utils import read_markdown_file
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the `*.md` prompt templates
+PROMPT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "prompts"))
+
+# Placeholders look like {{FORM_CONTEXT}}
+PLACEHOLDER_PATTERN = re.compile(r"\{\{([A-Z0-9_]+)\}\}")
+
+PROMPT_RENDER_SECONDS = metrics.histogram(
+    "prompt_render_seconds",
+    "Time spent rendering a prompt template",
+    ["template"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+PROMPT_RELOADS = metrics.counter(
+    "prompt_reloads_total",
+    "Prompt templates (re)loaded from disk",
+    ["template"]
+)
+
+
+class CompiledPrompt:
+    """
+    A prompt template parsed once into a list of segments:
+    literal text, and placeholder names to substitute at render time.
+
+    Rendering is a single pass over the segments and one `str.join`,
+    instead of one full-string `str.replace` per placeholder.
+    """
+
+    def __init__(self, name: str, path: str, text: str, mtime: float):
+        self.name = name
+        self.path = path
+        self.mtime = mtime
+        self.segments = self._compile(text)
+        self.placeholders = {value for is_placeholder, value in self.segments if is_placeholder}
+
+    @staticmethod
+    def _compile(text: str):
+        segments = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            if match.start() > position:
+                segments.append((False, text[position:match.start()]))
+            segments.append((True, match.group(1)))
+            position = match.end()
+        if position < len(text):
+            segments.append((False, text[position:]))
+        return segments
+
+    def render(self, **values) -> str:
+        missing = self.placeholders - values.keys()
+        if missing:
+            raise KeyError(f"Missing values for prompt '{self.name}': {', '.join(sorted(missing))}")
+        return "".join(values[value] if is_placeholder else value for is_placeholder, value in self.segments)
+
+
+class PromptRegistry:
+    """
+    Loads and compiles every prompt template in `app/prompts` once,
+    and keeps them in memory for the life of the process.
+
+    Edits on disk are picked up either by an mtime check (at most
+    every `check_interval` seconds per template, when `auto_reload`
+    is on) or by an explicit `reload()`.
+    """
+
+    def __init__(self, prompt_dir: str = PROMPT_DIR, auto_reload: bool = True, check_interval: float = 2.0):
+        self.prompt_dir = prompt_dir
+        self.auto_reload = auto_reload
+        self.check_interval = check_interval
+        self._prompts = {}
+        self._last_checked = {}
+        self._lock = threading.Lock()
+
+    def configure(self, auto_reload: bool, check_interval: float):
+        self.auto_reload = auto_reload
+        self.check_interval = check_interval
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.prompt_dir, f"{name}.md")
+
+    def _load(self, name: str) -> CompiledPrompt:
+        path = self._path(name)
+        mtime = os.path.getmtime(path)
+        prompt = CompiledPrompt(name, path, read_markdown_file(path), mtime)
+        with self._lock:
+            self._prompts[name] = prompt
+            self._last_checked[name] = time.monotonic()
+        PROMPT_RELOADS.labels(template=name).inc()
+        logger.info(f"Loaded prompt template '{name}' ({len(prompt.segments)} segments).")
+        return prompt
+
+    def load_all(self):
+        """
+        Load every `*.md` template in the prompt directory.
+        Called once at startup.
+        """
+        names = sorted(
+            file_name[:-3] for file_name in os.listdir(self.prompt_dir)
+            if file_name.endswith(".md")
+        )
+        for name in names:
+            self._load(name)
+        return names
+
+    def reload(self, name: str = None):
+        """
+        Force a re-read of one template, or all of them.
+        Only templates already loaded by `load_all` can be named.
+        """
+        if name is None:
+            return self.load_all()
+        if name not in self._prompts:
+            raise KeyError(f"Unknown prompt template '{name}'")
+        self._load(name)
+        return [name]
+
+    def get(self, name: str) -> CompiledPrompt:
+        prompt = self._prompts.get(name)
+        if prompt is None:
+            return self._load(name)
+
+        if self.auto_reload:
+            now = time.monotonic()
+            if now - self._last_checked.get(name, 0.0) >= self.check_interval:
+                self._last_checked[name] = now
+                try:
+                    if os.path.getmtime(prompt.path) != prompt.mtime:
+                        prompt = self._load(name)
+                except OSError as e:
+                    # Keep serving the cached copy if the file is mid-edit
+                    logger.warning(f"Could not stat prompt template '{name}': {e}")
+        return prompt
+
+    def render(self, name: str, **values) -> str:
+        start = time.perf_counter()
+        rendered = self.get(name).render(**values)
+        PROMPT_RENDER_SECONDS.labels(template=name).observe(time.perf_counter() - start)
+        return rendered
+
+    def describe(self) -> list:
+        return [
+            {
+                "name": prompt.name,
+                "path": prompt.path,
+                "mtime": prompt.mtime,
+                "segments": len(prompt.segments),
+                "placeholders": sorted(prompt.placeholders)
+            } for prompt in self._prompts.values()
+        ]
+
+
+# Process-wide registry, loaded in the app's lifespan
+prompt_registry = PromptRegistry()
@@ -0,0 +1,211 @@
+"""
+Admission control (app/services/admission.py) against a local stub LLM.
+
+1. LLM calls: fires a burst of concurrent `AsyncOpenAIService.handle_message`
+   calls, with the OpenAI client replaced by a stub that sleeps for a
+   fixed latency and reports fixed token usage, with and without an
+   `LLMAdmission` in front. Reports how many calls were admitted or
+   rejected (429 + Retry-After), the peak concurrency the stub saw, and
+   the request/token rate it received.
+2. Chat turns: one user fires a burst of `/api/chat/advance` turns
+   (one per conversation) at the real FastAPI app, plus two steps of a
+   single conversation at once, and reports the status codes: turns past
+   the user's burst get 429, and the two steps run one after the other.
+
+The DB is a throwaway SQLite file, so no Postgres or OpenAI key is needed.
+
+Usage:
+    python -m benchmarks.bench_admission --calls 200 --concurrency 16 --rpm 600 --tpm 200000
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+_tmp_dir = tempfile.mkdtemp(prefix="cfci_bench_")
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", f"sqlite:///{_tmp_dir}/bench.db")
+os.environ.setdefault("LLM_CACHE_BACKEND", "off")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.main import app
+from app.core.config import get_settings
+from app.core.dependencies import get_openai_service
+from app.core.jwt import create_access_token
+from app.db.database import Base, get_async_db
+from app.db.models import User, FormTemplate, FieldTemplate, Form, Conversation
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import UpdateFormLLMOutput, DefaultLLMOutput
+from app.services.admission import AdmissionRejected, LLMAdmission
+from app.services.openai_service import AsyncOpenAIService
+
+logging.getLogger().setLevel(logging.WARNING)
+
+
+class StubResponses:
+    """
+    Stands in for `AsyncOpenAI().responses`: sleeps for `latency` per
+    call and reports `tokens` of usage, tracking peak concurrency.
+    """
+    def __init__(self, latency: float, tokens: int):
+        self.latency = latency
+        self.usage = SimpleNamespace(input_tokens=tokens - 100, output_tokens=100)
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def parse(self, model, input, text_format):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        if text_format is UpdateFormLLMOutput:
+            parsed = UpdateFormLLMOutput(fields_to_update=[])
+        else:
+            parsed = DefaultLLMOutput(output_text="Thanks! Could you tell me more about your project?")
+        return SimpleNamespace(output_parsed=parsed, usage=self.usage)
+
+
+def stub_service(latency: float, tokens: int, admission: LLMAdmission = None) -> AsyncOpenAIService:
+    return AsyncOpenAIService(api_key="bench", admission=admission, client=SimpleNamespace(responses=StubResponses(latency, tokens)))
+
+
+async def run_calls(calls: int, latency: float, tokens: int, admission: LLMAdmission = None):
+    service = stub_service(latency, tokens, admission)
+    outcomes = collections.Counter()
+    retry_after = []
+
+    async def one_call(i: int):
+        try:
+            await service.handle_message(user_prompt=f"Bench prompt {i}", prompt_name="bench")
+            outcomes["ok"] += 1
+        except AdmissionRejected as e:
+            outcomes[e.reason] += 1
+            retry_after.append(e.retry_after)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_call(i) for i in range(calls)))
+    elapsed = time.perf_counter() - start
+    return outcomes, retry_after, service.client.responses, elapsed
+
+
+async def seed(session_factory, conversations: int):
+    async with session_factory() as db:
+        user = User(email="bench@example.com", firstname="Bench", lastname="User", hashed_password="x")
+        form_template = FormTemplate(name="bench")
+        db.add_all([user, form_template])
+        await db.flush()
+        db.add(FieldTemplate(name="Org", field_type=FieldType.STRING, description="Org", form_template_id=form_template.id))
+        conversation_ids = []
+        for _ in range(conversations):
+            conv = Conversation(title="bench", user_id=user.id, form=Form(user_id=user.id, form_template_id=form_template.id))
+            db.add(conv)
+            await db.flush()
+            conversation_ids.append(conv.id)
+        await db.commit()
+        return user, conversation_ids
+
+
+async def run_turns(turns: int, latency: float):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{_tmp_dir}/turns.db", connect_args={"timeout": 60})
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    user, conversation_ids = await seed(session_factory, turns)
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': user.id, 'email': user.email})}"}
+    service = stub_service(latency, 1000)
+
+    async def override_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_db
+    app.dependency_overrides[get_openai_service] = lambda: service
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one_turn(conversation_id: int, step: int):
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/chat/advance",
+                json={"conversation_id": conversation_id, "user_message": "Hello there", "message_step_num": step},
+                headers=headers
+            )
+            return response, time.perf_counter() - start
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            burst = await asyncio.gather(*(one_turn(cid, 1) for cid in conversation_ids))
+            # Wait for two turns to refill, then send two steps of one conversation at once
+            await asyncio.sleep(60.0 / get_settings().chat_user_turns_per_minute * 2)
+            same_conversation = await asyncio.gather(
+                one_turn(conversation_ids[0], 3),
+                one_turn(conversation_ids[0], 5)
+            )
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    return burst, same_conversation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="Concurrent LLM calls to fire")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stubbed latency per LLM call (seconds)")
+    parser.add_argument("--tokens", type=int, default=1000, help="Stubbed token usage per LLM call")
+    parser.add_argument("--concurrency", type=int, default=16, help="LLMAdmission max_concurrency")
+    parser.add_argument("--rpm", type=int, default=600, help="LLMAdmission requests per minute")
+    parser.add_argument("--tpm", type=int, default=200000, help="LLMAdmission tokens per minute")
+    parser.add_argument("--queue-timeout", type=float, default=5.0, help="LLMAdmission queue timeout (seconds)")
+    parser.add_argument("--turns", type=int, default=10, help="Chat turns fired at once by one user")
+    args = parser.parse_args()
+
+    print(f"{args.calls} concurrent LLM calls, {args.latency:.3f}s and {args.tokens} tokens each\n")
+    for label, admission in (
+        ("no admission control", None),
+        (f"admission ({args.concurrency} slots, {args.rpm} rpm, {args.tpm} tpm)", LLMAdmission(
+            max_concurrency=args.concurrency,
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            expected_output_tokens=100,
+            queue_timeout=args.queue_timeout
+        ))
+    ):
+        outcomes, retry_after, stub, elapsed = asyncio.run(run_calls(args.calls, args.latency, args.tokens, admission))
+        print(f"{label}:")
+        print(f"  {elapsed:.2f}s, outcomes {dict(outcomes)}, peak concurrency at the LLM {stub.peak}")
+        if retry_after:
+            print(f"  Retry-After {min(retry_after)}-{max(retry_after)}s")
+        # The buckets start full, so a short run can exceed the
+        # per-minute rates by up to one minute's worth
+        print(f"  {stub.calls / elapsed:.1f} requests/s, {stub.calls * args.tokens / elapsed:,.0f} tokens/s reached the LLM")
+
+    settings = get_settings()
+    print(f"\n{args.turns} turns at once from one user "
+          f"({settings.chat_user_turns_per_minute:g}/min, burst {settings.chat_user_turn_burst}):")
+    burst, same_conversation = asyncio.run(run_turns(args.turns, args.latency))
+    statuses = collections.Counter(response.status_code for response, _ in burst)
+    retry_after = sorted({response.headers.get("retry-after") for response, _ in burst if response.status_code == 429})
+    print(f"  status codes {dict(statuses)}, Retry-After {retry_after}")
+    print("two steps of one conversation at once:")
+    for response, elapsed in same_conversation:
+        print(f"  {response.status_code} after {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
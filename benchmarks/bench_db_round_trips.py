@@ -0,0 +1,144 @@
+"""
+Counts the database round trips (SQL statements executed) and commits
+made by each endpoint, with the LLM stubbed out.
+
+Runs against a throwaway SQLite file through aiosqlite; statement
+counts match Postgres since the ORM emits the same statements
+(INSERT ... RETURNING on both).
+
+Usage:
+    python -m benchmarks.bench_db_round_trips
+"""
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="cfci_bench_")
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", f"sqlite:///{_tmp_dir}/bench.db")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.main import app
+from app.core.dependencies import get_openai_service
+from app.db.database import Base, get_async_db
+from app.db.models import FormTemplate, FieldTemplate
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import UpdateFormLLMOutput, DefaultLLMOutput, FieldToUpdate
+
+logging.getLogger().setLevel(logging.WARNING)
+
+
+class StubLLMService:
+    """
+    Extracts one field value per turn and replies with fixed text.
+    """
+    def __init__(self, field_template_id: int):
+        self.field_template_id = field_template_id
+
+    async def handle_message(self, user_prompt: str, response_format=DefaultLLMOutput, system_prompt: str = "", **kwargs):
+        if response_format is UpdateFormLLMOutput:
+            return {"input message": user_prompt, "response": UpdateFormLLMOutput(fields_to_update=[
+                FieldToUpdate(
+                    type="create",
+                    template_field_id=str(self.field_template_id),
+                    field_name="Organization",
+                    new_value="Acme Robotics",
+                    confidence=0.9,
+                    reasoning="Stated by the user."
+                )
+            ])}
+        return {"input message": user_prompt, "response": DefaultLLMOutput(output_text="Thanks! What does Acme do?")}
+
+    async def stream_message(self, user_prompt: str, system_prompt: str = "", **kwargs):
+        for delta in ("Thanks! ", "What does ", "Acme do?"):
+            yield delta
+
+
+class RoundTripCounter:
+    def __init__(self, sync_engine):
+        self.statements = 0
+        self.commits = 0
+        event.listen(sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(sync_engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+
+async def main():
+    engine = create_async_engine(f"sqlite+aiosqlite:///{_tmp_dir}/round_trips.db")
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as db:
+        # initiate_chat hard-codes form_template_id=1
+        form_template = FormTemplate(id=1, name="bench")
+        db.add(form_template)
+        await db.flush()
+        field_templates = [
+            FieldTemplate(name=name, field_type=FieldType.STRING, description=name, form_template_id=1)
+            for name in ("Organization", "Project description", "Timeline")
+        ]
+        db.add_all(field_templates)
+        await db.commit()
+        field_template_id = field_templates[0].id
+
+    async def override_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_db
+    app.dependency_overrides[get_openai_service] = lambda: StubLLMService(field_template_id)
+    counter = RoundTripCounter(engine.sync_engine)
+    results = []
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def measure(label, method, url, **kwargs):
+            counter.reset()
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+            results.append((label, counter.statements, counter.commits))
+            return response
+
+        await measure("POST /api/auth/register", "POST", "/api/auth/register",
+                      json={"email": "bench@example.com", "firstname": "Bench", "lastname": "User", "password": "pw"})
+        token = (await measure("POST /api/auth/login", "POST", "/api/auth/login",
+                               json={"email": "bench@example.com", "password": "pw"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        conversation_id = (await measure("POST /api/chat/initiate", "POST", "/api/chat/initiate",
+                                         headers=headers)).json()["conversation_id"]
+        await measure("POST /api/chat/advance", "POST", "/api/chat/advance", headers=headers,
+                      json={"conversation_id": conversation_id, "user_message": "We are Acme Robotics", "message_step_num": 1})
+        await measure("POST /api/chat/advance/stream", "POST", "/api/chat/advance/stream", headers=headers,
+                      json={"conversation_id": conversation_id, "user_message": "Acme Robotics, yes", "message_step_num": 3})
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+    print(f"{'endpoint':<32} {'statements':>10} {'commits':>8}")
+    for label, statements, commits in results:
+        print(f"{label:<32} {statements:>10} {commits:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Micro-benchmark for building the "LATEST STATE OF THE FORM" context.
+
+Compares, at 10/100/1000 fields with every field filled in:
+- legacy:    the original advance_chat code, i.e. a linear `next(...)`
+             scan of the submissions per field and `+=` string building,
+             done once with template field IDs and once without (for
+             the current layout: values only, the field definitions
+             live in the system prompts).
+- FormState: submissions indexed by field_template_id, both variants
+             rendered in one pass from the cached template blocks.
+
+Each iteration also applies one field update, as a turn does between
+the two renders.
+
+Usage:
+    python -m benchmarks.bench_form_state
+"""
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import FieldToUpdate
+from app.services.form_state import FormState
+from app.services.form_template_cache import CompiledFormTemplate
+
+
+def make_form(num_fields: int):
+    field_templates = [
+        SimpleNamespace(
+            id=i,
+            name=f"Field {i}",
+            field_type=FieldType.STRING,
+            description=f"Instructions for field {i}, describing what belongs here."
+        ) for i in range(1, num_fields + 1)
+    ]
+    submissions = [
+        SimpleNamespace(field_template_id=ft.id, value=f"Value for field {ft.id}")
+        for ft in reversed(field_templates)
+    ]
+    template = CompiledFormTemplate(SimpleNamespace(id=1, name="bench"), field_templates)
+    return field_templates, submissions, template
+
+
+def legacy_turn(field_templates, submissions):
+    form_context = "### LATEST STATE OF THE FORM\n\n"
+    for field_template in field_templates:
+        submission = next((fs for fs in submissions if fs.field_template_id == field_template.id), None)
+        form_context += f"Field name: {field_template.name}\n"
+        form_context += f"Template field ID: {field_template.id}\n"
+        form_context += f"Current value: {submission.value if submission else 'NONE'}\n"
+        form_context += "--\n"
+
+    submission = next((fs for fs in submissions if fs.field_template_id == field_templates[-1].id), None)
+    submission.value = "Updated"
+
+    form_context = "### LATEST STATE OF THE FORM\n\n"
+    for field_template in field_templates:
+        submission = next((fs for fs in submissions if fs.field_template_id == field_template.id), None)
+        form_context += f"Field name: {field_template.name}\n"
+        form_context += f"Current value: {submission.value if submission else 'NONE'}\n"
+        form_context += "--\n"
+    return form_context
+
+
+def form_state_turn(template, submissions):
+    form_state = FormState(template, submissions)
+    form_state.render()
+    field = template.fields[-1]
+    form_state.stage({field.id: FieldToUpdate(type="update", template_field_id=str(field.id), field_name=field.name, new_value="Updated", confidence=0.9, reasoning="")})
+    return form_state.render()[1]
+
+
+def main():
+    print(f"{'fields':>7} {'legacy (us)':>13} {'FormState (us)':>15} {'speedup':>8}")
+    for num_fields in (10, 100, 1000):
+        field_templates, submissions, template = make_form(num_fields)
+        assert legacy_turn(field_templates, submissions) == form_state_turn(template, submissions)
+
+        number = max(1, 20000 // num_fields)
+        legacy = min(timeit.repeat(lambda: legacy_turn(field_templates, submissions), number=number, repeat=5)) / number
+        indexed = min(timeit.repeat(lambda: form_state_turn(template, submissions), number=number, repeat=5)) / number
+        print(f"{num_fields:>7} {legacy * 1e6:>13.1f} {indexed * 1e6:>15.1f} {legacy / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
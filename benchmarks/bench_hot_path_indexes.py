@@ -0,0 +1,200 @@
+"""
+Seeded-data benchmark for the chat hot-path indexes
+(alembic revisions b71e4c2a9d35 and e2a7c5d19b64).
+
+Creates the schema in a THROWAWAY Postgres database, drops the hot-path
+indexes, seeds ~1M messages, and times the queries a chat turn runs:
+
+- recent_messages:   last 20 messages of a conversation
+- field_submissions: all submissions of a form
+- conversations:     conversations of a user
+- forms:             forms of a user
+
+It then creates the indexes, ANALYZEs, and times the same queries
+again. Every table it creates is dropped at the end unless --keep.
+
+Usage (never point this at a real database):
+    python -m benchmarks.bench_hot_path_indexes \\
+        --url postgresql://localhost/cfci_bench --messages 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, inspect, text
+
+from app.db.database import Base
+import app.db.models  # noqa: F401 - registers every table on Base.metadata
+
+# Index / constraint names added by the migrations
+HOT_PATH_INDEXES = {
+    "conversations": ["ix_conversations_user_id"],
+    "forms": ["ix_forms_user_id"],
+    "field_templates": ["ix_field_templates_form_template_id"],
+}
+HOT_PATH_CONSTRAINTS = {
+    "messages": ["uq_messages_conversation_id_message_num_sender"],
+    "field_submissions": ["uq_field_submissions_form_id_field_template_id"],
+}
+
+QUERIES = {
+    "recent_messages": (
+        "SELECT * FROM messages WHERE conversation_id = :id ORDER BY message_num DESC LIMIT 20",
+        "conversations"
+    ),
+    "field_submissions": (
+        "SELECT * FROM field_submissions WHERE form_id = :id",
+        "forms"
+    ),
+    "conversations": (
+        "SELECT * FROM conversations WHERE user_id = :id",
+        "users"
+    ),
+    "forms": (
+        "SELECT * FROM forms WHERE user_id = :id",
+        "users"
+    ),
+}
+
+
+def drop_hot_path_indexes(conn):
+    for table, names in HOT_PATH_INDEXES.items():
+        for name in names:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+    for table, names in HOT_PATH_CONSTRAINTS.items():
+        for name in names:
+            conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS "{name}"'))
+
+
+def create_hot_path_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in HOT_PATH_INDEXES.get(table.name, []):
+                index.create(conn)
+    conn.execute(text(
+        "ALTER TABLE field_submissions ADD CONSTRAINT uq_field_submissions_form_id_field_template_id "
+        "UNIQUE (form_id, field_template_id)"
+    ))
+    conn.execute(text(
+        "ALTER TABLE messages ADD CONSTRAINT uq_messages_conversation_id_message_num_sender "
+        "UNIQUE (conversation_id, message_num, sender)"
+    ))
+
+
+def seed(conn, num_messages: int, messages_per_conv: int, num_fields: int, num_users: int):
+    num_convs = max(1, num_messages // messages_per_conv)
+    print(f"Seeding {num_users} users, {num_convs} conversations/forms, "
+          f"{num_convs * messages_per_conv} messages, {num_convs * num_fields} field submissions...")
+    conn.execute(text(
+        "INSERT INTO users (id, email, firstname, lastname, hashed_password) "
+        "SELECT g, 'user' || g || '@bench.test', 'Bench', 'User', 'x' FROM generate_series(1, :n) g"
+    ), {"n": num_users})
+    conn.execute(text("INSERT INTO form_templates (id, name) VALUES (1, 'bench')"))
+    conn.execute(text(
+        "INSERT INTO field_templates (id, name, field_type, description, form_template_id) "
+        "SELECT g, 'Field ' || g, 'STRING'::fieldtype, 'Benchmark field', 1 FROM generate_series(1, :n) g"
+    ), {"n": num_fields})
+    conn.execute(text(
+        "INSERT INTO forms (id, user_id, form_template_id) "
+        "SELECT g, 1 + (g % :users), 1 FROM generate_series(1, :n) g"
+    ), {"n": num_convs, "users": num_users})
+    conn.execute(text(
+        "INSERT INTO conversations (id, title, user_id, form_id) "
+        "SELECT g, 'bench', 1 + (g % :users), g FROM generate_series(1, :n) g"
+    ), {"n": num_convs, "users": num_users})
+    # Interleave conversations the way real traffic does, rather than
+    # writing each conversation's messages contiguously
+    conn.execute(text(
+        "INSERT INTO messages (sender, message_num, content, conversation_id, user_id) "
+        "SELECT CASE WHEN step % 2 = 0 THEN 'user'::sender_enum ELSE 'agent'::sender_enum END, "
+        "       step, 'Benchmark message content ' || step, conv, 1 + (conv % :users) "
+        "FROM generate_series(0, :per_conv - 1) step, generate_series(1, :n) conv"
+    ), {"n": num_convs, "per_conv": messages_per_conv, "users": num_users})
+    conn.execute(text(
+        "INSERT INTO field_submissions (value, status, llm_confidence, form_id, field_template_id) "
+        "SELECT 'value', 'DRAFT'::fieldstatus, 0.9, form, field "
+        "FROM generate_series(1, :fields) field, generate_series(1, :n) form"
+    ), {"n": num_convs, "fields": num_fields})
+    for table in ("users", "forms", "conversations", "field_templates"):
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+    return num_convs
+
+
+def time_queries(conn, max_ids: dict, samples: int):
+    results = {}
+    rng = random.Random(42)
+    for name, (sql, id_table) in QUERIES.items():
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            conn.execute(text(sql), {"id": rng.randint(1, max_ids[id_table])}).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = (statistics.median(timings), timings[int(len(timings) * 0.95) - 1])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL of a throwaway Postgres database")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--messages-per-conversation", type=int, default=20)
+    parser.add_argument("--fields", type=int, default=10)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--samples", type=int, default=200, help="Queries timed per query type and phase")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded tables")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if not engine.dialect.name == "postgresql":
+        sys.exit("This benchmark seeds with generate_series and needs Postgres.")
+    existing = set(inspect(engine).get_table_names()) & set(Base.metadata.tables)
+    if existing:
+        sys.exit(f"Refusing to run: {', '.join(sorted(existing))} already exist in this database.")
+
+    try:
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn)
+            drop_hot_path_indexes(conn)
+            num_convs = seed(conn, args.messages, args.messages_per_conversation, args.fields, args.users)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM ANALYZE"))
+
+        max_ids = {"conversations": num_convs, "forms": num_convs, "users": args.users}
+        with engine.connect() as conn:
+            before = time_queries(conn, max_ids, args.samples)
+
+        with engine.begin() as conn:
+            start = time.perf_counter()
+            create_hot_path_indexes(conn)
+            print(f"Index build took {time.perf_counter() - start:.1f}s")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+
+        with engine.connect() as conn:
+            after = time_queries(conn, max_ids, args.samples)
+
+        print(f"\n{'query':<18} {'before p50/p95 (ms)':>22} {'after p50/p95 (ms)':>22} {'p50 speedup':>12}")
+        for name in QUERIES:
+            b50, b95 = before[name]
+            a50, a95 = after[name]
+            print(f"{name:<18} {b50:>10.2f} / {b95:>9.2f} {a50:>10.2f} / {a95:>9.2f} {b50 / a50:>11.1f}x")
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                Base.metadata.drop_all(conn)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
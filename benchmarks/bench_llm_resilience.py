@@ -0,0 +1,165 @@
+"""
+Resilience policy for LLM calls (app/services/llm_resilience.py)
+against the fake OpenAI server (benchmarks/fake_openai_server.py),
+which injects latency and errors.
+
+`AsyncOpenAIService` (a single-model `LLMRouter`) talks to the fake
+server in-process (httpx ASGI transport), so the SDK, retries,
+deadlines, hedging and the circuit breaker all run as in production. Three scenarios:
+
+1. errors:  a share of requests fail with 500. SDK defaults (2 retries,
+            no deadline) vs the resilience policy: success rate, latency.
+2. tail:    a share of requests are slow. Without vs with hedging
+            (after warming up the p95): p50/p95/p99 latency, requests
+            sent.
+3. outage:  every request fails, then upstream recovers. Shows the
+            breaker opening (calls fail fast with CircuitOpen), then
+            closing again after a successful probe.
+
+Usage:
+    python -m benchmarks.bench_llm_resilience [--calls 200] [--error-rate 0.2] [--slow-rate 0.05]
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import sys
+import time
+
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from openai import AsyncOpenAI, DEFAULT_MAX_RETRIES
+
+from benchmarks.fake_openai_server import Faults, create_app
+from app.schemas.openai_schemas import UpdateFormLLMOutput
+from app.services.llm_resilience import CircuitBreaker, LLMResilience
+from app.services.openai_service import AsyncOpenAIService
+
+logging.getLogger().setLevel(logging.ERROR)
+
+
+def fake_service(faults: Faults, resilience: LLMResilience = None) -> AsyncOpenAIService:
+    client = AsyncOpenAI(
+        api_key="bench",
+        base_url="http://fake/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(faults))),
+        max_retries=0 if resilience is not None else DEFAULT_MAX_RETRIES
+    )
+    return AsyncOpenAIService(api_key="bench", resilience=resilience, client=client)
+
+
+async def one_call(service: AsyncOpenAIService, i: int):
+    start = time.perf_counter()
+    try:
+        await service.handle_message(
+            user_prompt=f"Bench prompt {i}",
+            response_format=UpdateFormLLMOutput,
+            prompt_name="update_form"
+        )
+        outcome = "ok"
+    except Exception as e:
+        outcome = type(e).__name__
+    return outcome, time.perf_counter() - start
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def report(label: str, results: list):
+    outcomes = collections.Counter(outcome for outcome, _ in results)
+    latencies = [seconds for outcome, seconds in results if outcome == "ok"]
+    failed = [seconds for outcome, seconds in results if outcome != "ok"]
+    line = f"  {label:28s} ok {outcomes['ok']}/{len(results)}"
+    if latencies:
+        line += f"  p50/p95/p99 {percentile(latencies, 0.5):.2f}/{percentile(latencies, 0.95):.2f}/{percentile(latencies, 0.99):.2f}s"
+    if failed:
+        failures = dict((outcome, count) for outcome, count in outcomes.items() if outcome != "ok")
+        line += f"  failures {failures} after p50 {percentile(failed, 0.5):.2f}s"
+    print(line)
+
+
+async def bounded(calls, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(call):
+        async with semaphore:
+            return await call
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+
+async def run_errors(calls: int, error_rate: float):
+    print(f"1. errors: {error_rate:.0%} of requests fail with 500")
+    faults = Faults(latency=0.1, jitter=0.05, error_rate=error_rate)
+    for label, resilience in (
+        ("SDK defaults", None),
+        ("resilience policy", LLMResilience(default_deadline=10.0, attempt_timeout=5.0, max_attempts=4, backoff=0.1, backoff_max=1.0,
+                                            breaker=CircuitBreaker(min_calls=1000)))
+    ):
+        service = fake_service(faults, resilience)
+        report(label, await asyncio.gather(*(one_call(service, i) for i in range(calls))))
+        await service.close()
+
+
+async def run_tail(calls: int, slow_rate: float, slow_latency: float, concurrency: int):
+    print(f"\n2. tail: {slow_rate:.0%} of requests take {slow_latency:g}s, {concurrency} calls at a time")
+    faults = Faults(latency=0.2, jitter=0.05, slow_rate=slow_rate, slow_latency=slow_latency)
+    for label, hedge in (("no hedging", False), ("hedging after p95", True)):
+        resilience = LLMResilience(default_deadline=30.0, attempt_timeout=20.0, hedge=hedge, hedge_min_delay=0.3, hedge_max_ratio=0.1)
+        service = fake_service(faults, resilience)
+        # Warm up the latency samples the hedge delay comes from
+        for i in range(0, 40, 10):
+            await asyncio.gather(*(one_call(service, i + j) for j in range(10)))
+        requests_before = service.client._client._transport.app.state.requests
+        results = await bounded((one_call(service, i) for i in range(calls)), concurrency)
+        sent = service.client._client._transport.app.state.requests - requests_before
+        report(label, results)
+        delay = resilience.hedge_delay("update_form")
+        print(f"  {'':28s} {sent} requests sent for {calls} calls"
+              + (f", hedge delay {delay:.2f}s" if hedge and delay else ""))
+        await service.close()
+
+
+async def run_outage(cooldown: float):
+    print("\n3. outage: every request fails, then upstream recovers")
+    faults = Faults(latency=0.1, jitter=0.0, error_rate=1.0)
+    breaker = CircuitBreaker(window=10.0, min_calls=10, failure_ratio=0.5, cooldown=cooldown)
+    resilience = LLMResilience(default_deadline=5.0, attempt_timeout=2.0, max_attempts=2, backoff=0.05, backoff_max=0.1, breaker=breaker)
+    service = fake_service(faults, resilience)
+    for phase in ("failing", "failing", "failing"):
+        results = await asyncio.gather(*(one_call(service, i) for i in range(10)))
+        report(f"{phase} (breaker {['closed', 'half-open', 'open'][breaker.state]})", results)
+    faults.error_rate = 0.0
+    report("recovered, still open", await asyncio.gather(*(one_call(service, i) for i in range(10))))
+    await asyncio.sleep(cooldown)
+    report("after cooldown (probe)", [await one_call(service, 0)])
+    report(f"breaker {['closed', 'half-open', 'open'][breaker.state]}", await asyncio.gather(*(one_call(service, i) for i in range(10))))
+    await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="Concurrent calls per run")
+    parser.add_argument("--error-rate", type=float, default=0.2, help="Share of failing requests (errors scenario)")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Share of slow requests (tail scenario)")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="Latency of slow requests (seconds)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Calls in flight at once (tail scenario)")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="Circuit breaker cooldown (outage scenario)")
+    args = parser.parse_args()
+
+    asyncio.run(run_errors(args.calls, args.error_rate))
+    asyncio.run(run_tail(args.calls, args.slow_rate, args.slow_latency, args.concurrency))
+    asyncio.run(run_outage(args.cooldown))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+LLM router (app/services/llm_router.py) over fake providers
+(`FakeProvider`, app/services/llm_providers.py) standing in for
+OpenAI, Anthropic and Gemini: three models with different latencies
+and list prices, no network. Each provider has its own resilience
+policy and circuit breaker, as in the app.
+
+1. selection: the same calls under each selection policy ("ordered",
+              "latency", "cost", "balanced"): which models answered,
+              p50/p95 latency and estimated spend.
+2. failover:  the route's first provider starts failing. Calls fail
+              over to the next model (after the first one's retries),
+              then skip it once its circuit breaker opens.
+3. stream:    the same for streamed replies; time to first token
+              before and after the first model fails.
+
+Usage:
+    python -m benchmarks.bench_llm_router [--calls 200] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import sys
+import time
+
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.schemas.openai_schemas import UpdateFormLLMOutput
+from app.services.llm_providers import FakeProvider
+from app.services.llm_resilience import CircuitBreaker, LLMResilience
+from app.services.llm_router import LLMRouter, MODEL_PRICES
+
+logging.getLogger().setLevel(logging.ERROR)
+
+ROUTE = ["openai:gpt-4o", "anthropic:claude-haiku-4-5", "gemini:gemini-2.5-flash"]
+LATENCIES = {"openai": 0.40, "anthropic": 0.30, "gemini": 0.20}
+
+
+def router(selection: str = "ordered", min_calls: int = 1000) -> LLMRouter:
+    providers = {name: FakeProvider(latency=latency) for name, latency in LATENCIES.items()}
+    return LLMRouter(
+        providers,
+        routes={"update_form": ROUTE, "generate_response": ROUTE},
+        resilience={
+            name: LLMResilience(
+                default_deadline=10.0, attempt_timeout=5.0, max_attempts=2, backoff=0.05, backoff_max=0.1,
+                breaker=CircuitBreaker(window=10.0, min_calls=min_calls, failure_ratio=0.5, cooldown=60.0, provider=name)
+            )
+            for name in providers
+        },
+        selection=selection
+    )
+
+
+def calls(service: LLMRouter) -> list:
+    return [model for provider in service.providers.values() for model in provider.calls]
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def bounded(calls, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(call):
+        async with semaphore:
+            return await call
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+
+async def one_call(service: LLMRouter, i: int):
+    start = time.perf_counter()
+    try:
+        await service.handle_message(user_prompt=f"Bench prompt {i}", response_format=UpdateFormLLMOutput, prompt_name="update_form", use_cache=False)
+        outcome = "ok"
+    except Exception as e:
+        outcome = type(e).__name__
+    return outcome, time.perf_counter() - start
+
+
+async def one_stream(service: LLMRouter, i: int):
+    start = time.perf_counter()
+    first_token = None
+    try:
+        async for _ in service.stream_message(user_prompt=f"Bench prompt {i}", prompt_name="generate_response", use_cache=False):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+        outcome = "ok"
+    except Exception as e:
+        outcome = type(e).__name__
+    return outcome, first_token or 0.0
+
+
+def spend(calls: list, prompt_tokens: int = 1500, output_tokens: int = 300) -> float:
+    """
+    Estimated spend of `calls` (model names) at list prices, for
+    `prompt_tokens` in and `output_tokens` out per call.
+    """
+    return sum(
+        (prompt_tokens * MODEL_PRICES[model][0] + output_tokens * MODEL_PRICES[model][1]) / 1e6
+        for model in calls
+    )
+
+
+def report(label: str, results: list, service: LLMRouter):
+    calls_made = calls(service)
+    for provider in service.providers.values():
+        provider.calls.clear()
+    outcomes = collections.Counter(outcome for outcome, _ in results)
+    latencies = [seconds for outcome, seconds in results if outcome == "ok"]
+    models = collections.Counter(calls_made)
+    line = f"  {label:24s} ok {outcomes['ok']}/{len(results)}"
+    if latencies:
+        line += f"  p50/p95 {percentile(latencies, 0.5):.2f}/{percentile(latencies, 0.95):.2f}s"
+    failures = {outcome: count for outcome, count in outcomes.items() if outcome != "ok"}
+    if failures:
+        line += f"  failures {failures}"
+    print(line)
+    print(f"  {'':24s} requests {dict(models)}  est. ${spend(calls_made) * 1000 / max(1, len(results)):.2f} per 1k calls")
+
+
+async def run_selection(calls: int, concurrency: int):
+    print("1. selection: " + ", ".join(f"{choice} {LATENCIES[choice.split(':')[0]]:g}s" for choice in ROUTE))
+    for selection in ("ordered", "latency", "cost", "balanced"):
+        service = router(selection)
+        results = await bounded((one_call(service, i) for i in range(calls)), concurrency)
+        report(selection, results, service)
+
+
+async def run_failover(calls: int, concurrency: int, stream: bool):
+    first = ROUTE[0].split(":")
+    print(f"\n{3 if stream else 2}. {'stream' if stream else 'failover'}: {ROUTE[0]} starts failing"
+          + (" (time to first token)" if stream else ""))
+    service = router(min_calls=10)
+    call = one_stream if stream else one_call
+    for phase in ("healthy", "first model failing", "breaker open"):
+        if phase == "first model failing":
+            service.providers[first[0]].failing.add(first[1])
+        results = await bounded((call(service, i) for i in range(calls)), concurrency)
+        report(phase, results, service)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="Calls per run")
+    parser.add_argument("--concurrency", type=int, default=20, help="Calls in flight at once")
+    args = parser.parse_args()
+
+    asyncio.run(run_selection(args.calls, args.concurrency))
+    asyncio.run(run_failover(args.calls, args.concurrency, stream=False))
+    asyncio.run(run_failover(args.calls, args.concurrency, stream=True))
+
+
+if __name__ == "__main__":
+    main()
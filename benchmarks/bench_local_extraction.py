@@ -0,0 +1,147 @@
+"""
+Throughput of local field extraction (app/services/field_values.py)
+against LLM call 1 on a replay corpus of user messages answering a
+single typed field.
+
+Each line of the corpus is a JSON object:
+
+    {"message": "(919) 555-0143", "field_type": "phone", "expected": "+19195550143"}
+
+where `expected` is the canonical value, or null if the message should
+be left to the LLM (relative dates, values inside a sentence...).
+
+For every message, a one-field form with that field missing is built
+and `extract_locally` is run; the report gives messages/s, how many
+messages were filled locally, and any wrong values (filled but
+different from `expected`). With `--llm` the same messages are also
+sent through the real update_form prompt (needs OPENAI_KEY), and the
+LLM's values, canonicalized by `verify_field_updates`, are scored the
+same way.
+
+Usage:
+    python -m benchmarks.bench_local_extraction [--corpus path.jsonl] [--iterations 200] [--llm]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.config import get_settings
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import UpdateFormLLMOutput
+from app.services.field_submission_service import normalize_field_updates
+from app.services.field_values import extract_locally, verify_field_updates
+from app.services.form_state import FormState
+from app.services.form_template_cache import CompiledFormTemplate
+from app.utils.prompt_registry import prompt_registry
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "field_values_replay.jsonl")
+
+
+def one_field_form(field_type: FieldType) -> FormState:
+    field_template = SimpleNamespace(
+        id=1,
+        name=f"Client {field_type.value}",
+        field_type=field_type,
+        description=f"The client's {field_type.value}."
+    )
+    return FormState(CompiledFormTemplate(SimpleNamespace(id=1, name="bench"), [field_template]))
+
+
+def score(rows: list, values: list) -> tuple:
+    """
+    Count (filled, wrong) for extracted `values` (None = not filled).
+    """
+    filled = wrong = 0
+    for row, value in zip(rows, values):
+        if value is None:
+            continue
+        filled += 1
+        if value != row["expected"]:
+            wrong += 1
+            print(f"  WRONG: {row['message']!r} -> {value!r} (expected {row['expected']!r})")
+    return filled, wrong
+
+
+def run_local(rows: list, iterations: int) -> tuple:
+    forms = [one_field_form(FieldType(row["field_type"])) for row in rows]
+    values = []
+    for row, form_state in zip(rows, forms):
+        updates = extract_locally(row["message"], form_state)
+        values.append(updates.fields_to_update[0].new_value if updates else None)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for row, form_state in zip(rows, forms):
+            extract_locally(row["message"], form_state)
+    return values, iterations * len(rows) / (time.perf_counter() - start)
+
+
+async def run_llm(rows: list, concurrency: int) -> tuple:
+    from app.services.openai_service import AsyncOpenAIService
+    service = AsyncOpenAIService(api_key=get_settings().openai_key)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def extract(row):
+        form_state = one_field_form(FieldType(row["field_type"]))
+        with_ids, _ = form_state.render()
+        definitions, _ = form_state.definitions()
+        prompt = prompt_registry.render("update_form", FORM_CONTEXT=with_ids, CHAT_HISTORY=f"User: {row['message']}\n")
+        async with semaphore:
+            response = (await service.handle_message(
+                user_prompt=prompt,
+                response_format=UpdateFormLLMOutput,
+                system_prompt=prompt_registry.render("update_form_system", FIELD_DEFINITIONS=definitions),
+                prompt_name="update_form"
+            )).get("response")
+        updates = verify_field_updates(normalize_field_updates(response.fields_to_update, {1}), form_state.template)
+        return updates[1].new_value if 1 in updates else None
+
+    start = time.perf_counter()
+    try:
+        values = await asyncio.gather(*(extract(row) for row in rows))
+    finally:
+        await service.close()
+    return values, len(rows) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL replay corpus")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed passes over the corpus (local path)")
+    parser.add_argument("--llm", action="store_true", help="Also run the corpus through LLM call 1")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent LLM calls with --llm")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    deterministic = sum(1 for row in rows if row["expected"] is not None)
+    print(f"corpus: {len(rows)} messages, {deterministic} with a deterministic value\n")
+
+    print("local:")
+    values, throughput = run_local(rows, args.iterations)
+    filled, wrong = score(rows, values)
+    print(f"  {throughput:,.0f} messages/s ({1e6 / throughput:.1f} us/message)")
+    print(f"  filled {filled}/{deterministic} deterministic messages, {wrong} wrong, "
+          f"{len(rows) - filled} left to the LLM")
+
+    if args.llm:
+        print("\nLLM call 1 (update_form):")
+        values, throughput = asyncio.run(run_llm(rows, args.concurrency))
+        filled, wrong = score(rows, values)
+        print(f"  {throughput:,.2f} messages/s at concurrency {args.concurrency}")
+        print(f"  filled {filled}/{len(rows)} messages, {wrong} differ from the expected canonical value")
+
+
+if __name__ == "__main__":
+    main()
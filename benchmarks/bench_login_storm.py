@@ -0,0 +1,178 @@
+"""
+Chat latency under a login storm.
+
+Keeps a number of chat clients running `/api/chat/advance` turns back
+to back (LLM stubbed with a fixed async delay) while a burst of
+`/api/auth/login` requests hits the same worker, and reports chat turn
+latency p50/p99 plus how the logins fared.
+
+Two modes are compared:
+- inline: bcrypt runs directly on the event loop, as the auth routes
+          used to do.
+- pool:   bcrypt runs on `password_hasher`'s bounded thread pool, and
+          logins past its queue limit get a 503 with Retry-After.
+
+The DB is a throwaway SQLite file driven through aiosqlite.
+
+Usage:
+    python -m benchmarks.bench_login_storm --chats 10 --logins 40
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="cfci_bench_")
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", f"sqlite:///{_tmp_dir}/bench.db")
+# Every turn comes from one bench user; lift the per-user turn limit
+os.environ.setdefault("CHAT_USER_TURN_BURST", "1000000")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.main import app
+from app.api import auth
+from app.core.config import get_settings
+from app.core.dependencies import get_openai_service
+from app.core.jwt import create_access_token
+from app.core.security import hash_password, verify_password, password_hasher
+from app.db.database import Base, get_async_db
+from app.db.models import User, FormTemplate, FieldTemplate, Form, Conversation
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import UpdateFormLLMOutput, DefaultLLMOutput
+
+# Rejected logins are logged as warnings; they're counted in the report
+logging.getLogger().setLevel(logging.ERROR)
+
+PASSWORD = "bench-password"
+
+
+class StubLLMService:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def handle_message(self, user_prompt: str, response_format=DefaultLLMOutput, system_prompt: str = "", **kwargs):
+        await asyncio.sleep(self.latency)
+        if response_format is UpdateFormLLMOutput:
+            return {"input message": user_prompt, "response": UpdateFormLLMOutput(fields_to_update=[])}
+        return {"input message": user_prompt, "response": DefaultLLMOutput(output_text="Tell me more.")}
+
+
+class InlineHasher:
+    """
+    The previous behaviour: bcrypt called directly on the event loop.
+    """
+    async def hash(self, password: str) -> str:
+        return hash_password(password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return verify_password(plain_password, hashed_password)
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def seed(session_factory, chats: int):
+    async with session_factory() as db:
+        user = User(email="bench@example.com", firstname="Bench", lastname="User", hashed_password=hash_password(PASSWORD))
+        form_template = FormTemplate(name="bench")
+        db.add_all([user, form_template])
+        await db.flush()
+        db.add_all([
+            FieldTemplate(name=f"Field {i}", field_type=FieldType.STRING, description="Benchmark field", form_template_id=form_template.id)
+            for i in range(10)
+        ])
+        conversation_ids = []
+        for _ in range(chats):
+            conv = Conversation(title="bench", user_id=user.id, form=Form(user_id=user.id, form_template_id=form_template.id))
+            db.add(conv)
+            await db.flush()
+            conversation_ids.append(conv.id)
+        await db.commit()
+        return user, conversation_ids
+
+
+async def run(mode: str, chats: int, logins: int, duration: float, latency: float):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{_tmp_dir}/storm_{mode}.db", connect_args={"timeout": 60})
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    user, conversation_ids = await seed(session_factory, chats)
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': user.id, 'email': user.email})}"}
+
+    async def override_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_db
+    app.dependency_overrides[get_openai_service] = lambda: StubLLMService(latency)
+    auth.password_hasher = InlineHasher() if mode == "inline" else password_hasher
+
+    turn_latencies = []
+    login_statuses = {}
+    deadline = time.perf_counter() + duration
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def chat_client(conversation_id: int):
+            step = 1
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/api/chat/advance",
+                    json={"conversation_id": conversation_id, "user_message": "Hello", "message_step_num": step},
+                    headers=headers
+                )
+                response.raise_for_status()
+                turn_latencies.append(time.perf_counter() - start)
+                step += 2
+
+        async def login_storm():
+            # Let the chats warm up, then fire every login at once
+            await asyncio.sleep(duration / 4)
+            responses = await asyncio.gather(*(
+                client.post("/api/auth/login", json={"email": user.email, "password": PASSWORD})
+                for _ in range(logins)
+            ))
+            for response in responses:
+                login_statuses[response.status_code] = login_statuses.get(response.status_code, 0) + 1
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(login_storm(), *(chat_client(cid) for cid in conversation_ids))
+
+    auth.password_hasher = password_hasher
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    return turn_latencies, login_statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=10, help="Chat clients running turns back to back")
+    parser.add_argument("--logins", type=int, default=40, help="Logins fired at once, a quarter into the run")
+    parser.add_argument("--duration", type=float, default=8.0, help="Seconds the chat clients run for")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stubbed latency per LLM call (seconds)")
+    args = parser.parse_args()
+
+    print(f"{args.chats} chat clients for {args.duration}s, {args.logins} logins at once, "
+          f"bcrypt rounds {get_settings().bcrypt_rounds}\n")
+    for mode in ("inline", "pool"):
+        latencies, statuses = asyncio.run(run(mode, args.chats, args.logins, args.duration, args.latency))
+        print(f"{mode:7s} chat turns: {len(latencies):5d}  p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  max {max(latencies, default=0) * 1000:7.1f} ms  "
+              f"logins by status: {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Overhead bound for the in-process metrics registry.
+
+1. Times the primitive operations (counter inc, labelled histogram
+   observe, `Histogram.time()` block, gauge inc+dec).
+2. Runs real `/api/chat/advance` turns (LLM stubbed with zero
+   latency, so the turn is as cheap as it gets) while counting every
+   metric operation they perform.
+3. Times a full `/metrics` exposition of the resulting registry.
+
+The bound reported is operations per turn x the slowest primitive,
+compared with the turn's own wall time.
+
+Usage:
+    python -m benchmarks.bench_metrics_overhead --turns 200
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+_tmp_dir = tempfile.mkdtemp(prefix="cfci_bench_")
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", f"sqlite:///{_tmp_dir}/bench.db")
+# Every turn comes from one bench user; lift the per-user turn limit
+os.environ.setdefault("CHAT_USER_TURN_BURST", "1000000")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+
+from app.main import app
+from app.core import metrics
+from app.core.dependencies import get_openai_service
+from app.core.jwt import create_access_token
+from app.db.database import Base, async_engine, AsyncSessionLocal
+from app.db.models import User, FormTemplate, FieldTemplate, Form, Conversation
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import UpdateFormLLMOutput, DefaultLLMOutput
+
+logging.getLogger().setLevel(logging.WARNING)
+
+
+class StubLLMService:
+    async def handle_message(self, user_prompt: str, response_format=DefaultLLMOutput, system_prompt: str = "", **kwargs):
+        if response_format is UpdateFormLLMOutput:
+            return {"input message": user_prompt, "response": UpdateFormLLMOutput(fields_to_update=[])}
+        return {"input message": user_prompt, "response": DefaultLLMOutput(output_text="Tell me more.")}
+
+
+def time_primitives(number: int = 200_000) -> dict:
+    counter = metrics.Counter("bench_counter_total", "bench", ["a"])
+    gauge = metrics.Gauge("bench_gauge", "bench", ["a"])
+    histogram = metrics.Histogram("bench_seconds", "bench", ["a", "b"])
+
+    def timed_block():
+        with histogram.labels(a="x", b="y").time():
+            pass
+
+    return {
+        "counter.labels().inc()": timeit.timeit(lambda: counter.labels(a="x").inc(), number=number) / number,
+        "gauge.labels().inc()+dec()": timeit.timeit(lambda: (gauge.labels(a="x").inc(), gauge.labels(a="x").dec()), number=number) / number,
+        "histogram.labels().observe()": timeit.timeit(lambda: histogram.labels(a="x", b="y").observe(0.42), number=number) / number,
+        "histogram.labels().time() block": timeit.timeit(timed_block, number=number) / number,
+    }
+
+
+class OperationCounter:
+    """
+    Counts calls to the metric primitives while installed.
+    """
+    def __init__(self):
+        self.operations = 0
+        self._originals = []
+
+    def install(self):
+        for cls, name in (
+            (metrics._CounterChild, "inc"),
+            (metrics._GaugeChild, "dec"),
+            (metrics._GaugeChild, "set"),
+            (metrics._HistogramChild, "observe"),
+        ):
+            original = cls.__dict__[name]
+            self._originals.append((cls, name, original))
+
+            def counted(*args, __original=original, **kwargs):
+                self.operations += 1
+                return __original(*args, **kwargs)
+            setattr(cls, name, counted)
+
+    def uninstall(self):
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+
+
+async def run_turns(turns: int):
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        user = User(email="bench@example.com", firstname="Bench", lastname="User", hashed_password="x")
+        form_template = FormTemplate(name="bench")
+        db.add_all([user, form_template])
+        await db.flush()
+        db.add_all([
+            FieldTemplate(name=f"Field {i}", field_type=FieldType.STRING, description="Benchmark field", form_template_id=form_template.id)
+            for i in range(10)
+        ])
+        conv = Conversation(title="bench", user_id=user.id, form=Form(user_id=user.id, form_template_id=form_template.id))
+        db.add(conv)
+        await db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': user.id, 'email': user.email})}"}
+    app.dependency_overrides[get_openai_service] = lambda: StubLLMService()
+
+    counter = OperationCounter()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def turn(step: int):
+            response = await client.post(
+                "/api/chat/advance",
+                json={"conversation_id": conv.id, "user_message": "Hello", "message_step_num": step},
+                headers=headers
+            )
+            response.raise_for_status()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            await turn(1)  # warm caches
+            start = time.perf_counter()
+            counter.install()
+            try:
+                for i in range(turns):
+                    await turn(3 + 2 * i)
+            finally:
+                counter.uninstall()
+            per_turn = (time.perf_counter() - start) / turns
+
+    app.dependency_overrides.clear()
+    await async_engine.dispose()
+    return per_turn, counter.operations / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    primitives = time_primitives()
+    print("primitive costs:")
+    for name, seconds in primitives.items():
+        print(f"  {name:<34} {seconds * 1e6:6.2f} us")
+
+    per_turn, operations = asyncio.run(run_turns(args.turns))
+    slowest = max(primitives.values())
+    bound = operations * slowest
+    print(f"\nchat turn (zero-latency LLM stub): {per_turn * 1000:.2f} ms, {operations:.0f} metric operations")
+    print(f"overhead bound: {operations:.0f} x {slowest * 1e6:.2f} us = {bound * 1e6:.1f} us "
+          f"({bound / per_turn:.2%} of the turn; real turns spend seconds in the LLM)")
+
+    scrape = timeit.timeit(metrics.REGISTRY.exposition, number=200) / 200
+    series = sum(len(metric.samples()) for metric in metrics.REGISTRY.metrics())
+    print(f"/metrics exposition: {scrape * 1000:.2f} ms for {len(metrics.REGISTRY.metrics())} metrics, {series} series")
+
+
+if __name__ == "__main__":
+    main()
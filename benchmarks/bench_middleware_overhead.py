@@ -0,0 +1,141 @@
+"""
+Per-request overhead of the request logging middleware.
+
+Times sequential requests through otherwise identical apps:
+- none:    no logging middleware
+- legacy:  the old `LoggingMiddleware` (BaseHTTPMiddleware that reads
+           the body and prints URL and headers), copied here for
+           comparison
+- current: `RequestInstrumentationMiddleware`, logging every request
+           (sample rate 1.0) through the queue-backed sink
+- sampled: the same with sample rate 0 (metrics only, no log line)
+
+for a bodyless GET and a POST with a 64 KiB body, and reports the
+median time per request and the overhead over "none". Log output goes
+to /dev/null so terminal speed doesn't skew the numbers.
+
+Usage:
+    python -m benchmarks.bench_middleware_overhead --requests 3000
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.instrumentation import RequestInstrumentationMiddleware, RequestLogSink
+
+BODY = b"x" * 64 * 1024
+MIDDLEWARES = ("none", "legacy", "current", "sampled")
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        body = await request.body()
+        print(f"--- Incoming Request ---")
+        print(f"URL: {request.url}")
+        print(f"Method: {request.method}")
+        print(f"Headers: {dict(request.headers)}")
+        response = await call_next(request)
+        print(f"--- End Request ---\n")
+        return response
+
+
+def build_app(middleware: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    @app.post("/items")
+    async def post_item(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        return {"size": size}
+
+    if middleware == "legacy":
+        app.add_middleware(LegacyLoggingMiddleware)
+    elif middleware == "current":
+        app.add_middleware(RequestInstrumentationMiddleware, sample_rate=1.0)
+    elif middleware == "sampled":
+        app.add_middleware(RequestInstrumentationMiddleware, sample_rate=0.0)
+    return app
+
+
+async def time_requests(client: httpx.AsyncClient, method: str, requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        if method == "GET":
+            response = await client.get(f"/items/{i}", headers={"Authorization": "Bearer not-a-real-token"})
+        else:
+            response = await client.post("/items", content=BODY, headers={"Authorization": "Bearer not-a-real-token"})
+        response.raise_for_status()
+    return (time.perf_counter() - start) / requests
+
+
+async def run(requests: int, rounds: int) -> dict:
+    """
+    Time every (method, middleware) pair in `rounds` interleaved
+    rounds, so background noise hits all of them alike, and return
+    the median seconds per request of each.
+    """
+    clients = {
+        middleware: httpx.AsyncClient(transport=httpx.ASGITransport(app=build_app(middleware)), base_url="http://bench")
+        for middleware in MIDDLEWARES
+    }
+    samples = {}
+    try:
+        for method in ("GET", "POST"):
+            for client in clients.values():  # warm-up
+                await time_requests(client, method, 50)
+        for _ in range(rounds):
+            for method in ("GET", "POST"):
+                for middleware, client in clients.items():
+                    samples.setdefault((method, middleware), []).append(
+                        await time_requests(client, method, max(1, requests // rounds))
+                    )
+    finally:
+        for client in clients.values():
+            await client.aclose()
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000, help="Requests timed per app and method")
+    parser.add_argument("--rounds", type=int, default=10, help="Interleaved rounds the requests are split into")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull:
+        sink = RequestLogSink(stream=devnull)
+        sink.start()
+        try:
+            with contextlib.redirect_stdout(devnull):
+                results = asyncio.run(run(args.requests, args.rounds))
+        finally:
+            sink.stop()
+
+    print(f"{'method':<6} {'middleware':<10} {'us/request':>11} {'overhead':>10}")
+    for method in ("GET", "POST"):
+        baseline = results[(method, "none")]
+        for middleware in MIDDLEWARES:
+            per_request = results[(method, middleware)]
+            print(f"{method:<6} {middleware:<10} {per_request * 1e6:>11.1f} {(per_request - baseline) * 1e6:>+10.1f}")
+
+if __name__ == "__main__":
+    main()
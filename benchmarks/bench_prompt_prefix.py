@@ -0,0 +1,205 @@
+"""
+How much of each LLM prompt providers can serve from their prompt
+cache, with the prompts laid out as now (stable system prompt:
+instructions, then the template's field definitions; volatile user
+prompt: form values, then history) vs the previous layout (everything,
+field definitions interleaved with their values, in one user message).
+
+Simulates conversations on a 12-field intake form: each turn adds a
+user and an agent message and fills in one field. For every
+`update_form` and `generate_response` call it measures the prefix
+shared with the previous call for the same prompt (any conversation),
+and what OpenAI would cache of it (prefixes of 1024+ tokens, in
+128-token steps). Then runs the same turns through `LLMRouter` over the
+fake provider, which simulates caching of repeated system prompts, to
+show the cached tokens recorded in `openai_tokens_total{kind="cached"}`.
+
+Usage:
+    python -m benchmarks.bench_prompt_prefix [--conversations 5] [--turns 10]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.metrics import REGISTRY
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import FieldToUpdate, UpdateFormLLMOutput
+from app.services.chat_history import HistoryLine, render_chat_history, token_counter
+from app.services.form_state import FormState
+from app.services.form_template_cache import CompiledFormTemplate, FIELD_SEPARATOR
+from app.services.llm_providers import FakeProvider
+from app.services.llm_router import LLMRouter, MODEL_PRICES
+from app.utils.prompt_registry import prompt_registry
+
+FIELDS = [
+    ("Business/Org Title", FieldType.STRING, "The full legal or commonly used name of the client's business or organization."),
+    ("Primary Contact Name", FieldType.STRING, "First and last name of the person at the client organization we should follow up with."),
+    ("Primary Contact Email", FieldType.EMAIL, "Work email address of the primary contact. Must be a valid email address."),
+    ("Primary Contact Phone", FieldType.PHONE, "Direct phone number of the primary contact, including the country code if outside the US."),
+    ("Organization Website", FieldType.STRING, "Public website of the organization, if it has one."),
+    ("Organization Type", FieldType.STRING, "Startup, small business, corporation, nonprofit, government agency, or academic institution."),
+    ("Project Summary", FieldType.STRING, "Two to four sentences describing the proposed project, the problem it addresses and who benefits from it. Capture the client's own framing where possible."),
+    ("Desired Duke Involvement", FieldType.STRING, "What the client hopes Duke will contribute: student teams, faculty expertise, lab access, sponsored research, licensing, or something else."),
+    ("Estimated Budget", FieldType.STRING, "The budget the client expects to commit to the project, in US dollars. Leave empty if the client has not said."),
+    ("Target Start Date", FieldType.DATE, "When the client would like the project to start."),
+    ("Expected Duration (months)", FieldType.INTEGER, "How many months the client expects the engagement to last."),
+    ("Confidentiality Requirements", FieldType.BOOLEAN, "Whether the client needs an NDA or other confidentiality agreement before sharing details."),
+]
+VALUES = [
+    "Acme Robotics", "Jordan Lee", "jordan.lee@acmerobotics.com", "+1 919 555 0142", "https://acmerobotics.com",
+    "Startup", "Acme builds low-cost warehouse robots and wants help validating a new gripper design with real-world pick data.",
+    "A student engineering team and faculty advice on grasp planning", "$40,000", "2026-01-15", "6", "true",
+]
+USER_MESSAGES = [
+    "Hi! We're {value}, and we're interested in working with Duke on a project.",
+    "Sure, the best contact would be me. {value} works.",
+    "Our project in a nutshell: {value}",
+    "Ideally we'd get {value}.",
+    "We were thinking something around {value}, but we're flexible.",
+]
+AGENT_REPLY = "Thanks, that's really helpful! Could you tell me a bit more so I can fill in the next part of the form?"
+
+
+def make_template() -> CompiledFormTemplate:
+    field_templates = [
+        SimpleNamespace(id=i, name=name, field_type=field_type, description=description)
+        for i, (name, field_type, description) in enumerate(FIELDS, start=1)
+    ]
+    return CompiledFormTemplate(SimpleNamespace(id=1, name="Client intake"), field_templates)
+
+
+def previous_layout(name: str, definitions: str, form_state: FormState, with_ids: bool, **values) -> tuple:
+    """
+    The prompt as built before: the system template's instructions and
+    the user template in a single user message, with each field's
+    definition interleaved with its current value.
+    """
+    instructions = prompt_registry.render(f"{name}_system", FIELD_DEFINITIONS="")
+    instructions = instructions[:instructions.index("----\n## FORM FIELDS")]
+    blocks = []
+    for field in form_state.template.fields:
+        value = form_state.value(field.id)
+        definition = field.definition_with_id if with_ids else field.definition_without_id
+        blocks.append(f"{definition}\nCurrent value: {'NONE' if value is None else value}")
+    form_context = "### LATEST STATE OF THE FORM\n\n" + FIELD_SEPARATOR.join(blocks) + FIELD_SEPARATOR
+    return "", instructions + "----\n" + prompt_registry.render(name, FORM_CONTEXT=form_context, **values)
+
+
+def current_layout(name: str, definitions: str, form_state: FormState, with_ids: bool, **values) -> tuple:
+    rendered = form_state.render()
+    form_context = rendered[0] if with_ids else rendered[1]
+    return (
+        prompt_registry.render(f"{name}_system", FIELD_DEFINITIONS=definitions),
+        prompt_registry.render(name, FORM_CONTEXT=form_context, **values)
+    )
+
+
+def conversation_calls(template: CompiledFormTemplate, conversation: int, turns: int, layout) -> list:
+    """
+    `(prompt_name, system_prompt, user_prompt)` of every LLM call in a
+    simulated conversation.
+    """
+    form_state = FormState(template)
+    definitions_with_ids, definitions_without_ids = form_state.definitions()
+    history = []
+    calls = []
+    for turn in range(turns):
+        field = template.fields[turn % len(template.fields)]
+        # Every client gives different answers
+        value = f"{VALUES[turn % len(VALUES)]} (client {conversation})"
+        message = USER_MESSAGES[turn % len(USER_MESSAGES)].format(value=value)
+        history.append(HistoryLine(SimpleNamespace(message_num=2 * turn + 1, sender="user", content=message)))
+
+        chat_history = render_chat_history(history, 2000, "update_form")
+        calls.append(("update_form",) + layout("update_form", definitions_with_ids, form_state, True, CHAT_HISTORY=chat_history))
+        form_state.stage({field.id: FieldToUpdate(type="update", template_field_id=str(field.id), field_name=field.name, new_value=value, confidence=0.9, reasoning="")})
+        chat_history = render_chat_history(history, 2000, "generate_response")
+        calls.append(("generate_response",) + layout("generate_response", definitions_without_ids, form_state, False, CHAT_HISTORY=chat_history, LATEST_MESSAGE=message))
+
+        history.append(HistoryLine(SimpleNamespace(message_num=2 * turn + 2, sender="agent", content=AGENT_REPLY)))
+    return calls
+
+
+def shared_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def openai_cacheable(tokens: int) -> int:
+    return 0 if tokens < 1024 else 1024 + (tokens - 1024) // 128 * 128
+
+
+def measure(calls: list) -> dict:
+    previous = {}
+    stats = {}
+    for prompt_name, system_prompt, user_prompt in calls:
+        # Roughly as the provider sees it: the system message, then the user message
+        text = f"system\n{system_prompt}\nuser\n{user_prompt}"
+        total = token_counter.count(text)
+        prefix = token_counter.count(text[:shared_prefix(text, previous.get(prompt_name, ""))])
+        previous[prompt_name] = text
+        entry = stats.setdefault(prompt_name, {"calls": 0, "tokens": 0, "prefix": 0, "cached": 0})
+        entry["calls"] += 1
+        entry["tokens"] += total
+        entry["prefix"] += prefix
+        entry["cached"] += openai_cacheable(prefix)
+    return stats
+
+
+def report(label: str, stats: dict):
+    input_price, _, cached_price = MODEL_PRICES["gpt-4o"]
+    print(label)
+    for prompt_name, entry in stats.items():
+        calls, tokens, cached = entry["calls"], entry["tokens"], entry["cached"]
+        cost = ((tokens - cached) * input_price + cached * cached_price) / 1e6 * 1000 / calls
+        print(
+            f"  {prompt_name:18s} {tokens / calls:7.0f} tokens/call  shared prefix {entry['prefix'] / tokens:5.1%}"
+            f"  cacheable {cached / tokens:5.1%}  gpt-4o input ${cost:.2f} per 1k calls"
+        )
+
+
+async def run_router(calls: list):
+    provider = FakeProvider()
+    router = LLMRouter({"fake": provider}, default_route=["fake:gpt-4o"])
+    for prompt_name, system_prompt, user_prompt in calls:
+        if prompt_name == "update_form":
+            await router.handle_message(user_prompt, UpdateFormLLMOutput, system_prompt=system_prompt, prompt_name=prompt_name)
+        else:
+            async for _ in router.stream_message(user_prompt, system_prompt=system_prompt, prompt_name=prompt_name):
+                pass
+    print("\nRecorded by the router (fake provider, system prompts cached once seen):")
+    for line in REGISTRY.exposition().splitlines():
+        if line.startswith("openai_tokens_total") and 'kind="output"' not in line:
+            print(f"  {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=5, help="Simulated conversations, interleaved turn by turn")
+    parser.add_argument("--turns", type=int, default=10, help="Turns per conversation")
+    args = parser.parse_args()
+
+    prompt_registry.load_all()
+    template = make_template()
+    for label, layout in (("previous layout (one user message)", previous_layout), ("current layout (stable system prompt first)", current_layout)):
+        conversations = [conversation_calls(template, c, args.turns, layout) for c in range(args.conversations)]
+        # Interleave the conversations, as concurrent chats hit the API
+        calls = [call for turn_calls in zip(*conversations) for call in turn_calls]
+        report(label, measure(calls))
+    asyncio.run(run_router(calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Replays labelled user messages through the extraction gate and
+reports its skip rate and false negatives (messages it would skip
+although they should update the form).
+
+Each line of the replay set is a JSON object:
+
+    {"message": "...", "field_types": ["string", "email", ...], "expects_update": true}
+
+`field_types` are the `FieldType` values of the form's template. The
+bundled set (benchmarks/data/extraction_gate_replay.jsonl) is small and
+hand-labelled; grow it with the messages that the
+"Extraction gate false negative" warnings point at in shadow mode.
+
+Usage:
+    python -m benchmarks.eval_extraction_gate [--replay path.jsonl] [--verbose]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+os.environ.setdefault("OPENAI_KEY", "bench")
+os.environ.setdefault("AIRTABLE_API_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret")
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.db.models.field_template import FieldType
+from app.services.extraction_gate import classify
+
+DEFAULT_REPLAY = os.path.join(os.path.dirname(__file__), "data", "extraction_gate_replay.jsonl")
+
+
+def load_replay(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replay", default=DEFAULT_REPLAY, help="JSONL replay set")
+    parser.add_argument("--verbose", action="store_true", help="Print every decision")
+    args = parser.parse_args()
+
+    rows = load_replay(args.replay)
+    reasons = Counter()
+    skipped = false_negatives = missed_skips = 0
+    start = time.perf_counter()
+    for row in rows:
+        decision = classify(row["message"], [FieldType(value) for value in row["field_types"]])
+        reasons[("extract" if decision.extract else "skip", decision.reason)] += 1
+        if not decision.extract:
+            skipped += 1
+            if row["expects_update"]:
+                false_negatives += 1
+                print(f"FALSE NEGATIVE ({decision.reason}): {row['message']!r}")
+        elif not row["expects_update"]:
+            missed_skips += 1
+            if args.verbose:
+                print(f"extracted needlessly ({decision.reason}): {row['message']!r}")
+        if args.verbose and not decision.extract:
+            print(f"skip ({decision.reason}): {row['message']!r}")
+    per_message = (time.perf_counter() - start) / max(len(rows), 1)
+
+    no_update = sum(1 for row in rows if not row["expects_update"])
+    print(f"\nmessages:          {len(rows)} ({no_update} without form data)")
+    print(f"skip rate:         {skipped / len(rows):.1%} of all messages, "
+          f"{(no_update - missed_skips) / max(no_update, 1):.1%} of those without form data")
+    print(f"false negatives:   {false_negatives} ({false_negatives / max(len(rows) - no_update, 1):.1%} of messages with form data)")
+    print(f"classifier cost:   {per_message * 1e6:.1f} us/message")
+    print("\ndecisions by reason:")
+    for (decision, reason), count in sorted(reasons.items()):
+        print(f"  {decision:<8} {reason:<18} {count}")
+
+
+if __name__ == "__main__":
+    main()
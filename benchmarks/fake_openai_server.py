@@ -0,0 +1,162 @@
+"""
+Fake OpenAI Responses API for exercising the LLM router (and its
+resilience policy, app/services/llm_resilience.py) without OpenAI.
+
+Serves `POST /v1/responses`, plain or streamed (`"stream": true`). The
+output is a minimal JSON document matching the request's schema
+(`text.format.schema`: strings are "fake", arrays empty...), or plain
+text for unstructured requests. Usage reports the system prompt as
+cached input once it has been seen, like OpenAI's prompt caching of
+repeated prefixes. Every request first sleeps for
+`latency` seconds (+/- `jitter`), or `slow_latency` for a `slow_rate`
+share of requests, then fails with `error_status` for an `error_rate`
+share of them.
+
+The fault settings can be changed while running:
+
+    curl -X POST localhost:8900/_faults -d '{"error_rate": 1.0}'
+
+Usage:
+    python -m benchmarks.fake_openai_server --port 8900 --latency 0.3 --slow-rate 0.05 --error-rate 0.1
+    # then point the app at it:
+    OPENAI_BASE_URL=http://localhost:8900/v1 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, asdict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.llm_providers import fake_instance
+
+
+@dataclass
+class Faults:
+    latency: float = 0.3
+    jitter: float = 0.1
+    slow_rate: float = 0.0
+    slow_latency: float = 5.0
+    error_rate: float = 0.0
+    error_status: int = 500
+
+
+def response_body(model: str, text: str, input_tokens: int, cached_tokens: int = 0) -> dict:
+    output_tokens = max(1, len(text) // 4)
+    return {
+        "id": f"resp_{random.getrandbits(48):x}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": f"msg_{random.getrandbits(48):x}",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}]
+        }],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": cached_tokens},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens
+        }
+    }
+
+
+def create_app(faults: Faults = None) -> FastAPI:
+    app = FastAPI()
+    app.state.faults = faults or Faults()
+    app.state.requests = 0
+    # System prompts seen so far, to report them as cached input
+    app.state.prefixes = set()
+
+    @app.post("/_faults")
+    async def set_faults(request: Request):
+        for name, value in (await request.json()).items():
+            setattr(app.state.faults, name, value)
+        return asdict(app.state.faults)
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        faults = app.state.faults
+        app.state.requests += 1
+        body = await request.json()
+
+        if random.random() < faults.slow_rate:
+            await asyncio.sleep(faults.slow_latency)
+        else:
+            await asyncio.sleep(max(0.0, faults.latency + random.uniform(-faults.jitter, faults.jitter)))
+        if random.random() < faults.error_rate:
+            return JSONResponse(
+                status_code=faults.error_status,
+                content={"error": {"message": "Injected failure", "type": "server_error", "code": None, "param": None}}
+            )
+
+        text_format = body.get("text", {}).get("format", {})
+        if text_format.get("type") == "json_schema":
+            text = json.dumps(fake_instance(text_format["schema"]))
+        else:
+            text = "Thanks! Could you tell me a bit more about your project?"
+        items = body.get("input", [])
+        input_tokens = sum(len(str(item.get("content", ""))) for item in items) // 4
+        system_prompt = next((str(item.get("content", "")) for item in items if item.get("role") == "system"), "")
+        cached_tokens = len(system_prompt) // 4 if system_prompt in app.state.prefixes else 0
+        app.state.prefixes.add(system_prompt)
+        result = response_body(body.get("model", "gpt-4o"), text, input_tokens, cached_tokens)
+        if not body.get("stream"):
+            return result
+
+        async def events():
+            sequence = 0
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                delta = word if i == len(words) - 1 else word + " "
+                data = {
+                    "type": "response.output_text.delta", "delta": delta, "item_id": result["output"][0]["id"],
+                    "output_index": 0, "content_index": 0, "logprobs": [], "sequence_number": sequence
+                }
+                sequence += 1
+                yield f"event: response.output_text.delta\ndata: {json.dumps(data)}\n\n"
+                await asyncio.sleep(0.005)
+            data = {"type": "response.completed", "response": result, "sequence_number": sequence}
+            yield f"event: response.completed\ndata: {json.dumps(data)}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.3, help="Typical latency per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests taking --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with --error-status")
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+
+    import uvicorn
+    faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status
+    )
+    uvicorn.run(create_app(faults), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Shared fixtures: the FastAPI app on a throwaway SQLite database
+(aiosqlite), seeded with one user, form template and conversation,
+and an httpx client calling the app in-process. LLM calls go to
+whatever `app.state.openai_client` the test sets (`router` by
+default: `LLMRouter` over `FakeProvider`).
+"""
+import os
+import sys
+import tempfile
+
+# Settings are read at import time
+_tmp_dir = tempfile.mkdtemp(prefix="cfci_tests_")
+os.environ.setdefault("OPENAI_KEY", "test")
+os.environ.setdefault("AIRTABLE_API_KEY", "test")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ["POSTGRES_URL"] = f"sqlite:///{_tmp_dir}/test.db"
+os.environ["ANTHROPIC_API_KEY"] = ""
+os.environ["GEMINI_API_KEY"] = ""
+# Tests make many turns as one user
+os.environ["CHAT_USER_TURN_BURST"] = "1000"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.main import app
+from app.core.jwt import create_access_token
+from app.db.database import Base, async_engine, AsyncSessionLocal
+from app.db.models import User, FormTemplate, FieldTemplate, Form, Conversation
+from app.db.models.field_template import FieldType
+from app.services.admission import turn_admission
+from app.services.conversation_history_cache import conversation_history_cache
+from app.services.form_template_cache import form_template_cache
+from app.services.in_flight_turns import in_flight_turns
+from app.services.llm_providers import FakeProvider
+from app.services.llm_router import LLMRouter
+from app.services.principal_cache import principal_cache
+from app.utils.prompt_registry import prompt_registry
+
+FIELDS = [
+    ("Business/Org Title", "The name of the client's business or organization."),
+    ("Project Summary", "A few sentences describing the proposed project."),
+]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def prompts():
+    prompt_registry.load_all()
+
+
+@pytest.fixture
+async def database():
+    # Per-process state that would otherwise leak between tests
+    in_flight_turns._turns.clear()
+    turn_admission._buckets.clear()
+    conversation_history_cache.clear()
+    form_template_cache.clear()
+    principal_cache.clear()
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    # Pooled aiosqlite connections belong to this test's event loop
+    await async_engine.dispose()
+
+
+@pytest.fixture
+async def conversation(database):
+    """
+    A user, a two-field form template and an empty conversation;
+    `headers` authenticate as the user.
+    """
+    async with AsyncSessionLocal() as db:
+        user = User(email="client@example.com", firstname="Test", lastname="Client", hashed_password="x")
+        form_template = FormTemplate(name="Client intake")
+        db.add_all([user, form_template])
+        await db.flush()
+        db.add_all([
+            FieldTemplate(name=name, field_type=FieldType.STRING, description=description, form_template_id=form_template.id)
+            for name, description in FIELDS
+        ])
+        form = Form(user_id=user.id, form_template_id=form_template.id)
+        conv = Conversation(title="Test chat", user_id=user.id, form=form)
+        db.add(conv)
+        await db.commit()
+        token = create_access_token({"user_id": user.id, "email": user.email})
+        return SimpleNamespace(
+            id=conv.id, user_id=user.id, form_id=form.id, form_template_id=form_template.id,
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+
+class RecordingProvider(FakeProvider):
+    """
+    `FakeProvider` that also keeps each call's
+    (model, system_prompt, user_prompt).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.prompts = []
+
+    async def parse(self, model: str, system_prompt: str, user_prompt: str, response_format):
+        self.prompts.append((model, system_prompt, user_prompt))
+        return await super().parse(model, system_prompt, user_prompt, response_format)
+
+    async def stream(self, model: str, system_prompt: str, user_prompt: str):
+        self.prompts.append((model, system_prompt, user_prompt))
+        async for event in super().stream(model, system_prompt, user_prompt):
+            yield event
+
+
+@pytest.fixture
+def provider():
+    return RecordingProvider()
+
+
+@pytest.fixture
+def router(provider):
+    router = LLMRouter({"fake": provider}, default_route=["fake:gpt-4o"])
+    app.state.openai_client = router
+    return router
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def advance(client, conversation):
+    """
+    Post one turn of `conversation` to `/api/chat/advance` (or its
+    SSE variant) and return the response.
+    """
+    async def advance(step: int, message: str = "We are Acme Robotics.", stream: bool = False):
+        return await client.post(
+            "/api/chat/advance/stream" if stream else "/api/chat/advance",
+            json={"conversation_id": conversation.id, "user_message": message, "message_step_num": step},
+            headers=conversation.headers
+        )
+    return advance
@@ -0,0 +1,100 @@
+"""
+Token counting and the token-budgeted `{{CHAT_HISTORY}}` each prompt
+renders: the newest messages that fit, after the rolling summary.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import app.services.chat_history as chat_history
+from app.core.config import get_settings
+from app.services.chat_history import CHARS_PER_TOKEN, HistoryLine, TokenCounter, render_chat_history, token_counter
+
+
+class WordEncoding:
+    """
+    Stands in for a tiktoken encoding: one token per word.
+    """
+
+    def encode(self, text: str, disallowed_special=()):
+        return text.split(" ")
+
+    def decode(self, tokens) -> str:
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def words(monkeypatch):
+    """
+    Count the shared `token_counter` in words, so budgets are exact.
+    """
+    monkeypatch.setattr(token_counter, "_encoding", WordEncoding())
+    monkeypatch.setattr(token_counter, "_loaded", True)
+
+
+def line(message_num: int, content: str, sender: str = "user") -> HistoryLine:
+    return HistoryLine(SimpleNamespace(message_num=message_num, sender=sender, content=content))
+
+
+def test_counter_uses_the_model_encoding(monkeypatch):
+    monkeypatch.setattr(chat_history.tiktoken, "encoding_for_model", lambda model: WordEncoding())
+    counter = TokenCounter()
+
+    assert counter.count("four words in here") == 4
+    assert counter.truncate("four words in here", 2) == "four words"
+
+
+def test_counter_estimates_when_the_encoding_cannot_load(monkeypatch, caplog):
+    def unavailable(model):
+        raise OSError("no network")
+    monkeypatch.setattr(chat_history.tiktoken, "encoding_for_model", unavailable)
+    counter = TokenCounter()
+
+    assert counter.load() is None
+    assert counter.count("x" * 9) == -(-9 // CHARS_PER_TOKEN)
+    assert counter.truncate("x" * 100, 2) == "x" * 2 * CHARS_PER_TOKEN
+    assert "estimating tokens from length" in caplog.text
+
+
+def test_history_keeps_the_newest_lines_that_fit(words):
+    lines = [line(1, "one two three"), line(2, "four five six", "agent"), line(3, "seven eight")]
+
+    # "User: seven eight\n" is 3 tokens, "Agent: four five six\n" 4
+    assert render_chat_history(lines, 7, "update_form") == "Agent: four five six\nUser: seven eight\n"
+    assert render_chat_history(lines, 100, "update_form") == "User: one two three\nAgent: four five six\nUser: seven eight\n"
+
+
+def test_newest_line_is_truncated_rather_than_dropped(words):
+    lines = [line(1, "older"), line(2, "a b c d e f g h")]
+
+    assert render_chat_history(lines, 3, "update_form") == "User: a b\n"
+
+
+def test_summary_comes_first_and_counts_against_the_budget(words):
+    lines = [line(5, "one two"), line(6, "three four", "agent")]
+
+    rendered = render_chat_history(lines, 20, "generate_response", summary="They run Acme.")
+
+    assert rendered.startswith("Summary of the earlier conversation:\nThey run Acme.\n\nMost recent messages:\n")
+    assert rendered.endswith("User: one two\nAgent: three four\n")
+
+
+def test_long_summary_is_capped_at_half_the_budget(words):
+    summary = " ".join(["word"] * 100)
+
+    rendered = render_chat_history([line(5, "latest")], 40, "generate_response", summary=summary)
+
+    assert token_counter.count(rendered.split("\n\nMost recent messages:\n")[0]) <= 20
+    assert rendered.endswith("Most recent messages:\nUser: latest\n")
+
+
+async def test_turn_prompt_history_fits_its_budget(router, provider, conversation, advance, monkeypatch, words):
+    monkeypatch.setattr(get_settings(), "chat_history_tokens_update_form", 12)
+    await advance(1, "We are Acme Robotics in Durham.")
+    provider.prompts.clear()
+
+    await advance(3, "Our project is a warehouse robot.")
+
+    update_form_prompt = next(user_prompt for _, system_prompt, user_prompt in provider.prompts if "Current value:" in user_prompt and "Template field ID" in user_prompt)
+    assert "User: Our project is a warehouse robot." in update_form_prompt
+    assert "We are Acme Robotics in Durham." not in update_form_prompt
@@ -0,0 +1,286 @@
+"""
+Chat turns end to end through `/api/chat/advance` and its SSE variant.
+"""
+import asyncio
+import json
+
+from sqlalchemy import event, select
+
+from app.core.config import get_settings
+from app.db.database import AsyncSessionLocal, async_engine
+from app.db.models import FieldSubmission, Message
+from app.main import app
+from app.schemas.openai_schemas import DefaultLLMOutput, FieldToUpdate, UpdateFormLLMOutput
+from app.services.admission import turn_admission
+from app.services.in_flight_turns import in_flight_turns
+from app.services.llm_providers import FakeProvider
+from app.services.llm_resilience import LLMResponseError
+from app.services.llm_response_cache import LLMResponseCache, MemoryBackend
+from app.services.llm_router import LLMRouter
+
+
+async def stored_messages(conversation_id: int) -> list:
+    async with AsyncSessionLocal() as db:
+        return [
+            (message.message_num, message.sender, message.content)
+            for message in (await db.execute(
+                select(Message).where(Message.conversation_id == conversation_id).order_by(Message.message_num, Message.id)
+            )).scalars().all()
+        ]
+
+
+def sse_events(body: str) -> list:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def test_turn_stores_user_and_agent_messages(router, provider, conversation, advance):
+    response = await advance(1)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["message_num"] == 2 and body["sender"] == "agent"
+    assert await stored_messages(conversation.id) == [
+        (1, "user", "We are Acme Robotics."),
+        (2, "agent", body["content"]),
+    ]
+    assert len(provider.calls) == 2  # update_form, generate_response
+
+
+class OneUpdateLLM:
+    """
+    Stands in for `LLMRouter`: LLM call 1 sets the organization's name,
+    LLM call 2 replies (or raises, with `fail_reply`).
+    """
+
+    def __init__(self, fail_reply: bool = False):
+        self.fail_reply = fail_reply
+
+    async def handle_message(self, user_prompt: str, response_format=DefaultLLMOutput, system_prompt: str = "", **kwargs):
+        if response_format is UpdateFormLLMOutput:
+            return {"input message": user_prompt, "response": UpdateFormLLMOutput(fields_to_update=[FieldToUpdate(
+                type="create", template_field_id="1", field_name="Business/Org Title",
+                new_value="Acme Robotics", confidence=0.9, reasoning="Named by the user."
+            )])}
+        if self.fail_reply:
+            raise RuntimeError("reply failed")
+        return {"input message": user_prompt, "response": DefaultLLMOutput(output_text="What does Acme build?")}
+
+
+async def stored_values(form_id: int) -> list:
+    async with AsyncSessionLocal() as db:
+        return list((await db.execute(select(FieldSubmission.value).where(FieldSubmission.form_id == form_id))).scalars())
+
+
+async def test_turn_commits_twice(conversation, advance):
+    app.state.openai_client = OneUpdateLLM()
+    commits = []
+    listener = lambda conn: commits.append(conn)
+    event.listen(async_engine.sync_engine, "commit", listener)
+    try:
+        response = await advance(1)
+    finally:
+        event.remove(async_engine.sync_engine, "commit", listener)
+
+    assert response.status_code == 200
+    # The user message, then the field update with the agent message
+    assert len(commits) == 2
+    assert await stored_values(conversation.form_id) == ["Acme Robotics"]
+
+
+async def test_field_updates_are_stored_with_the_reply(conversation, advance):
+    app.state.openai_client = OneUpdateLLM(fail_reply=True)
+
+    response = await advance(1)
+
+    assert response.status_code == 500
+    assert await stored_messages(conversation.id) == [(1, "user", "We are Acme Robotics.")]
+    assert await stored_values(conversation.form_id) == []
+
+
+async def test_retried_step_replays_stored_reply(router, provider, conversation, advance):
+    first = await advance(1)
+    calls = len(provider.calls)
+
+    retry = await advance(1)
+
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert len(provider.calls) == calls
+    assert len(await stored_messages(conversation.id)) == 2
+
+
+async def test_retried_stream_step_replays_stored_reply(router, provider, conversation, advance):
+    first = await advance(1)
+    calls = len(provider.calls)
+
+    retry = await advance(1, stream=True)
+
+    assert [event for event, _ in sse_events(retry.text)] == ["token", "done"]
+    assert sse_events(retry.text)[1][1] == first.json()
+    assert len(provider.calls) == calls
+
+
+async def test_concurrent_retry_waits_for_original(router, provider, conversation, advance):
+    provider.latency = 0.05
+
+    original, retry = await asyncio.gather(advance(1), advance(1))
+
+    assert original.status_code == retry.status_code == 200
+    assert original.json() == retry.json()
+    assert len(provider.calls) == 2
+    assert len(await stored_messages(conversation.id)) == 2
+
+
+async def test_retry_stops_waiting_for_stuck_original(router, conversation, advance, monkeypatch):
+    monkeypatch.setattr(get_settings(), "chat_turn_retry_wait_seconds", 0.05)
+    key = (conversation.id, 1)
+    in_flight_turns.start(key)
+    try:
+        response = await advance(1)
+    finally:
+        in_flight_turns.finish(key)
+
+    assert response.status_code == 409
+    assert "Retry-After" in response.headers
+
+
+class SlowFirstTurnLLM(OneUpdateLLM):
+    """
+    `OneUpdateLLM` whose first call takes `delay` seconds; keeps each
+    call's user prompt.
+    """
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.prompts = []
+
+    async def handle_message(self, user_prompt: str, response_format=DefaultLLMOutput, system_prompt: str = "", **kwargs):
+        self.prompts.append(user_prompt)
+        if len(self.prompts) == 1:
+            await asyncio.sleep(self.delay)
+        return await super().handle_message(user_prompt, response_format, system_prompt, **kwargs)
+
+
+async def test_queued_turn_sees_the_form_the_turn_ahead_left(conversation, advance):
+    llm = app.state.openai_client = SlowFirstTurnLLM(delay=0.1)
+    first = asyncio.create_task(advance(1))
+    while not turn_admission.conversation_lock(conversation.id).locked():
+        await asyncio.sleep(0.005)
+
+    second = await advance(3, "Our project is a warehouse robot.")
+
+    assert (await first).status_code == second.status_code == 200
+    # LLM call 1 of the second turn
+    assert "Current value: Acme Robotics" in llm.prompts[2]
+
+
+async def test_replays_are_not_charged_to_the_rate_limit(router, provider, conversation, advance, monkeypatch):
+    monkeypatch.setattr(turn_admission, "burst", 1)
+    first = await advance(1)
+
+    retry = await advance(1)
+    next_step = await advance(3, "Our project is a warehouse robot.")
+
+    assert first.status_code == retry.status_code == 200
+    assert next_step.status_code == 429 and "Retry-After" in next_step.headers
+    # The rejected turn's message is not stored
+    assert [message[:2] for message in await stored_messages(conversation.id)] == [(1, "user"), (2, "agent")]
+
+
+async def call_stream_and_disconnect(conversation, step: int):
+    """
+    Call the SSE endpoint as an ASGI server would, with a client that
+    is gone before the response starts (sending its headers fails).
+    """
+    body = json.dumps({"conversation_id": conversation.id, "user_message": "We are Acme Robotics.", "message_step_num": step}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat/advance/stream",
+        "raw_path": b"/api/chat/advance/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"test"),
+            (b"content-type", b"application/json"),
+            (b"authorization", conversation.headers["Authorization"].encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            raise OSError("client disconnected")
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        pass
+
+
+async def test_stream_releases_turn_when_client_disconnects_before_start(router, provider, conversation, advance):
+    await call_stream_and_disconnect(conversation, 1)
+
+    assert in_flight_turns.get((conversation.id, 1)) is None
+    assert not turn_admission.conversation_lock(conversation.id).locked()
+    # Neither a retry of the step nor the next step is turned away
+    retry = await asyncio.wait_for(advance(1), timeout=5)
+    assert retry.status_code == 200
+    assert (await advance(3, "Our project is a warehouse robot.")).status_code == 200
+
+
+class BrokenStreamProvider(FakeProvider):
+    """
+    Streams the first word of its reply, then fails as a response cut
+    short would.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.broken = True
+
+    async def stream(self, model: str, system_prompt: str, user_prompt: str):
+        if not self.broken:
+            async for event in super().stream(model, system_prompt, user_prompt):
+                yield event
+            return
+        self.calls.append(model)
+        yield "Partial "
+        raise LLMResponseError("fake: response incomplete (max_output_tokens)")
+
+
+async def test_failed_stream_is_not_stored_or_cached(conversation, advance):
+    provider = BrokenStreamProvider()
+    cache = LLMResponseCache(MemoryBackend())
+    app.state.openai_client = LLMRouter({"fake": provider}, default_route=["fake:gpt-4o"], cache=cache)
+
+    response = await advance(1, stream=True)
+
+    events = sse_events(response.text)
+    assert [event for event, _ in events] == ["token", "error"]
+    assert await stored_messages(conversation.id) == [(1, "user", "We are Acme Robotics.")]
+
+    # The retry gets (and stores) a complete reply, not the partial one
+    provider.broken = False
+    retry = await advance(1, stream=True)
+
+    events = sse_events(retry.text)
+    assert events[-1][0] == "done"
+    reply = events[-1][1]["content"]
+    assert reply.startswith("Thanks!") and "".join(data["delta"] for event, data in events if event == "token") == reply
+    assert await stored_messages(conversation.id) == [(1, "user", "We are Acme Robotics."), (2, "agent", reply)]
@@ -0,0 +1,137 @@
+"""
+Per-conversation history: the cache a turn appends to, the rolling
+summary older messages are folded into, and the cut-off a rebuild
+from the database applies.
+"""
+from types import SimpleNamespace
+
+from sqlalchemy import select, update
+
+from app.db.database import AsyncSessionLocal, async_engine
+from app.db.models import Conversation, Message
+from app.schemas.openai_schemas import DefaultLLMOutput
+from app.services.chat_history import HistoryLine
+from app.services.conversation_history_cache import ConversationHistoryCache, conversation_history_cache
+from app.services.conversation_summary import ConversationSummarizer
+
+
+def lines(*message_nums: int) -> list:
+    return [
+        HistoryLine(SimpleNamespace(message_num=num, sender="user" if num % 2 else "agent", content=f"message {num}"))
+        for num in message_nums
+    ]
+
+
+def nums(history) -> list:
+    return None if history is None else [line.message_num for line in history]
+
+
+def test_cache_hit_only_when_the_turn_continues_the_entry():
+    cache = ConversationHistoryCache()
+    assert cache.get(1, 0, 3) is None
+    cache.put(1, 0, 2, lines(1, 2))
+
+    assert nums(cache.get(1, 0, 3)) == [1, 2]
+    # A turn missed by this process (or a retry of an older step)
+    assert cache.get(1, 0, 5) is None
+    assert cache.get(1, 0, 1) is None
+
+
+def test_cache_follows_the_summary_forward_but_not_back():
+    cache = ConversationHistoryCache()
+    cache.put(1, 2, 6, lines(3, 4, 5, 6))
+
+    assert nums(cache.get(1, 4, 7)) == [5, 6]
+    assert cache.get(1, 0, 7) is None
+
+
+def test_cache_keeps_the_newest_max_lines():
+    cache = ConversationHistoryCache(max_lines=3)
+    cache.put(1, 0, 6, lines(1, 2, 3, 4, 5, 6))
+
+    assert nums(cache.get(1, 0, 7)) == [4, 5, 6]
+
+
+async def seed_messages(conversation, count: int, summary: str = None, summary_through: int = 0):
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            Message(
+                sender="user" if num % 2 else "agent", message_num=num, content=f"message {num}",
+                user_id=conversation.user_id, conversation_id=conversation.id
+            ) for num in range(1, count + 1)
+        ])
+        await db.execute(
+            update(Conversation).where(Conversation.id == conversation.id)
+            .values(summary=summary, summary_through_message_num=summary_through)
+        )
+        await db.commit()
+
+
+async def stored_summary(conversation_id: int):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(Conversation.summary, Conversation.summary_through_message_num).where(Conversation.id == conversation_id)
+        )).one()
+
+
+class SummaryLLM:
+    def __init__(self, during_call=None):
+        self.prompts = []
+        self.during_call = during_call
+
+    async def handle_message(self, user_prompt: str, response_format=DefaultLLMOutput, system_prompt: str = "", **kwargs):
+        self.prompts.append((user_prompt, kwargs))
+        if self.during_call is not None:
+            await self.during_call()
+        return {"input message": user_prompt, "response": DefaultLLMOutput(output_text="New summary.")}
+
+
+async def test_summary_folds_older_messages_only(conversation):
+    await seed_messages(conversation, 10, summary="Old summary.", summary_through=2)
+    llm = SummaryLLM()
+
+    await ConversationSummarizer(refresh_messages=4, keep_recent=3).refresh(conversation.id, llm, async_engine)
+
+    assert tuple(await stored_summary(conversation.id)) == ("New summary.", 7)
+    [(prompt, kwargs)] = llm.prompts
+    assert "Old summary." in prompt
+    assert [f"message {num}" in prompt for num in range(1, 11)] == [False] * 2 + [True] * 5 + [False] * 3
+    assert kwargs["use_cache"] is False
+
+
+async def test_summary_waits_until_enough_messages_pile_up(conversation):
+    await seed_messages(conversation, 6)
+    llm = SummaryLLM()
+
+    await ConversationSummarizer(refresh_messages=4, keep_recent=3).refresh(conversation.id, llm, async_engine)
+
+    assert llm.prompts == []
+    assert tuple(await stored_summary(conversation.id)) == (None, 0)
+
+
+async def test_summary_refresh_loses_to_a_concurrent_one(conversation):
+    await seed_messages(conversation, 10)
+
+    async def concurrent_refresh():
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Conversation).where(Conversation.id == conversation.id).values(summary="Theirs.", summary_through_message_num=5))
+            await db.commit()
+
+    await ConversationSummarizer(refresh_messages=4, keep_recent=3).refresh(conversation.id, SummaryLLM(concurrent_refresh), async_engine)
+
+    assert tuple(await stored_summary(conversation.id)) == ("Theirs.", 5)
+
+
+async def test_rebuilt_history_starts_after_the_summary(router, provider, conversation, advance):
+    await seed_messages(conversation, 6, summary="They run Acme Robotics.", summary_through=4)
+    conversation_history_cache.clear()
+
+    response = await advance(7, "It's a warehouse robot.")
+
+    assert response.status_code == 200
+    reply_prompt = provider.prompts[-1][2]
+    assert "They run Acme Robotics." in reply_prompt
+    assert "message 5" in reply_prompt and "message 6" in reply_prompt
+    assert not any(f"message {num}\n" in reply_prompt for num in range(1, 5))
+    # The turn leaves a cache entry the next turn continues
+    assert nums(conversation_history_cache.get(conversation.id, 4, 9)) == [5, 6, 7, 8]
@@ -0,0 +1,68 @@
+"""
+`extraction_gate.classify`: which user messages may skip LLM call 1
+(`update_form`), and a turn the gate skips making only the reply call.
+"""
+import pytest
+
+from app.core.config import get_settings
+from app.db.models.field_template import FieldType
+from app.services.extraction_gate import classify
+
+ALL_TYPES = list(FieldType)
+
+
+@pytest.mark.parametrize("message, reason", [
+    ("We are Acme Robotics.", "statement"),
+    ("Our budget is about $40k", "statement"),
+    ("yes", "statement"),
+    ("Can we start in March?", "first_person"),
+    ("Ok. We're based in Durham.", "statement"),
+    ("ok thanks, the name is Acme", "statement"),
+    ("42", "no_words"),
+])
+def test_messages_that_must_extract(message, reason):
+    decision = classify(message, ALL_TYPES)
+
+    assert (decision.extract, decision.reason) == (True, reason)
+
+
+@pytest.mark.parametrize("message, reason", [
+    ("ok", "acknowledgement"),
+    ("Okay, thanks!", "acknowledgement"),
+    ("Got it.", "acknowledgement"),
+    ("What does CFCI do?", "question"),
+    ("How long does this take? Who reviews it?", "question"),
+])
+def test_messages_that_may_skip(message, reason):
+    decision = classify(message, ALL_TYPES)
+
+    assert (decision.extract, decision.reason) == (False, reason)
+
+
+@pytest.mark.parametrize("question, field_type", [
+    ("Is dana@acme.io the right contact?", FieldType.EMAIL),
+    ("Is 919-555-0143 ok?", FieldType.PHONE),
+    ("What about next month?", FieldType.DATE),
+    ("Does 300 people count as large?", FieldType.INTEGER),
+    ("Is 12 Main Street close enough?", FieldType.ADDRESS),
+])
+def test_question_with_a_value_extracts_only_for_its_field_type(question, field_type):
+    assert classify(question, [FieldType.STRING]).extract is False
+
+    decision = classify(question, [FieldType.STRING, field_type])
+
+    assert (decision.extract, decision.reason) == (True, f"{field_type.value}_signal")
+
+
+def test_form_without_fields_never_extracts():
+    assert classify("We are Acme Robotics.", []).reason == "no_fields"
+
+
+@pytest.mark.parametrize("mode, calls", [("on", 1), ("shadow", 2), ("off", 2)])
+async def test_skipped_turn_makes_one_provider_call(router, provider, advance, monkeypatch, mode, calls):
+    monkeypatch.setattr(get_settings(), "extraction_gate_mode", mode)
+
+    response = await advance(1, "Thanks!")
+
+    assert response.status_code == 200
+    assert len(provider.calls) == calls
@@ -0,0 +1,81 @@
+"""
+Field updates written with one `INSERT ... ON CONFLICT DO UPDATE`
+(`dialect_insert`, here on SQLite): one row per form field, holding the
+latest value.
+"""
+import asyncio
+
+from sqlalchemy import select
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import FieldSubmission
+from app.db.models.field_submission import FieldStatus
+from app.schemas.openai_schemas import FieldToUpdate
+from app.services.field_submission_service import normalize_field_updates, upsert_field_submissions
+
+
+def update(value: str, type: str = "create", template_field_id: str = "1", confidence: float = 0.8) -> FieldToUpdate:
+    return FieldToUpdate(
+        type=type, template_field_id=template_field_id, field_name="Business/Org Title",
+        new_value=value, confidence=confidence, reasoning=""
+    )
+
+
+async def upsert(form_id: int, updates: dict):
+    async with AsyncSessionLocal() as db:
+        written = await upsert_field_submissions(db, form_id, updates)
+        await db.commit()
+        return [(submission.field_template_id, submission.value) for submission in written]
+
+
+async def stored(form_id: int) -> list:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(FieldSubmission.field_template_id, FieldSubmission.value, FieldSubmission.status, FieldSubmission.llm_confidence)
+            .where(FieldSubmission.form_id == form_id)
+            .order_by(FieldSubmission.field_template_id)
+        )).all()
+
+
+async def test_upserting_a_field_twice_keeps_one_row(conversation):
+    assert await upsert(conversation.form_id, {1: update("Acme")}) == [(1, "Acme")]
+    assert await upsert(conversation.form_id, {1: update("Acme Robotics", type="update", confidence=0.95)}) == [(1, "Acme Robotics")]
+
+    assert await stored(conversation.form_id) == [(1, "Acme Robotics", FieldStatus.FINAL, 0.95)]
+
+
+async def test_one_statement_writes_several_fields(conversation):
+    await upsert(conversation.form_id, {1: update("Acme")})
+
+    written = await upsert(conversation.form_id, {1: update("Acme Robotics"), 2: update("A warehouse robot.", template_field_id="2")})
+
+    assert sorted(written) == [(1, "Acme Robotics"), (2, "A warehouse robot.")]
+    assert [(field_id, value) for field_id, value, _, _ in await stored(conversation.form_id)] == written
+
+
+async def test_concurrent_creates_do_not_duplicate(conversation):
+    await asyncio.gather(*(upsert(conversation.form_id, {1: update(f"Acme {i}")}) for i in range(5)))
+
+    rows = await stored(conversation.form_id)
+    assert len(rows) == 1 and rows[0].value.startswith("Acme ")
+
+
+async def test_upsert_refreshes_loaded_submission(conversation):
+    await upsert(conversation.form_id, {1: update("Acme")})
+    async with AsyncSessionLocal() as db:
+        loaded = (await db.execute(select(FieldSubmission).where(FieldSubmission.form_id == conversation.form_id))).scalars().one()
+
+        [written] = await upsert_field_submissions(db, conversation.form_id, {1: update("Acme Robotics", type="update")})
+
+        assert written is loaded
+        assert (loaded.value, loaded.status) == ("Acme Robotics", FieldStatus.FINAL)
+
+
+def test_normalize_keeps_last_update_per_field():
+    updates = normalize_field_updates(
+        [update("Acme"), update("Acme Robotics"), update("x", template_field_id="9"), update("y", template_field_id="one")],
+        valid_field_ids={1, 2}
+    )
+
+    assert list(updates) == [1]
+    assert updates[1].new_value == "Acme Robotics"
@@ -0,0 +1,144 @@
+"""
+Field values by type: the `normalize_*` parsers, `verify_field_updates`
+on LLM call 1's proposals, and `extract_locally`, which fills a field
+without LLM call 1 only when the message can mean nothing else.
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select, update as sql_update
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import FieldSubmission, FieldTemplate
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import FieldToUpdate
+from app.services.field_values import (
+    LOCAL_CONFIDENCE, UNVERIFIED_CONFIDENCE, extract_locally, normalize_boolean, normalize_date,
+    normalize_email, normalize_integer, normalize_phone, normalize_value, verify_field_updates
+)
+from app.services.form_state import FormState
+from app.services.form_template_cache import CompiledFormTemplate
+
+
+@pytest.mark.parametrize("normalize, value, expected", [
+    (normalize_email, "dana@acme.io", "dana@acme.io"),
+    (normalize_email, "Dana.Reyes@ACME.IO", "Dana.Reyes@acme.io"),
+    (normalize_email, "<priya@northwind.org>", "priya@northwind.org"),
+    (normalize_email, "mailto:sam@duke.edu", "sam@duke.edu"),
+    (normalize_email, "dana at acme dot io", None),
+    (normalize_phone, "(919) 555-0143", "+19195550143"),
+    (normalize_phone, "1-919-555-0143", "+19195550143"),
+    (normalize_phone, "+44 20 7946 0958", "+442079460958"),
+    (normalize_phone, "555-0143", None),
+    (normalize_phone, "call me at 919-555-0143", None),
+    (normalize_date, "03/15/2026", "2026-03-15"),
+    (normalize_date, "March 15th, 2026", "2026-03-15"),
+    (normalize_date, "15 March 2026", "2026-03-15"),
+    (normalize_date, "Sept 2026", "2026-09"),
+    (normalize_date, "next spring", None),
+    (normalize_date, "March 5", None),
+    (normalize_integer, "1,250", "1250"),
+    (normalize_integer, "$40k", "40000"),
+    (normalize_integer, "2.5 million", "2500000"),
+    (normalize_integer, "twelve", "12"),
+    (normalize_integer, "1.5", None),
+    (normalize_integer, "about 40", None),
+    (normalize_boolean, "Yep!", "Yes"),
+    (normalize_boolean, "not yet", "No"),
+    (normalize_boolean, "maybe", None),
+])
+def test_normalize(normalize, value, expected):
+    assert normalize(value) == expected
+
+
+def test_free_text_types_are_kept_as_is():
+    assert normalize_value(FieldType.STRING, " Acme ") == " Acme "
+    assert normalize_value(FieldType.ADDRESS, "12 Main St") == "12 Main St"
+
+
+def template(*field_types: FieldType) -> CompiledFormTemplate:
+    field_templates = [
+        SimpleNamespace(id=i, name=f"Field {i}", field_type=field_type, description="")
+        for i, field_type in enumerate(field_types, start=1)
+    ]
+    return CompiledFormTemplate(SimpleNamespace(id=1, name="Intake"), field_templates)
+
+
+def state(*field_types: FieldType, filled=()) -> FormState:
+    return FormState(template(*field_types), [SimpleNamespace(field_template_id=i, value="set") for i in filled])
+
+
+def proposed(field_template_id: int, value: str, confidence: float = 0.9) -> FieldToUpdate:
+    return FieldToUpdate(
+        type="create", template_field_id=str(field_template_id), field_name=f"Field {field_template_id}",
+        new_value=value, confidence=confidence, reasoning=""
+    )
+
+
+def test_llm_values_are_canonicalized_or_marked_unverified():
+    updates = {1: proposed(1, "(919) 555-0143"), 2: proposed(2, "sometime soon"), 3: proposed(3, "Acme")}
+
+    verified = verify_field_updates(updates, template(FieldType.PHONE, FieldType.DATE, FieldType.STRING))
+
+    assert (verified[1].new_value, verified[1].confidence) == ("+19195550143", 0.9)
+    assert (verified[2].new_value, verified[2].confidence) == ("sometime soon", UNVERIFIED_CONFIDENCE)
+    assert verified[3] is updates[3]
+
+
+@pytest.mark.parametrize("message, field_types, filled, field_id, value", [
+    ("dana@acme.io", (FieldType.EMAIL,), (), 1, "dana@acme.io"),
+    ("yes!", (FieldType.BOOLEAN,), (), 1, "Yes"),
+    ("03/15/2026.", (FieldType.DATE, FieldType.EMAIL), (), 1, "2026-03-15"),
+    ("(919) 555-0143", (FieldType.EMAIL, FieldType.PHONE), (), 2, "+19195550143"),
+    # Filled fields don't count, whatever their type
+    ("dana@acme.io", (FieldType.STRING, FieldType.EMAIL), (1,), 2, "dana@acme.io"),
+])
+def test_extract_locally_accepts(message, field_types, filled, field_id, value):
+    output = extract_locally(message, state(*field_types, filled=filled))
+
+    [field_update] = output.fields_to_update
+    assert (field_update.template_field_id, field_update.new_value) == (str(field_id), value)
+    assert field_update.confidence == LOCAL_CONFIDENCE
+
+
+@pytest.mark.parametrize("message, field_types, filled", [
+    # A free-text field is still missing
+    ("dana@acme.io", (FieldType.EMAIL, FieldType.STRING), ()),
+    ("42", (FieldType.INTEGER, FieldType.ADDRESS), ()),
+    # Parses as more than one missing field
+    ("2026", (FieldType.INTEGER, FieldType.INTEGER), ()),
+    # Parses as none of them
+    ("Acme Robotics", (FieldType.INTEGER, FieldType.DATE, FieldType.BOOLEAN), ()),
+    # Free text containing numbers or a value
+    ("we have about 40 employees", (FieldType.INTEGER, FieldType.DATE), ()),
+    ("my email is dana@acme.io", (FieldType.EMAIL, FieldType.PHONE), ()),
+    ("Starting 03/15/2026 with 12 people", (FieldType.DATE, FieldType.INTEGER), ()),
+    # Nothing left to fill
+    ("dana@acme.io", (FieldType.EMAIL,), (1,)),
+])
+def test_extract_locally_falls_through_to_the_llm(message, field_types, filled):
+    assert extract_locally(message, state(*field_types, filled=filled)) is None
+
+
+async def set_field_types(conversation, *field_types: FieldType):
+    async with AsyncSessionLocal() as db:
+        field_ids = (await db.execute(
+            select(FieldTemplate.id).where(FieldTemplate.form_template_id == conversation.form_template_id).order_by(FieldTemplate.id)
+        )).scalars().all()
+        for field_id, field_type in zip(field_ids, field_types):
+            await db.execute(sql_update(FieldTemplate).where(FieldTemplate.id == field_id).values(field_type=field_type))
+        await db.commit()
+        return field_ids
+
+
+async def test_local_value_is_stored_without_llm_call_1(router, provider, conversation, advance):
+    field_ids = await set_field_types(conversation, FieldType.EMAIL, FieldType.PHONE)
+
+    response = await advance(1, "(919) 555-0143")
+
+    assert response.status_code == 200
+    # Only the reply
+    assert len(provider.calls) == 1
+    async with AsyncSessionLocal() as db:
+        submission = (await db.execute(select(FieldSubmission).where(FieldSubmission.form_id == conversation.form_id))).scalar_one()
+    assert (submission.field_template_id, submission.value, submission.llm_confidence) == (field_ids[1], "+19195550143", LOCAL_CONFIDENCE)
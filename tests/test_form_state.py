@@ -0,0 +1,100 @@
+"""
+`FormState`: submission lookups, staged updates and the two form
+context variants rendered for the LLM prompts.
+"""
+from types import SimpleNamespace
+
+from app.db.models.field_template import FieldType
+from app.schemas.openai_schemas import FieldToUpdate
+from app.services.form_state import FORM_CONTEXT_HEADER, NO_FIELD_DEFINITIONS, FormState
+from app.services.form_template_cache import CompiledFormTemplate
+
+
+def template(num_fields: int = 3) -> CompiledFormTemplate:
+    field_templates = [
+        SimpleNamespace(id=i, name=f"Field {i}", field_type=FieldType.STRING, description=f"About field {i}.")
+        for i in range(1, num_fields + 1)
+    ]
+    return CompiledFormTemplate(SimpleNamespace(id=1, name="Intake"), field_templates)
+
+
+def submission(field_template_id: int, value: str):
+    return SimpleNamespace(field_template_id=field_template_id, value=value)
+
+
+def update(field_template_id: int, value: str) -> FieldToUpdate:
+    return FieldToUpdate(
+        type="update", template_field_id=str(field_template_id), field_name=f"Field {field_template_id}",
+        new_value=value, confidence=0.9, reasoning=""
+    )
+
+
+def test_render_both_variants():
+    state = FormState(template(2), [submission(2, "Second")])
+
+    with_ids, without_ids = state.render()
+
+    assert with_ids == (
+        FORM_CONTEXT_HEADER
+        + "Field name: Field 1\nTemplate field ID: 1\nCurrent value: NONE\n--\n"
+        + "Field name: Field 2\nTemplate field ID: 2\nCurrent value: Second\n--\n"
+    )
+    assert without_ids == (
+        FORM_CONTEXT_HEADER
+        + "Field name: Field 1\nCurrent value: NONE\n--\n"
+        + "Field name: Field 2\nCurrent value: Second\n--\n"
+    )
+    # Field definitions stay out of the form context
+    assert "About field" not in with_ids
+
+
+def test_staged_updates_show_before_they_are_stored():
+    state = FormState(template(), [submission(1, "Stored")])
+    before = state.render()
+
+    state.stage({1: update(1, "Staged"), 3: update(3, "New")})
+
+    assert (state.value(1), state.value(2), state.value(3)) == ("Staged", None, "New")
+    assert state.missing_field_ids() == [2]
+    assert state.render() != before
+    assert "Current value: Staged" in state.render()[1]
+
+
+def test_render_is_cached_until_a_change():
+    state = FormState(template())
+    first = state.render()
+
+    assert state.render() is first
+    state.stage({})
+    assert state.render() is first
+
+    state.add(submission(2, "Written"))
+    assert state.render() is not first
+    assert state.value(2) == "Written"
+
+
+def test_add_replaces_staged_update():
+    state = FormState(template())
+    state.stage({1: update(1, "Staged")})
+
+    state.add(submission(1, "Written"))
+
+    assert state.staged == {}
+    assert state.value(1) == "Written"
+
+
+def test_form_without_template():
+    state = FormState(None)
+
+    assert state.render() == (FORM_CONTEXT_HEADER, FORM_CONTEXT_HEADER)
+    assert state.definitions() == (NO_FIELD_DEFINITIONS, NO_FIELD_DEFINITIONS)
+    assert state.missing_field_ids() == []
+
+
+def test_large_form_renders_every_field_once():
+    state = FormState(template(1000), [submission(i, f"Value {i}") for i in range(1000, 0, -1)])
+
+    _, without_ids = state.render()
+
+    assert without_ids.count("Current value: ") == 1000
+    assert "Field name: Field 1000\nCurrent value: Value 1000\n" in without_ids
@@ -0,0 +1,57 @@
+"""
+`FormTemplateCache`: compiled templates are reused across turns and
+recompiled after admin field template writes.
+"""
+from app.db.database import AsyncSessionLocal
+from app.services.form_template_cache import form_template_cache
+
+
+async def compiled(form_template_id: int):
+    async with AsyncSessionLocal() as db:
+        return await form_template_cache.get(db, form_template_id)
+
+
+async def test_compiled_template_is_reused(conversation):
+    first = await compiled(conversation.form_template_id)
+
+    assert [field.name for field in first.fields] == ["Business/Org Title", "Project Summary"]
+    assert "Field name: Business/Org Title\nTemplate field ID: 1\nField data type: " in first.definitions_with_ids
+    assert await compiled(conversation.form_template_id) is first
+
+
+async def test_unknown_template_is_not_cached(database):
+    assert await compiled(404) is None
+
+
+async def test_field_template_create_and_delete_invalidate(client, conversation):
+    before = await compiled(conversation.form_template_id)
+
+    created = await client.post("/api/admin/field_templates", params={
+        "form_template_id": conversation.form_template_id, "name": "Budget",
+        "field_type": "integer", "description": "Total budget in dollars."
+    })
+    after_create = await compiled(conversation.form_template_id)
+
+    assert created.status_code == 200
+    assert after_create is not before
+    assert [field.name for field in after_create.fields] == ["Business/Org Title", "Project Summary", "Budget"]
+    assert "Field instructions: Total budget in dollars." in after_create.definitions_without_ids
+
+    deleted = await client.delete(f"/api/admin/field_templates/{created.json()['id']}")
+    after_delete = await compiled(conversation.form_template_id)
+
+    assert deleted.status_code == 200
+    assert [field.name for field in after_delete.fields] == ["Business/Org Title", "Project Summary"]
+
+
+async def test_next_turn_prompts_include_new_field(router, provider, client, conversation, advance):
+    await advance(1)
+    await client.post("/api/admin/field_templates", params={
+        "form_template_id": conversation.form_template_id, "name": "Budget",
+        "field_type": "integer", "description": "Total budget in dollars."
+    })
+    provider.prompts.clear()
+
+    await advance(3, "Our budget is 5000 dollars.")
+
+    assert provider.prompts and all("Field name: Budget" in system_prompt for _, system_prompt, _ in provider.prompts)
@@ -0,0 +1,144 @@
+"""
+`RequestInstrumentationMiddleware`: per-request latency by route
+template and phase, sampled JSON log lines, and the in-flight gauge
+held for the whole of a streamed response.
+"""
+import asyncio
+import io
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.core import instrumentation
+from app.core.instrumentation import (
+    HTTP_REQUEST_PHASE_SECONDS, HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT,
+    RequestInstrumentationMiddleware, RequestLogSink, request_logger
+)
+
+
+async def item(request: Request):
+    with instrumentation.phase("llm"):
+        await asyncio.sleep(0.01)
+    instrumentation.record_phase("db", 0.002, calls=2)
+    return JSONResponse({"id": request.path_params["item_id"]})
+
+
+async def broken():
+    return JSONResponse({"detail": "broken"}, status_code=503)
+
+
+gate = {}
+
+
+async def stream():
+    async def body():
+        yield b"first "
+        gate["in_flight"] = HTTP_REQUESTS_IN_FLIGHT._default().value
+        yield b"last"
+    return StreamingResponse(body())
+
+
+def build_app(**options):
+    app = FastAPI()
+    app.add_api_route("/items/{item_id}", item)
+    app.add_api_route("/broken", broken)
+    app.add_api_route("/stream", stream)
+    return RequestInstrumentationMiddleware(app, **options)
+
+
+@pytest.fixture
+def log_lines():
+    """
+    Returns the request log lines written so far in the test, as
+    dicts (stopping the writer thread, so call it once).
+    """
+    handlers = request_logger.handlers
+    output = io.StringIO()
+    sink = RequestLogSink(stream=output)
+    sink.start()
+
+    def read():
+        sink.stop()
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    yield read
+    sink.stop()
+    request_logger.handlers = handlers
+
+
+async def call(app, path: str, **headers) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path, headers=headers)
+
+
+def count(route: str, status: int, method: str = "GET") -> int:
+    return HTTP_REQUEST_SECONDS.labels(method=method, route=route, status=status).count
+
+
+async def test_latency_is_recorded_by_route_template_and_phase(log_lines):
+    before = count("/items/{item_id}", 200)
+    llm_before = HTTP_REQUEST_PHASE_SECONDS.labels(route="/items/{item_id}", phase="llm").count
+
+    response = await call(build_app(), "/items/item-xyz", authorization="Bearer secret-token")
+
+    assert response.json() == {"id": "item-xyz"}
+    assert count("/items/{item_id}", 200) == before + 1
+    assert HTTP_REQUEST_PHASE_SECONDS.labels(route="/items/{item_id}", phase="llm").count == llm_before + 1
+
+    [line] = log_lines()
+    assert (line["method"], line["route"], line["status"]) == ("GET", "/items/{item_id}", 200)
+    assert line["llm_ms"] >= 10 and line["llm_calls"] == 1
+    assert line["db_ms"] == 2.0 and line["db_calls"] == 2
+    assert line["render_calls"] == 0
+    # Neither the concrete path nor any header is logged
+    assert "item-xyz" not in json.dumps(line) and "secret-token" not in json.dumps(line)
+
+
+async def test_unmatched_paths_share_one_label(log_lines):
+    before = count("<unmatched>", 404)
+
+    await call(build_app(), "/scan/1")
+    await call(build_app(), "/scan/2")
+
+    assert count("<unmatched>", 404) == before + 2
+    assert {line["route"] for line in log_lines()} == {"<unmatched>"}
+
+
+async def test_sampling_keeps_errors_and_slow_requests(log_lines):
+    app = build_app(sample_rate=0.0, slow_ms=5.0)
+
+    await call(app, "/stream")           # fast: not logged
+    await call(app, "/broken")           # 5xx: always logged
+    await call(app, "/items/1")          # slower than slow_ms: always logged
+
+    assert [(line["route"], line["status"]) for line in log_lines()] == [("/broken", 503), ("/items/{item_id}", 200)]
+
+
+async def test_streamed_response_counts_as_in_flight_until_it_ends(log_lines):
+    idle = HTTP_REQUESTS_IN_FLIGHT._default().value
+
+    response = await call(build_app(), "/stream")
+
+    assert response.text == "first last"
+    assert gate["in_flight"] == idle + 1
+    assert HTTP_REQUESTS_IN_FLIGHT._default().value == idle
+
+
+def test_phase_outside_a_request_is_a_no_op():
+    with instrumentation.phase("llm"):
+        pass
+    instrumentation.record_phase("db", 1.0)
+
+
+async def test_app_records_db_phase_for_queries(client, database, log_lines):
+    before = HTTP_REQUEST_PHASE_SECONDS.labels(route="/api/admin/users", phase="db").count
+
+    response = await client.get("/api/admin/users")
+
+    assert response.status_code == 200
+    assert HTTP_REQUEST_PHASE_SECONDS.labels(route="/api/admin/users", phase="db").count == before + 1
+    [line] = log_lines()
+    assert line["route"] == "/api/admin/users" and line["db_calls"] >= 1
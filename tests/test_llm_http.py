@@ -0,0 +1,124 @@
+"""
+The LLM providers' pooled HTTP clients: limits taken from the
+settings, and `pool_stats` counting active and queued requests and
+opened connections against a local HTTP/1.1 server.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from app.services import llm_http
+from app.services.llm_http import LLM_HTTP_CONNECTIONS_OPENED, LLM_HTTP_REQUESTS_QUEUED, build_llm_http_client
+from app.services.llm_providers import OpenAIProvider
+from app.services.llm_router import LLMRouter
+
+
+def pool_settings(**overrides) -> SimpleNamespace:
+    settings = {
+        "llm_http2": False,
+        "llm_http_max_connections": 1,
+        "llm_http_max_keepalive_connections": 1,
+        "llm_http_keepalive_expiry_seconds": 30.0,
+        "llm_http_timeout_seconds": 5.0,
+        "llm_http_connect_timeout_seconds": 1.0,
+    }
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+@pytest.fixture
+async def server():
+    """
+    Keep-alive HTTP/1.1 server on localhost that holds each response
+    until `release` is set; `received` counts the requests read.
+    """
+    state = SimpleNamespace(release=asyncio.Event(), received=0)
+
+    async def handle(reader, writer):
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                state.received += 1
+                await state.release.wait()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    tcp_server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = tcp_server.sockets[0].getsockname()[1]
+    state.url = f"http://127.0.0.1:{port}/"
+    yield state
+    state.release.set()
+    tcp_server.close()
+
+
+async def wait_until(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("condition never met")
+
+
+def test_limits_come_from_the_settings():
+    client = build_llm_http_client(pool_settings(llm_http2=True, llm_http_max_connections=64, llm_http_max_keepalive_connections=32), "openai")
+
+    assert llm_http.pool_stats(client) == {
+        "http2": True, "max_connections": 64, "max_keepalive_connections": 32, "keepalive_expiry": 30.0,
+        "requests_active": 0, "requests_queued": 0, "connections_opened": 0,
+    }
+    assert llm_http.pool_stats(httpx.AsyncClient()) is None
+
+
+async def test_requests_beyond_the_pool_queue_and_reuse_its_connection(server):
+    client = build_llm_http_client(pool_settings(), "pool-test")
+    opened = LLM_HTTP_CONNECTIONS_OPENED.labels(provider="pool-test").value
+    try:
+        requests = [asyncio.create_task(client.get(server.url)) for _ in range(2)]
+        await wait_until(lambda: server.received == 1 and llm_http.pool_stats(client)["requests_queued"] == 1)
+
+        stats = llm_http.pool_stats(client)
+        assert (stats["requests_active"], stats["requests_queued"], stats["connections_opened"]) == (1, 1, 1)
+        assert LLM_HTTP_REQUESTS_QUEUED.labels(provider="pool-test").value == 1
+
+        server.release.set()
+        assert [response.text for response in await asyncio.gather(*requests)] == ["ok", "ok"]
+        await client.get(server.url)
+
+        stats = llm_http.pool_stats(client)
+        assert (stats["requests_active"], stats["requests_queued"], stats["connections_opened"]) == (0, 0, 1)
+        assert LLM_HTTP_CONNECTIONS_OPENED.labels(provider="pool-test").value == opened + 1
+    finally:
+        await client.aclose()
+
+
+async def test_failed_request_leaves_the_pool_counts():
+    client = build_llm_http_client(pool_settings(llm_http_connect_timeout_seconds=0.5), "pool-test")
+    try:
+        with pytest.raises(httpx.ConnectError):
+            await client.get("http://127.0.0.1:1/")
+
+        stats = llm_http.pool_stats(client)
+        assert (stats["requests_active"], stats["requests_queued"]) == (0, 0)
+    finally:
+        await client.aclose()
+
+
+async def test_warm_up_opens_connections_reported_per_provider(server):
+    server.release.set()
+    client = build_llm_http_client(pool_settings(llm_http_max_connections=4, llm_http_max_keepalive_connections=4), "openai")
+    provider = OpenAIProvider(AsyncOpenAI(api_key="test", base_url=server.url, http_client=client), http_client=client)
+    router = LLMRouter({"openai": provider}, default_route=["openai:gpt-4o"])
+    try:
+        await router.warm_up(3)
+
+        assert server.received == 3
+        stats = router.pool_stats()["openai"]
+        assert (stats["connections_opened"], stats["requests_active"]) == (3, 0)
+    finally:
+        await client.aclose()
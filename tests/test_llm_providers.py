@@ -0,0 +1,257 @@
+"""
+Provider adapters against canned upstream responses (no network):
+structured output parsing, which upstream errors are transient, and a
+stream only ending normally once the provider says it is complete.
+"""
+import json
+
+import anthropic
+import httpx
+import pytest
+from google import genai
+from google.genai import errors as genai_errors, types as genai_types
+from openai import AsyncOpenAI
+
+from app.schemas.openai_schemas import DefaultLLMOutput, UpdateFormLLMOutput
+from app.services.llm_providers import AnthropicProvider, GeminiProvider, OpenAIProvider, Usage
+from app.services.llm_resilience import LLMResponseError, TransientLLMError
+
+RESPONSE = {
+    "id": "resp_1", "object": "response", "created_at": 0, "model": "gpt-4o", "output": [],
+    "parallel_tool_calls": False, "tool_choice": "auto", "tools": [], "status": "completed",
+    "usage": {
+        "input_tokens": 1200, "output_tokens": 20, "total_tokens": 1220,
+        "input_tokens_details": {"cached_tokens": 1024}, "output_tokens_details": {"reasoning_tokens": 0}
+    }
+}
+
+
+def delta(text: str, sequence_number: int) -> dict:
+    return {
+        "type": "response.output_text.delta", "delta": text, "item_id": "msg_1",
+        "output_index": 0, "content_index": 0, "sequence_number": sequence_number, "logprobs": []
+    }
+
+
+def openai_provider(events: list) -> OpenAIProvider:
+    body = "".join(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events).encode()
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body))
+    return OpenAIProvider(AsyncOpenAI(api_key="test", max_retries=0, http_client=httpx.AsyncClient(transport=transport)))
+
+
+async def test_openai_stream_yields_text_then_usage():
+    provider = openai_provider([
+        delta("Hello ", 1),
+        delta("there", 2),
+        {"type": "response.completed", "response": RESPONSE, "sequence_number": 3},
+    ])
+
+    events = [event async for event in provider.stream("gpt-4o", "system", "user")]
+
+    assert events[:2] == ["Hello ", "there"]
+    assert isinstance(events[2], Usage)
+    assert (events[2].input_tokens, events[2].output_tokens, events[2].cached_tokens) == (1200, 20, 1024)
+
+
+@pytest.mark.parametrize("last_event, error", [
+    (
+        {"type": "response.failed", "response": {**RESPONSE, "status": "failed", "error": {"code": "server_error", "message": "upstream"}}},
+        TransientLLMError
+    ),
+    (
+        {"type": "response.failed", "response": {**RESPONSE, "status": "failed", "error": {"code": "invalid_prompt", "message": "rejected"}}},
+        LLMResponseError
+    ),
+    (
+        {"type": "response.incomplete", "response": {**RESPONSE, "status": "incomplete", "incomplete_details": {"reason": "max_output_tokens"}}},
+        LLMResponseError
+    ),
+    (
+        {"type": "error", "code": "rate_limit_exceeded", "message": "slow down"},
+        TransientLLMError
+    ),
+    # Connection dropped before response.completed
+    (None, TransientLLMError),
+])
+async def test_openai_stream_raises_instead_of_ending_short(last_event, error):
+    events = [delta("Partial ", 1)]
+    if last_event is not None:
+        events.append({**last_event, "sequence_number": 2})
+    provider = openai_provider(events)
+
+    received = []
+    with pytest.raises(error):
+        async for event in provider.stream("gpt-4o", "system", "user"):
+            received.append(event)
+    assert received == ["Partial "]
+
+
+def mock_transport(handler, requests: list = None) -> httpx.MockTransport:
+    """
+    Answers every request with `handler(request)`, keeping the
+    requests' JSON bodies in `requests`.
+    """
+    def respond(request: httpx.Request) -> httpx.Response:
+        if requests is not None:
+            requests.append(json.loads(request.content))
+        return handler(request)
+    return httpx.MockTransport(respond)
+
+
+def mock_client(handler, requests: list = None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=mock_transport(handler, requests))
+
+
+def anthropic_message(content: list, stop_reason: str = "tool_use") -> dict:
+    return {
+        "id": "msg_1", "type": "message", "role": "assistant", "model": "claude-sonnet-4-5",
+        "content": content, "stop_reason": stop_reason, "stop_sequence": None,
+        "usage": {"input_tokens": 100, "output_tokens": 20, "cache_read_input_tokens": 1000, "cache_creation_input_tokens": 50}
+    }
+
+
+def error_body(status: int) -> dict:
+    return {"type": "error", "error": {"type": "api_error", "message": f"status {status}"}}
+
+
+async def test_anthropic_parse_reads_the_forced_tool_call():
+    requests = []
+    tool_call = {"type": "tool_use", "id": "toolu_1", "name": "UpdateFormLLMOutput", "input": {"fields_to_update": [{
+        "type": "create", "template_field_id": "1", "field_name": "Business/Org Title",
+        "new_value": "Acme Robotics", "confidence": 0.9, "reasoning": "Named by the user."
+    }]}}
+    http_client = mock_client(lambda request: httpx.Response(200, json=anthropic_message([tool_call])), requests)
+    provider = AnthropicProvider("test", http_client=http_client)
+
+    parsed, usage = await provider.parse("claude-sonnet-4-5", "system", "user", UpdateFormLLMOutput)
+
+    assert isinstance(parsed, UpdateFormLLMOutput)
+    assert parsed.fields_to_update[0].new_value == "Acme Robotics"
+    assert (usage.input_tokens, usage.output_tokens, usage.cached_tokens) == (1150, 20, 1000)
+    [request] = requests
+    assert request["tool_choice"] == {"type": "tool", "name": "UpdateFormLLMOutput"}
+    assert request["system"] == [{"type": "text", "text": "system", "cache_control": {"type": "ephemeral"}}]
+
+
+async def test_anthropic_parse_without_a_tool_call_is_a_response_error():
+    cut_short = anthropic_message([{"type": "text", "text": "Let me think"}], stop_reason="max_tokens")
+    provider = AnthropicProvider("test", http_client=mock_client(lambda request: httpx.Response(200, json=cut_short)))
+
+    with pytest.raises(LLMResponseError, match="max_tokens"):
+        await provider.parse("claude-sonnet-4-5", "system", "user", DefaultLLMOutput)
+
+
+@pytest.mark.parametrize("status, error", [
+    (429, TransientLLMError),
+    (500, TransientLLMError),
+    (529, TransientLLMError),
+    (400, anthropic.BadRequestError),
+])
+async def test_anthropic_errors_map_to_transient_or_not(status, error):
+    provider = AnthropicProvider("test", http_client=mock_client(lambda request: httpx.Response(status, json=error_body(status))))
+
+    with pytest.raises(error):
+        await provider.parse("claude-sonnet-4-5", "system", "user", DefaultLLMOutput)
+
+
+def anthropic_stream(stop_reason: str) -> bytes:
+    events = [
+        {"type": "message_start", "message": {**anthropic_message([], stop_reason=None), "usage": {"input_tokens": 100, "output_tokens": 1}}},
+        {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "Hello "}},
+        {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "there"}},
+        {"type": "content_block_stop", "index": 0},
+        {"type": "message_delta", "delta": {"stop_reason": stop_reason, "stop_sequence": None}, "usage": {"output_tokens": 20}},
+        {"type": "message_stop"},
+    ]
+    return "".join(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events).encode()
+
+
+@pytest.mark.parametrize("stop_reason, error", [("end_turn", None), ("max_tokens", LLMResponseError)])
+async def test_anthropic_stream_ends_with_usage_only_when_complete(stop_reason, error):
+    http_client = mock_client(lambda request: httpx.Response(200, headers={"content-type": "text/event-stream"}, content=anthropic_stream(stop_reason)))
+    provider = AnthropicProvider("test", http_client=http_client)
+
+    received = []
+    try:
+        async for event in provider.stream("claude-sonnet-4-5", "system", "user"):
+            received.append(event)
+    except LLMResponseError:
+        assert error is LLMResponseError
+    else:
+        assert error is None
+        assert (received[-1].input_tokens, received[-1].output_tokens) == (100, 20)
+    assert received[:2] == ["Hello ", "there"]
+
+
+def gemini_provider(handler, requests: list = None) -> GeminiProvider:
+    provider = GeminiProvider("test")
+    provider.client = genai.Client(api_key="test", http_options=genai_types.HttpOptions(
+        async_client_args={"transport": mock_transport(handler, requests)}
+    ))
+    return provider
+
+
+def gemini_response(text: str = None, finish_reason: str = "STOP") -> dict:
+    candidate = {"finishReason": finish_reason}
+    if text is not None:
+        candidate["content"] = {"role": "model", "parts": [{"text": text}]}
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 20, "cachedContentTokenCount": 64}
+    }
+
+
+async def test_gemini_parse_reads_the_json_response():
+    requests = []
+    provider = gemini_provider(lambda request: httpx.Response(200, json=gemini_response('{"output_text": "Hi"}')), requests)
+
+    parsed, usage = await provider.parse("gemini-2.5-pro", "system", "user", DefaultLLMOutput)
+
+    assert parsed == DefaultLLMOutput(output_text="Hi")
+    assert (usage.input_tokens, usage.output_tokens, usage.cached_tokens) == (100, 20, 64)
+    [request] = requests
+    assert request["generationConfig"]["responseMimeType"] == "application/json"
+    assert request["systemInstruction"]["parts"] == [{"text": "system"}]
+
+
+async def test_gemini_parse_without_output_is_a_response_error():
+    provider = gemini_provider(lambda request: httpx.Response(200, json=gemini_response(finish_reason="SAFETY")))
+
+    with pytest.raises(LLMResponseError, match="SAFETY"):
+        await provider.parse("gemini-2.5-pro", "system", "user", DefaultLLMOutput)
+
+
+@pytest.mark.parametrize("status, error", [
+    (429, TransientLLMError),
+    (500, TransientLLMError),
+    (503, TransientLLMError),
+    (400, genai_errors.ClientError),
+])
+async def test_gemini_errors_map_to_transient_or_not(status, error):
+    body = {"error": {"code": status, "message": f"status {status}", "status": "UNAVAILABLE"}}
+    provider = gemini_provider(lambda request: httpx.Response(status, json=body))
+
+    with pytest.raises(error):
+        await provider.parse("gemini-2.5-pro", "system", "user", DefaultLLMOutput)
+
+
+@pytest.mark.parametrize("finish_reason, error", [("STOP", None), ("MAX_TOKENS", LLMResponseError)])
+async def test_gemini_stream_ends_with_usage_only_when_complete(finish_reason, error):
+    chunks = [
+        {"candidates": [{"content": {"role": "model", "parts": [{"text": "Hello "}]}}]},
+        {**gemini_response("there", finish_reason)},
+    ]
+    body = "".join(f"data: {json.dumps(chunk)}\r\n\r\n" for chunk in chunks).encode()
+    provider = gemini_provider(lambda request: httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body))
+
+    received = []
+    try:
+        async for event in provider.stream("gemini-2.5-pro", "system", "user"):
+            received.append(event)
+    except LLMResponseError:
+        assert error is LLMResponseError
+    else:
+        assert error is None
+        assert (received[-1].input_tokens, received[-1].output_tokens) == (100, 20)
+    assert received[:2] == ["Hello ", "there"]
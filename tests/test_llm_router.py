@@ -0,0 +1,242 @@
+"""
+`LLMRouter` and `LLMResilience` over `FakeProvider` (no network):
+failover between models, the response cache in front of the router
+and its backends, retries, deadlines, hedging and the circuit breaker.
+"""
+import asyncio
+
+import pytest
+
+from app.schemas.openai_schemas import DefaultLLMOutput
+from app.services.llm_providers import FakeProvider
+from app.services.llm_resilience import (
+    CircuitBreaker, CircuitOpen, LLMDeadlineExceeded, LLMResilience, LLMResponseError, TransientLLMError
+)
+from app.services.llm_response_cache import DiskBackend, LLMResponseCache, MemoryBackend, cache_key
+from app.services.llm_router import LLMRouter
+
+ROUTE = ["fake:primary", "fake:fallback"]
+
+
+def resilience(**kwargs) -> LLMResilience:
+    options = {"default_deadline": 5.0, "attempt_timeout": 2.0, "max_attempts": 2, "backoff": 0.001, "backoff_max": 0.002}
+    options.update(kwargs)
+    return LLMResilience(**options)
+
+
+class FlakyProvider(FakeProvider):
+    """
+    Fails its first `failures` requests with a transient error.
+    """
+
+    def __init__(self, failures: int, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    async def _respond(self, model: str):
+        self.calls.append(model)
+        await asyncio.sleep(self.latencies.get(model, self.latency))
+        if len(self.calls) <= self.failures:
+            raise TransientLLMError(f"fake: {model} failed")
+
+
+async def reply(router: LLMRouter, prompt: str = "Hello", **kwargs) -> str:
+    return (await router.handle_message(prompt, DefaultLLMOutput, prompt_name="chat", **kwargs))["response"].output_text
+
+
+async def stream(router: LLMRouter, prompt: str = "Hello") -> str:
+    return "".join([delta async for delta in router.stream_message(prompt, prompt_name="chat")])
+
+
+async def test_failover_to_next_model():
+    provider = FakeProvider()
+    provider.failing.add("primary")
+    router = LLMRouter({"fake": provider}, routes={"chat": ROUTE})
+
+    text = await reply(router)
+
+    assert "(fallback " in text
+    assert provider.calls == ["primary", "fallback"]
+
+
+async def test_stream_fails_over_before_first_delta():
+    provider = FakeProvider()
+    provider.failing.add("primary")
+    router = LLMRouter({"fake": provider}, routes={"chat": ROUTE})
+
+    text = await stream(router)
+
+    assert "(fallback " in text
+    assert provider.calls == ["primary", "fallback"]
+
+
+async def test_last_model_error_is_raised():
+    provider = FakeProvider()
+    provider.failing.update({"primary", "fallback"})
+    router = LLMRouter({"fake": provider}, routes={"chat": ROUTE})
+
+    with pytest.raises(TransientLLMError, match="fallback"):
+        await reply(router)
+
+
+def test_cache_key_ignores_whitespace_but_not_content():
+    key = cache_key("parse", "gpt-4o", "System", "Hello\nthere", DefaultLLMOutput)
+
+    assert cache_key("parse", "gpt-4o", "System  \n", "\nHello  \r\nthere\n", DefaultLLMOutput) == key
+    assert cache_key("parse", "gpt-4o", "System", "Hello\nthere!", DefaultLLMOutput) != key
+    assert cache_key("parse", "gpt-4o-mini", "System", "Hello\nthere", DefaultLLMOutput) != key
+    assert cache_key("stream", "gpt-4o", "System", "Hello\nthere") != key
+
+
+async def test_disk_backend_round_trip_and_expiry(tmp_path):
+    backend = DiskBackend(str(tmp_path))
+    await backend.set("abcdef", b"payload")
+    assert await backend.get("abcdef") == b"payload"
+    assert await backend.get("abc123") is None
+
+    expired = DiskBackend(str(tmp_path), ttl=-1.0)
+    await expired.set("abcdef", b"payload")
+    assert await expired.get("abcdef") is None
+    assert not (tmp_path / "ab" / "abcdef.bin").exists()
+
+
+async def test_cached_answer_skips_the_model():
+    provider = FakeProvider()
+    router = LLMRouter({"fake": provider}, routes={"chat": ROUTE}, cache=LLMResponseCache(MemoryBackend()))
+
+    first = await reply(router)
+    second = await reply(router)
+
+    assert second == first
+    assert provider.calls == ["primary"]
+
+
+async def test_fallback_answer_is_not_cached_as_primary():
+    provider = FakeProvider()
+    router = LLMRouter({"fake": provider}, routes={"chat": ROUTE}, cache=LLMResponseCache(MemoryBackend()))
+    provider.failing.add("primary")
+    await reply(router)
+    provider.failing.clear()
+    provider.calls.clear()
+
+    first = await reply(router)
+    second = await reply(router)
+
+    assert "(primary " in first and second == first
+    # The primary answered the first call; the second was served from the cache
+    assert provider.calls == ["primary"]
+
+
+async def test_use_cache_false_always_calls_a_model():
+    provider = FakeProvider()
+    router = LLMRouter({"fake": provider}, routes={"chat": ROUTE}, cache=LLMResponseCache(MemoryBackend()))
+
+    await reply(router, use_cache=False)
+    await reply(router, use_cache=False)
+
+    assert provider.calls == ["primary", "primary"]
+
+
+class BrokenBackend:
+    async def get(self, key: str):
+        raise OSError("disk full")
+
+    async def set(self, key: str, value: bytes):
+        raise OSError("disk full")
+
+
+async def test_failing_backend_does_not_fail_the_call():
+    provider = FakeProvider()
+    router = LLMRouter({"fake": provider}, routes={"chat": ROUTE}, cache=LLMResponseCache(BrokenBackend()))
+
+    assert "(primary " in await reply(router)
+    assert "(primary " in await reply(router)
+    assert provider.calls == ["primary", "primary"]
+
+
+async def test_transient_errors_are_retried():
+    provider = FlakyProvider(failures=1)
+    router = LLMRouter({"fake": provider}, routes={"chat": ROUTE}, resilience={"fake": resilience(max_attempts=2)})
+
+    text = await reply(router)
+
+    assert "(primary " in text
+    assert provider.calls == ["primary", "primary"]
+
+
+class UnusableProvider(FakeProvider):
+    async def _respond(self, model: str):
+        self.calls.append(model)
+        raise LLMResponseError(f"fake: {model} returned no structured output")
+
+
+async def test_unusable_response_is_not_retried():
+    provider = UnusableProvider()
+    router = LLMRouter({"fake": provider}, default_route=["fake:primary"], resilience={"fake": resilience(max_attempts=3)})
+
+    with pytest.raises(LLMResponseError):
+        await reply(router)
+    assert provider.calls == ["primary"]
+
+
+async def test_deadline_covers_retries():
+    provider = FakeProvider(latency=1.0)
+    router = LLMRouter({"fake": provider}, default_route=["fake:primary"], resilience={"fake": resilience(default_deadline=0.05)})
+
+    with pytest.raises(LLMDeadlineExceeded) as raised:
+        await reply(router)
+    assert raised.value.status_code == 504
+
+
+async def test_hedge_answers_when_first_request_is_slow():
+    provider = FakeProvider()
+    policy = resilience(hedge=True, hedge_min_samples=1, hedge_min_delay=0.02, hedge_max_ratio=1.0)
+    router = LLMRouter({"fake": provider}, default_route=["fake:primary"], resilience={"fake": policy})
+    await router.handle_message("warm up", DefaultLLMOutput, prompt_name="chat")
+    provider.calls.clear()
+
+    # The first request hangs; the hedge sent after the p95 delay answers
+    slow_once = iter([10.0])
+    original = provider._respond
+
+    async def respond(model: str):
+        provider.latencies[model] = next(slow_once, 0.0)
+        await original(model)
+
+    provider._respond = respond
+    text = await asyncio.wait_for(reply(router), timeout=2)
+
+    assert "(primary " in text
+    assert provider.calls == ["primary", "primary"]
+
+
+async def test_circuit_breaker_opens_and_fails_fast():
+    provider = FakeProvider()
+    provider.failing.add("primary")
+    breaker = CircuitBreaker(window=10.0, min_calls=2, failure_ratio=0.5, cooldown=60.0, provider="fake")
+    router = LLMRouter({"fake": provider}, default_route=["fake:primary"], resilience={"fake": resilience(max_attempts=1, breaker=breaker)})
+
+    for _ in range(2):
+        with pytest.raises(TransientLLMError):
+            await reply(router)
+    provider.calls.clear()
+
+    with pytest.raises(CircuitOpen) as raised:
+        await reply(router)
+    assert raised.value.status_code == 503 and raised.value.retry_after >= 1
+    assert provider.calls == []
+
+
+async def test_models_with_open_circuit_go_last():
+    primary, fallback = FakeProvider(), FakeProvider()
+    breakers = {name: CircuitBreaker(min_calls=1, failure_ratio=0.5, cooldown=60.0, provider=name) for name in ("a", "b")}
+    router = LLMRouter(
+        {"a": primary, "b": fallback},
+        routes={"chat": ["a:primary", "b:fallback"]},
+        resilience={name: resilience(max_attempts=1, breaker=breaker) for name, breaker in breakers.items()}
+    )
+    breakers["a"].record(True)
+
+    assert [choice.key for choice in router.candidates("chat", 100)] == ["b:fallback", "a:primary"]
+    assert "(fallback " in await reply(router)
+    assert primary.calls == []
@@ -0,0 +1,67 @@
+"""
+The metrics registry and its two outputs: Prometheus text at `/metrics`
+and JSON at `/api/admin/metrics`, including the per-step chat
+histograms a turn records.
+"""
+from app.core.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def registry_with_samples() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    requests = registry.register(Counter("requests_total", "Requests\nserved", ["route"]))
+    requests.labels(route='/say "hi"').inc(3)
+    registry.register(Gauge("in_flight", "In flight")).set(2)
+    latency = registry.register(Histogram("latency_seconds", "Latency", ["step"], buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        latency.labels(step="load").observe(value)
+    return registry
+
+
+def test_exposition_format():
+    assert registry_with_samples().exposition() == (
+        "# HELP requests_total Requests\\nserved\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="/say \\"hi\\""} 3\n'
+        "# HELP in_flight In flight\n"
+        "# TYPE in_flight gauge\n"
+        "in_flight 2\n"
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{step="load",le="0.1"} 1\n'
+        'latency_seconds_bucket{step="load",le="1"} 3\n'
+        'latency_seconds_bucket{step="load",le="+Inf"} 4\n'
+        'latency_seconds_sum{step="load"} 6.25\n'
+        'latency_seconds_count{step="load"} 4\n'
+    )
+
+
+def test_snapshot_summarizes_histograms():
+    snapshot = registry_with_samples().snapshot()
+
+    [series] = snapshot["latency_seconds"]["series"]
+    assert snapshot["latency_seconds"]["type"] == "histogram"
+    assert series["labels"] == {"step": "load"}
+    assert (series["count"], series["sum"], series["mean"]) == (4, 6.25, 1.5625)
+    assert (series["p50"], series["p95"]) == (1.0, float("inf"))
+    assert snapshot["in_flight"]["series"] == [{"labels": {}, "value": 2.0}]
+
+
+def test_registering_a_name_twice_returns_the_first_metric():
+    registry = MetricsRegistry()
+    first = registry.register(Counter("calls_total", "Calls"))
+
+    assert registry.register(Counter("calls_total", "Calls")) is first
+
+
+async def test_chat_turn_shows_up_in_both_outputs(router, client, advance):
+    await advance(1)
+
+    text = await client.get("/metrics")
+    snapshot = (await client.get("/api/admin/metrics")).json()
+
+    assert text.headers["content-type"].startswith("text/plain; version=0.0.4")
+    for step in ("1_load_conversation", "2_add_user_message", "3_load_form_context", "6_generate_response", "7_add_agent_message"):
+        assert f'chat_step_seconds_count{{step="{step}"}}' in text.text
+        assert any(series["labels"] == {"step": step} and series["count"] >= 1 for series in snapshot["chat_step_seconds"]["series"])
+    assert 'http_request_seconds_count{method="POST",route="/api/chat/advance",status="200"}' in text.text
+    assert any(series["labels"] == {"mode": "sequential"} for series in snapshot["chat_turn_seconds"]["series"])
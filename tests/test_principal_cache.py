@@ -0,0 +1,94 @@
+"""
+`PrincipalCache` and `authenticate_token`: cached tokens and users,
+invalidated when a user is deleted and expired by their TTL.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import app.services.principal_cache as principal_cache_module
+from app.core.config import get_settings
+from app.core.dependencies import authenticate_token
+from app.core.jwt import ALGORITHM, create_access_token
+from app.db.database import AsyncSessionLocal
+from app.db.models import User
+from app.services.principal_cache import PrincipalCache, principal_cache
+
+
+async def create_user(email: str = "deleted@example.com") -> tuple:
+    async with AsyncSessionLocal() as db:
+        user = User(email=email, firstname="Soon", lastname="Gone", hashed_password="x")
+        db.add(user)
+        await db.commit()
+        return user.id, create_access_token({"user_id": user.id, "email": email})
+
+
+async def authenticate(token: str):
+    async with AsyncSessionLocal() as db:
+        return await authenticate_token(token, db)
+
+
+async def test_cached_user_needs_no_database(database):
+    user_id, token = await create_user()
+    await authenticate(token)
+
+    # Served from the cache: the session is never used
+    principal = await authenticate_token(token, None)
+
+    assert (principal.id, principal.email) == (user_id, "deleted@example.com")
+    assert not hasattr(principal, "hashed_password")
+
+
+async def test_deleted_user_is_rejected(client, database):
+    _, token = await create_user()
+    await authenticate(token)
+
+    response = await client.delete("/api/admin/users", params={"email": "deleted@example.com"})
+
+    assert response.status_code == 200
+    with pytest.raises(HTTPException) as raised:
+        await authenticate(token)
+    assert raised.value.status_code == 404
+
+
+async def test_principal_expires_after_ttl(database):
+    user_id, _ = await create_user()
+    cache = PrincipalCache(ttl=0.05)
+    async with AsyncSessionLocal() as db:
+        assert (await cache.get(db, user_id)).email == "deleted@example.com"
+        await db.execute(User.__table__.update().where(User.id == user_id).values(email="renamed@example.com"))
+        await db.commit()
+
+        assert (await cache.get(db, user_id)).email == "deleted@example.com"
+        await asyncio.sleep(0.1)
+        assert (await cache.get(db, user_id)).email == "renamed@example.com"
+
+
+def test_token_is_decoded_again_after_it_expires(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = PrincipalCache()
+    monkeypatch.undo()
+    decoded = []
+    monkeypatch.setattr(principal_cache_module, "decode_token", lambda token: decoded.append(token) or {"user_id": 7, "exp": now[0] + 60})
+
+    assert cache.user_id_for_token("token") == 7
+    assert cache.user_id_for_token("token") == 7
+    assert len(decoded) == 1
+
+    now[0] += 61
+    assert cache.user_id_for_token("token") == 7
+    assert len(decoded) == 2
+
+
+def test_invalid_and_expired_tokens_are_rejected(database):
+    secret = get_settings().jwt_secret_key
+    expired = jwt.encode({"user_id": 1, "exp": datetime(2000, 1, 1, tzinfo=timezone.utc)}, secret, algorithm=ALGORITHM)
+    no_user = jwt.encode({"email": "x@example.com"}, secret, algorithm=ALGORITHM)
+
+    for token in ("not-a-jwt", expired, no_user):
+        assert principal_cache.user_id_for_token(token) is None
@@ -0,0 +1,62 @@
+"""
+The split of each chat prompt into a stable system prompt (role,
+instructions, field definitions) and a per-turn user prompt (form
+values, history, latest message), so providers can cache the prefix.
+"""
+from sqlalchemy import select
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import FieldTemplate
+from app.services.llm_router import OPENAI_TOKENS
+
+PROMPTS = {
+    "update_form": "You are a data specialist agent",
+    "generate_response": "You are a conversation and message-generation specialist agent",
+}
+
+
+def calls_by_prompt(provider) -> dict:
+    calls = {name: [] for name in PROMPTS}
+    for _, system_prompt, user_prompt in provider.prompts:
+        [name] = [name for name, role in PROMPTS.items() if role in system_prompt]
+        calls[name].append((system_prompt, user_prompt))
+    return calls
+
+
+async def field_definitions(form_template_id: int) -> list:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(FieldTemplate.name, FieldTemplate.description).where(FieldTemplate.form_template_id == form_template_id)
+        )).all()
+
+
+async def test_stable_instructions_go_in_the_system_prompt(router, provider, conversation, advance):
+    fields = await field_definitions(conversation.form_template_id)
+    await advance(1, "We are Acme Robotics.")
+    await advance(3, "Our project is a warehouse robot.")
+
+    for name, calls in calls_by_prompt(provider).items():
+        assert len(calls) == 2, name
+        (first_system, first_user), (second_system, second_user) = calls
+        # Byte-identical across turns, so the whole prefix can be cached
+        assert first_system == second_system
+        for field_name, description in fields:
+            assert field_name in first_system and description in first_system
+        assert "Acme Robotics" not in first_system and "Current value:" not in first_system
+
+        assert first_user.startswith("## LATEST STATE OF THE FORM")
+        assert "Current value: NONE" in first_user
+        assert not any(description in first_user for _, description in fields)
+        assert "We are Acme Robotics." in first_user
+        assert "Our project is a warehouse robot." in second_user and first_user != second_user
+
+
+async def test_repeated_system_prompt_is_counted_as_cached(router, provider, advance):
+    cached = OPENAI_TOKENS.labels(prompt="generate_response", model="gpt-4o", kind="cached")
+    await advance(1)
+    after_first = cached.value
+
+    await advance(3, "Our project is a warehouse robot.")
+
+    # FakeProvider caches a system prompt it has seen before
+    assert cached.value > after_first
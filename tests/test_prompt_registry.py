@@ -0,0 +1,101 @@
+"""
+`PromptRegistry`: compiled templates, placeholder substitution,
+mtime-based auto-reload and explicit reloads.
+"""
+import os
+
+import pytest
+
+from app.utils.prompt_registry import PromptRegistry, prompt_registry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    (tmp_path / "greeting.md").write_text("Hello {{NAME}}, welcome to {{PLACE}}.")
+    (tmp_path / "plain.md").write_text("No placeholders here.")
+    registry = PromptRegistry(prompt_dir=str(tmp_path), check_interval=0.0)
+    registry.load_all()
+    return registry
+
+
+def edit(path, text: str):
+    # A distinct mtime even on filesystems with coarse timestamps
+    mtime = os.path.getmtime(path) + 10
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+
+
+def test_render_substitutes_placeholders(registry):
+    assert registry.render("greeting", NAME="Ada", PLACE="the intake") == "Hello Ada, welcome to the intake."
+    assert registry.render("plain") == "No placeholders here."
+
+
+def test_render_requires_every_placeholder(registry):
+    with pytest.raises(KeyError, match="PLACE"):
+        registry.render("greeting", NAME="Ada")
+
+
+def test_field_definitions_go_into_system_prompts():
+    prompt_registry.load_all()
+    definitions = "Field name: Business/Org Title\nTemplate field ID: 1\n"
+
+    for name in ("update_form_system", "generate_response_system"):
+        assert "FIELD_DEFINITIONS" in prompt_registry.get(name).placeholders
+        rendered = prompt_registry.render(name, FIELD_DEFINITIONS=definitions)
+        assert definitions in rendered and "{{" not in rendered
+
+
+def test_auto_reload_picks_up_edits(registry, tmp_path):
+    edit(tmp_path / "greeting.md", "Hi {{NAME}}.")
+
+    assert registry.render("greeting", NAME="Ada") == "Hi Ada."
+
+
+def test_edits_wait_for_check_interval(registry, tmp_path):
+    registry.configure(auto_reload=True, check_interval=3600.0)
+    edit(tmp_path / "plain.md", "Edited.")
+
+    assert registry.render("plain") == "No placeholders here."
+    assert registry.reload("plain") == ["plain"]
+    assert registry.render("plain") == "Edited."
+
+
+def test_no_auto_reload_when_disabled(registry, tmp_path):
+    registry.configure(auto_reload=False, check_interval=0.0)
+    edit(tmp_path / "plain.md", "Edited.")
+
+    assert registry.render("plain") == "No placeholders here."
+
+
+def test_reload_all_picks_up_new_templates(registry, tmp_path):
+    (tmp_path / "added.md").write_text("New.")
+
+    assert registry.reload() == ["added", "greeting", "plain"]
+    assert registry.render("added") == "New."
+
+
+@pytest.mark.parametrize("name", ["missing", "../prompts/plain", "../../etc/passwd", "/tmp/x"])
+def test_reload_rejects_unknown_names(registry, name):
+    with pytest.raises(KeyError):
+        registry.reload(name)
+
+
+def test_describe_lists_loaded_templates(registry, tmp_path):
+    described = {entry["name"]: entry for entry in registry.describe()}
+
+    assert described.keys() == {"greeting", "plain"}
+    assert described["greeting"]["placeholders"] == ["NAME", "PLACE"]
+    assert described["greeting"]["segments"] == 5
+    assert described["greeting"]["path"] == str(tmp_path / "greeting.md")
+
+
+async def test_admin_reload_returns_404_outside_prompt_dir(client, tmp_path):
+    outside = tmp_path / "outside.md"
+    outside.write_text("Not a prompt.")
+    relative = os.path.relpath(str(outside)[:-3], prompt_registry.prompt_dir)
+
+    response = await client.post("/api/admin/prompts/reload", params={"name": relative})
+
+    assert response.status_code == 404
+    assert all(entry["name"] != relative for entry in prompt_registry.describe())
+    assert (await client.post("/api/admin/prompts/reload", params={"name": "update_form"})).json() == {"reloaded": ["update_form"]}
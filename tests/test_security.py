@@ -0,0 +1,126 @@
+"""
+Password hashing on the bounded bcrypt worker pool: backpressure
+(503 with Retry-After once the queue is full) and in-flight accounting
+that follows the bcrypt jobs, not their callers.
+"""
+import asyncio
+import logging
+import threading
+
+import pytest
+
+import app.api.auth as auth
+from app.core.security import PasswordHasher, PasswordHasherBusy, hash_password, verify_password
+
+
+def blocking(release: threading.Event):
+    release.wait(5)
+    return True
+
+
+@pytest.fixture
+def release():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+@pytest.fixture
+def saturated(release):
+    """
+    A one-worker, no-queue hasher whose worker is busy until
+    `release` is set.
+    """
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    yield hasher
+    release.set()
+    hasher.shutdown()
+
+
+async def occupy(hasher: PasswordHasher, release: threading.Event):
+    task = asyncio.create_task(hasher._run("verify", blocking, release))
+    while hasher.in_flight == 0:
+        await asyncio.sleep(0)
+    return task
+
+
+def test_hash_and_verify():
+    hashed = hash_password("correct horse")
+
+    assert verify_password("correct horse", hashed)
+    assert not verify_password("battery staple", hashed)
+
+
+def test_password_is_not_logged(caplog):
+    with caplog.at_level(logging.DEBUG):
+        hash_password("correct horse")
+
+    assert "correct horse" not in caplog.text
+
+
+async def test_calls_beyond_capacity_fail_fast(saturated, release):
+    running = await occupy(saturated, release)
+
+    with pytest.raises(PasswordHasherBusy) as raised:
+        await saturated.verify("password", hash_password("password"))
+    assert raised.value.retry_after >= 1
+
+    release.set()
+    assert await running is True
+    assert saturated.in_flight == 0
+
+
+async def test_cancelled_caller_keeps_its_slot_until_bcrypt_finishes(saturated, release):
+    running = await occupy(saturated, release)
+
+    running.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await running
+
+    # The job is still running on the worker thread
+    assert saturated.in_flight == 1
+    with pytest.raises(PasswordHasherBusy):
+        await saturated._run("verify", blocking, release)
+
+    release.set()
+    for _ in range(100):
+        if saturated.in_flight == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert saturated.in_flight == 0
+
+
+async def test_cancelled_queued_call_frees_its_slot(release):
+    hasher = PasswordHasher(workers=1, queue_limit=1)
+    try:
+        running = await occupy(hasher, release)
+        queued = asyncio.create_task(hasher._run("verify", blocking, release))
+        while hasher.in_flight < 2:
+            await asyncio.sleep(0)
+
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+        assert hasher.in_flight == 1
+        release.set()
+        assert await running is True
+    finally:
+        release.set()
+        hasher.shutdown()
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/api/auth/login", {"email": "client@example.com", "password": "x"}),
+    ("/api/auth/register", {"email": "new@example.com", "firstname": "New", "lastname": "User", "password": "x"}),
+])
+async def test_saturated_hasher_returns_503_with_retry_after(client, conversation, saturated, release, monkeypatch, path, body):
+    monkeypatch.setattr(auth, "password_hasher", saturated)
+    running = await occupy(saturated, release)
+
+    response = await client.post(path, json=body)
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    release.set()
+    await running
@@ -0,0 +1,79 @@
+"""
+The speculative chat pipeline (`chat_pipeline_mode = "speculative"`):
+the reply generated on the pre-update form is kept when extraction
+doesn't materially change the form, and regenerated otherwise.
+"""
+import asyncio
+
+import pytest
+
+from app.core.config import get_settings
+from app.main import app
+from app.schemas.openai_schemas import DefaultLLMOutput, FieldToUpdate, UpdateFormLLMOutput
+
+
+class ScriptedLLM:
+    """
+    Stands in for `LLMRouter`: LLM call 1 returns `updates` (after
+    `extract_latency`, so the speculative reply starts first), and
+    each reply echoes the form value it was generated against.
+    """
+
+    def __init__(self, updates: list, extract_latency: float = 0.02):
+        self.updates = updates
+        self.extract_latency = extract_latency
+        self.replies = []
+
+    async def handle_message(self, user_prompt: str, response_format=DefaultLLMOutput, system_prompt: str = "", **kwargs):
+        if response_format is UpdateFormLLMOutput:
+            await asyncio.sleep(self.extract_latency)
+            return {"input message": user_prompt, "response": UpdateFormLLMOutput(fields_to_update=self.updates)}
+        text = "Reply on a form with Acme" if "Current value: Acme Robotics" in user_prompt else "Reply on an empty form"
+        self.replies.append(text)
+        return {"input message": user_prompt, "response": DefaultLLMOutput(output_text=text)}
+
+
+def org_update(confidence: float) -> FieldToUpdate:
+    return FieldToUpdate(
+        type="create", template_field_id="1", field_name="Business/Org Title",
+        new_value="Acme Robotics", confidence=confidence, reasoning="Named by the user."
+    )
+
+
+@pytest.fixture(autouse=True)
+def speculative(monkeypatch):
+    monkeypatch.setattr(get_settings(), "chat_pipeline_mode", "speculative")
+    monkeypatch.setattr(get_settings(), "extraction_gate_mode", "off")
+
+
+async def test_reply_kept_when_form_unchanged(conversation, advance):
+    llm = app.state.openai_client = ScriptedLLM(updates=[])
+
+    response = await advance(1)
+
+    assert response.status_code == 200
+    assert response.json()["content"] == "Reply on an empty form"
+    assert llm.replies == ["Reply on an empty form"]
+
+
+async def test_reply_kept_when_update_below_min_confidence(conversation, advance):
+    llm = app.state.openai_client = ScriptedLLM(updates=[org_update(confidence=0.1)])
+
+    response = await advance(1)
+
+    assert response.json()["content"] == "Reply on an empty form"
+    assert llm.replies == ["Reply on an empty form"]
+
+
+async def test_reply_regenerated_when_form_changed(conversation, advance):
+    llm = app.state.openai_client = ScriptedLLM(updates=[org_update(confidence=0.9)])
+
+    response = await advance(1)
+
+    assert response.status_code == 200
+    assert response.json()["content"] == "Reply on a form with Acme"
+    assert llm.replies == ["Reply on an empty form", "Reply on a form with Acme"]
+
+    # The update is stored with the reply: the next turn's prompts see it
+    llm.updates = []
+    assert (await advance(3, "That's all for now.")).json()["content"] == "Reply on a form with Acme"